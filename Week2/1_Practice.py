@@ -1,6 +1,12 @@
 # %%
 import pandas as pd
+import polars as pl
 from pathlib import Path
+from csv_export import write_csv
+from sales_cube import SalesCube
+from table_index import TableIndex
+from dense_pivot import dense_pivot
+from heavy_hitters import StreamingTopN
 
 path = Path('mock_sales_data.csv')
 path2 = Path('product_details.csv')
@@ -27,12 +33,15 @@ if df is not None:
     print(f'Display data types: \n {df.dtypes}')
     print(f'Display summary statistics: \n {df.describe()}')
 
-# Filtering and Slicing
-    bool_series = (df['Region'] == 'North') & (df['Category'] == 'Electronics')
-    filtered_df = df[bool_series]
+# Filtering and Slicing (persisted index: AND of the Region and Category bitmaps instead of a scan)
+    sales_index = TableIndex.open(path)
+    filtered_df = df.iloc[sales_index.lookup([('Region', '==', 'North'), ('Category', '==', 'Electronics')])]
 
-# groupby and aggregations
-    grouped_df = df.groupby(['Region', 'Category'])['Price'].agg(['sum', 'mean'])
+# groupby and aggregations (answered from the Region x Category x Product x month cube,
+# which only reads orders appended since its last refresh)
+    cube = SalesCube(path)
+    cube.refresh()
+    grouped_df = cube.query(['Region', 'Category'], 'Price', ['sum', 'mean']).to_pandas().set_index(['Region', 'Category'])
 
 
 # datetime
@@ -40,14 +49,20 @@ if df is not None:
     df['Month'] = df['OrderDate'].dt.month
     df['WeekDay'] = df['OrderDate'].dt.weekday
     # monthly sales trend
-    df.groupby(df['Month'])['Sales'].sum().sort_values(ascending=False)
+    monthly_sales = cube.query([pl.col('month').dt.month().alias('Month')]).to_pandas().set_index('Month')['sum']
+    monthly_sales.rename('Sales').sort_values(ascending=False)
 
 # sorting and ranking
-    df.groupby(['Product'])['Sales'].sum().sort_values(ascending=10).head(10)
+    product_sales = cube.query(['Product']).to_pandas().set_index('Product')['sum'].rename('Sales')
+    # ten lowest-selling products, ranked while streaming the orders with a bounded heap
+    ranking = StreamingTopN(10, largest=False)
+    for batch in pd.read_csv(path, usecols=['Product', 'Sales'], chunksize=10_000):
+        ranking.update(batch['Product'], batch['Sales'])
+    pd.Series({r.key: r.estimate for r in ranking.result()}, name='Sales').rename_axis('Product')
 
 # merging and joining
     if df2 is not None:
-        df_merged = pd.merge(df, df2, how='inner', on='Product')
+        df_merged = pd.merge(product_sales.reset_index(), df2, how='inner', on='Product')
         df_merged.groupby(['Manufacturer'])['Sales'].sum()
 
 # Handling missing data
@@ -59,13 +74,16 @@ if df is not None:
     df['Sales_Tax'] = (0.1 * df['Sales']).round(2)
     df['Final_Price'] = (df['Sales'] + df['Sales_Tax']).round(2)
 
-# pivoting table
-    pivot_table = pd.pivot_table(df, values='Sales', index=['Region', 'Category'], columns='Month', aggfunc='sum', fill_value=0)
+# pivoting table (same result as pd.pivot_table, reduced with np.bincount over encoded Region x Category x Month cells)
+    pivot_table = dense_pivot(df, values='Sales', index=['Region', 'Category'], columns='Month', aggfunc='sum', fill_value=0)
 
 # Advanced filtering
     final_price = 1000
-    df.query('Sales > 500 and Category == "Electronics" and Final_Price < @final_price')
-    df.to_csv('filtered_sales_data.csv')
+    # the index narrows to Electronics rows in blocks whose Sales range reaches past 500;
+    # Final_Price is derived, so it is checked on those candidates only
+    candidates = df.iloc[sales_index.lookup([('Sales', '>', 500), ('Category', '==', 'Electronics')])]
+    candidates.query('Final_Price < @final_price')
+    write_csv(df, 'filtered_sales_data.csv', index=True)
 
 # Memory optimization
     df.info(memory_usage='deep')
@@ -75,7 +93,7 @@ if df is not None:
     # list all dtypes available in any DataFrame
 
 # exporting data
-    df.to_csv('filtered_sales_data.csv')
+    write_csv(df, 'filtered_sales_data.csv', index=True)
 
 
 
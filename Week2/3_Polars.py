@@ -1,5 +1,8 @@
 import polars as pl
 from pathlib import Path
+from sales_cube import SalesCube
+from table_index import TableIndex
+from heavy_hitters import StreamingTopN
 
 path = Path('mock_sales_data.csv')
 path2 = Path('product_details.csv')
@@ -29,26 +32,35 @@ if df is not None and df2 is not None:
     print(f'Display data types: \n {df.dtypes}')
     print(f'Display summary statistics: \n {df.describe()}')
 
-    # Filtering and Slicing
-    bool_series = (df['Region'] == 'North') & (df['Category'] == 'Electronics')
-    filtered_df = df.filter(bool_series)
+    # Filtering and Slicing (persisted index: AND of the Region and Category bitmaps instead of a scan)
+    sales_index = TableIndex.open(path)
+    filtered_df = df[sales_index.lookup([('Region', '==', 'North'), ('Category', '==', 'Electronics')])]
 
-    # groupby and aggregations
-    grouped_df = df.group_by(['Region', 'Category']).agg(pl.col('Price').sum().alias('sum'), pl.col('Price').mean().alias('mean'))    
+    # groupby and aggregations (answered from the Region x Category x Product x month cube,
+    # which only reads orders appended since its last refresh)
+    cube = SalesCube(path)
+    cube.refresh()
+    grouped_df = cube.query(['Region', 'Category'], 'Price', ['sum', 'mean'])
 
     # datetime
     df = df.with_columns(pl.col('OrderDate').str.to_datetime("%Y-%m-%d"))
     df = df.with_columns(pl.col('OrderDate').dt.month().alias('Month'), pl.col('OrderDate').dt.weekday().alias('WeekDay'))
     
     # monthly sales trend
-    monthly_sales = df.group_by('Month').agg(pl.col('Price').sum().alias('MonthlySales')).sort('MonthlySales', descending=True)
+    monthly_sales = cube.query([pl.col('month').dt.month().alias('Month')], 'Price').rename({'sum': 'MonthlySales'}).sort('MonthlySales', descending=True)
 
     # sorting and ranking
-    top_products = df.group_by('Product').agg(pl.col('Sales').sum().alias('TopProducts')).sort('TopProducts', descending=True).head(10)
+    product_sales = cube.query(['Product']).rename({'sum': 'Sales'})
+    # ranked while streaming the orders in batches, keeping only a heap of the ten largest
+    ranking = StreamingTopN(10)
+    for batch in pl.scan_csv(path).select('Product', 'Sales').collect_batches(chunk_size=10_000):
+        ranking.update(batch['Product'], batch['Sales'])
+    top_products = pl.DataFrame([(r.key, r.estimate) for r in ranking.result()],
+                                schema={'Product': pl.String, 'TopProducts': pl.Float64}, orient='row')
 
     # merging and joining
     if df2 is not None:
-        df_merged = df.join(df2, on='Product', how='inner')
+        df_merged = product_sales.join(df2, on='Product', how='inner')
         sales_by_manufacturer = df_merged.group_by('Manufacturer').agg(pl.col('Sales').sum())
 
     # Handling missing data
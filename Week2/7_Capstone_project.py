@@ -13,14 +13,32 @@ Interview-ready capstone project demonstrating:
 import pandas as pd
 import polars as pl
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 import json
 import logging
 from pathlib import Path
 import time
-import psutil
-from typing import Dict, List
-from datetime import datetime, timedelta
-import random
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import argparse
+
+from json_stream import read_json_streaming
+from csv_export import write_csv
+from csv_schema import SchemaCache, apply_schema, arrow_types_mapper, infer_csv_schema, read_csv_with_schema
+from pipeline_manifest import RunManifest, settings_fingerprint
+from join_planner import plan_joins, execute_joins
+from kpi_engine import DEFAULT_METRICS, DEFAULT_PERCENTILES, compute_kpis, stack_numeric
+from polars_engine import PolarsLazyEngine
+from out_of_core import StreamingKPIs, StreamingRollup, StreamingUnifiedWriter, iter_raw_chunks
+from output_sinks import OutputSinks, atomic_write, parse_output_formats, resolve_output_formats
+from parquet_output import DEFAULT_COMPRESSION, DEFAULT_ROW_GROUP_SIZE, write_parquet_file, write_partitioned_dataset
+from stage_profiler import MemorySampler, StageProfiler, path_bytes, profiled
+from stage_graph import StageGraph
+from result_cache import DEFAULT_MAX_MB, ResultCache, frame_fingerprint, inputs_fingerprint
+from sample_data import SampleDataGenerator
+from dataset_manifest import DATASET_MANIFEST, group_parts, read_dataset_manifest
+from aggregation_spec import DEFAULT_ROLLUPS, MERGEABLE_METRICS, Rollup, build_rollups, load_rollups
 
 # Configure logging
 logging.basicConfig(
@@ -33,41 +51,173 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# File globs handled by the pipeline, in the order datasets are merged
+RAW_FILE_FORMATS = {
+    'csv': ('*.csv',),
+    'json': ('*.json', '*.ndjson', '*.jsonl'),
+    'parquet': ('*.parquet',)
+}
+
+
+def raw_files(raw_data_path: Path, file_format: str) -> List[Path]:
+    """List the raw files of one format, sorted for a stable ingestion order"""
+    return sorted(
+        file_path
+        for pattern in RAW_FILE_FORMATS[file_format]
+        for file_path in raw_data_path.glob(pattern)
+        if file_path.name != DATASET_MANIFEST
+    )
+
+
+def load_raw_file(file_path: Path, file_format: str, json_batch_size: int = 5000,
+                  schema: Optional[Dict[str, str]] = None, categories: Optional[Dict[str, List]] = None,
+                  schema_sample_rows: int = 10_000,
+                  dtype_backend: str = 'pyarrow') -> Tuple[pd.DataFrame, float]:
+    """Read a single raw file and return the DataFrame with its read time in seconds.
+
+    CSV files are decoded straight into their schema dtypes; when no explicit
+    or cached schema is given one is inferred from the leading schema_sample_rows
+    rows. JSON files with a known schema skip optimize_dtypes. With the pyarrow
+    dtype_backend every source stays in Arrow memory (categories excepted).
+    Kept at module level so it can be shipped to a process pool.
+    """
+    start = time.perf_counter()
+    if file_format == 'csv':
+        if schema is None:
+            schema = infer_csv_schema(file_path, schema_sample_rows)
+        df = read_csv_with_schema(file_path, schema, categories=categories, dtype_backend=dtype_backend)
+    elif file_format == 'json':
+        df = read_json_streaming(file_path, json_batch_size, dtype_backend)
+        if schema:
+            df = apply_schema(df, schema, categories, dtype_backend)
+        else:
+            df = DataPipeline.optimize_dtypes(df, dtype_backend)
+    elif file_format == 'parquet':
+        if dtype_backend == 'pyarrow':
+            df = pq.read_table(file_path).to_pandas(types_mapper=arrow_types_mapper)
+        else:
+            df = pd.read_parquet(file_path, dtype_backend=dtype_backend)
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+    return df, time.perf_counter() - start
+
+
 class DataPipeline:
     """
     Multi-format data ingestion and transformation pipeline
     Handles CSV, JSON, and Parquet files with memory optimization
     """
     
-    def __init__(self, raw_data_path: str = "raw_data", processed_path: str = "processed"):
+    def __init__(self, raw_data_path: str = "raw_data", processed_path: str = "processed",
+                 max_workers: int = 1, executor: str = "thread", json_batch_size: int = 5000,
+                 schemas: Optional[Dict[str, Dict[str, str]]] = None, schema_sample_rows: int = 10_000,
+                 use_schema_cache: bool = True, incremental: bool = False,
+                 join_keys: Optional[List[str]] = None, fact_table: Optional[str] = None,
+                 engine: str = "pandas", kpi_metrics: Sequence[str] = DEFAULT_METRICS,
+                 kpi_percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                 rollups: Sequence[Rollup] = DEFAULT_ROLLUPS,
+                 chunk_size: Optional[int] = None, kpi_sample_size: int = 100_000,
+                 dtype_backend: str = "pyarrow", partition_by: Optional[Sequence[str]] = None,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE, parquet_compression: str = DEFAULT_COMPRESSION,
+                 output_formats: Optional[Dict[str, Sequence[str]]] = None, output_workers: int = 4,
+                 trace_allocations: bool = False, memory_sample_interval: Optional[float] = None,
+                 stage_workers: int = 4, result_cache_mb: Optional[float] = None, cache_key: str = "frame"):
         self.raw_data_path = Path(raw_data_path)
         self.processed_path = Path(processed_path)
-        self.memory_logs: List[dict] = []
+        # Wall/CPU time, memory and row counts per stage (tracemalloc only on request)
+        self.profiler = StageProfiler(trace_allocations)
+        # Background RSS sampling catches peaks inside stages (None disables it)
+        self.memory_sampler = (MemorySampler(self.profiler, memory_sample_interval)
+                               if memory_sample_interval else None)
+        self.ingest_timings: List[dict] = []
+        # Dataset of each raw file listed by a dataset manifest (other files use their stem)
+        self.dataset_names: Dict[Path, str] = {}
+        
+        # Parallel ingestion settings (max_workers=1 keeps the sequential path)
+        if executor not in ("thread", "process"):
+            raise ValueError(f"executor must be 'thread' or 'process', got {executor!r}")
+        self.max_workers = max(1, max_workers)
+        self.executor = executor
+        
+        # Records per batch when streaming JSON / NDJSON files
+        self.json_batch_size = json_batch_size
+        
+        # Explicit CSV schemas keyed by file stem; other CSVs are inferred from a sample
+        self.schemas = schemas or {}
+        self.schema_sample_rows = schema_sample_rows
         
         # Create directories if they don't exist
         self.raw_data_path.mkdir(exist_ok=True)
         self.processed_path.mkdir(exist_ok=True)
         
+        # Dtypes chosen on earlier runs, stored next to processed/
+        self.schema_cache = SchemaCache(self.processed_path / "_cache" / "schema_cache.json") if use_schema_cache else None
+        
+        # Raw-file manifest for incremental runs
+        self.manifest = RunManifest(self.processed_path) if incremental else None
+        
+        # Declared join keys (detected from shared unique columns when None)
+        self.join_keys = join_keys
+        self.fact_table = fact_table
+        
+        # Execution engine: eager pandas stages or one lazy Polars plan
+        if engine not in ("pandas", "polars"):
+            raise ValueError(f"engine must be 'pandas' or 'polars', got {engine!r}")
+        self.engine = engine
+        
+        # KPI set computed per numeric column
+        self.kpi_metrics = kpi_metrics
+        self.kpi_percentiles = kpi_percentiles
+        
+        # Time-window rollups (see aggregation_spec); all are collected in one multi-threaded pass
+        self.rollups = tuple(rollups)
+        
+        # Out-of-core mode: stream the fact file in chunk_size batches
+        self.chunk_size = chunk_size
+        self.kpi_sample_size = kpi_sample_size
+        if chunk_size:
+            unmergeable = [rollup.name for rollup in self.rollups if not set(rollup.metrics) <= set(MERGEABLE_METRICS)]
+            if unmergeable:
+                raise ValueError(f"Chunked mode supports only {list(MERGEABLE_METRICS)} rollup metrics, "
+                                 f"not those of {unmergeable}")
+        
+        # Arrow-backed dtypes keep every stage on Arrow memory and make the Polars handoff zero-copy
+        if dtype_backend not in ("pyarrow", "numpy_nullable"):
+            raise ValueError(f"dtype_backend must be 'pyarrow' or 'numpy_nullable', got {dtype_backend!r}")
+        self.dtype_backend = dtype_backend
+        
+        # Unified Parquet layout: flat file, or Hive partitions (e.g. month, region) under unified_data/
+        self.partition_by = list(partition_by or [])
+        self.row_group_size = row_group_size
+        self.parquet_compression = parquet_compression
+        
+        # Formats written per artifact (see output_sinks) and the writer pool size
+        self.output_formats = resolve_output_formats(output_formats)
+        self.output_workers = output_workers
+        
+        # Threads running independent pandas stages concurrently (1 = one after another)
+        self.stage_workers = max(1, stage_workers)
+        self.stage_graph: Optional[StageGraph] = None
+        
+        # KPI / aggregation results keyed by the unified frame ('frame') or the raw inputs ('inputs')
+        if cache_key not in ("frame", "inputs"):
+            raise ValueError(f"cache_key must be 'frame' or 'inputs', got {cache_key!r}")
+        self.cache_key = cache_key
+        self.result_cache = (ResultCache(self.processed_path / "_cache" / "results", result_cache_mb)
+                             if result_cache_mb else None)
+        
         logger.info(f"Pipeline initialized with raw_data: {raw_data_path}, processed: {processed_path}")
     
-    def log_memory_usage(self, step: str) -> None:
-        """Log current memory usage"""
-        memory_mb = psutil.Process().memory_info().rss / 1024 / 1024
-        self.memory_logs.append({
-            'step': step,
-            'memory_mb': round(memory_mb, 2),
-            'timestamp': datetime.now()
-        })
-        logger.info(f"Memory usage at {step}: {memory_mb:.2f} MB at {self.memory_logs[-1]['timestamp']}")
-    
-    def optimize_dtypes(self, df: pd.DataFrame) -> pd.DataFrame:
+    @staticmethod
+    def optimize_dtypes(df: pd.DataFrame, dtype_backend: str = 'numpy_nullable') -> pd.DataFrame:
         """Optimize DataFrame data types for memory efficiency"""
         logger.info("Optimizing data types...")
         
         try:
-            df_opt = df.infer_objects().convert_dtypes()
+            df_opt = df.infer_objects().convert_dtypes(dtype_backend=dtype_backend)
             
-            for col in df_opt.select_dtypes(include=['string', 'object']):
+            string_cols = [col for col in df_opt.columns if pd.api.types.is_string_dtype(df_opt[col].dtype)]
+            for col in string_cols:
                 if df_opt[col].nunique() / len(df_opt) < 0.5:
                     df_opt[col] = df_opt[col].astype('category')
                     logger.info(f"Converted {col} to category (cardinality: {df_opt[col].nunique()}/{len(df_opt)})")
@@ -78,207 +228,574 @@ class DataPipeline:
             logger.warning(f"Dtype optimization failed: {e}, returning original DataFrame")
             return df
     
+    @profiled("CSV ingestion")
     def ingest_csv_data(self) -> Dict[str, pd.DataFrame]:
-        """Ingest all CSV files using Pandas"""
+        """Ingest all CSV files using Pandas with read-time dtypes"""
         logger.info("Ingesting CSV files...")
-        csv_data = {}
+        csv_data = []
         
-        for csv_file in self.raw_data_path.glob("*.csv"):
+        for csv_file in self.raw_files_of('csv'):
             try:
-                df = pd.read_csv(csv_file)
-                df = self.optimize_dtypes(df)
-                csv_data[csv_file.stem] = df
+                df = self._load_file(csv_file, 'csv')
+                csv_data.append((self.dataset_name(csv_file), df))
                 logger.info(f"Loaded {csv_file.name}: {df.shape[0]} rows, {df.shape[1]} columns")
             except Exception as e:
                 logger.error(f"Error loading {csv_file.name}: {e}")
         
-        self.log_memory_usage("CSV ingestion")
-        return csv_data
+        return group_parts(csv_data)
     
+    @profiled("JSON ingestion")
     def ingest_json_data(self) -> Dict[str, pd.DataFrame]:
-        """Ingest all JSON files using Pandas"""
+        """Ingest all JSON array and NDJSON files with the streaming reader"""
         logger.info("Ingesting JSON files...")
-        json_data = {}
+        json_data = []
         
-        for json_file in self.raw_data_path.glob("*.json"):
+        for json_file in self.raw_files_of('json'):
             try:
-                df = pd.read_json(json_file)
-                df = self.optimize_dtypes(df)
-                json_data[json_file.stem] = df
+                df = self._load_file(json_file, 'json')
+                json_data.append((self.dataset_name(json_file), df))
                 logger.info(f"Loaded {json_file.name}: {df.shape[0]} rows, {df.shape[1]} columns")
             except Exception as e:
                 logger.error(f"Error loading {json_file.name}: {e}")
         
-        self.log_memory_usage("JSON ingestion")
-        return json_data
+        return group_parts(json_data)
     
+    @profiled("Parquet ingestion")
     def ingest_parquet_data(self) -> Dict[str, pd.DataFrame]:
         """Ingest all Parquet files using Pandas"""
         logger.info("Ingesting Parquet files...")
-        parquet_data = {}
+        parquet_data = []
         
-        for parquet_file in self.raw_data_path.glob("*.parquet"):
+        for parquet_file in self.raw_files_of('parquet'):
             try:
-                df = pd.read_parquet(parquet_file)
-                parquet_data[parquet_file.stem] = df
+                df = self._load_file(parquet_file, 'parquet')
+                parquet_data.append((self.dataset_name(parquet_file), df))
                 logger.info(f"Loaded {parquet_file.name}: {df.shape[0]} rows, {df.shape[1]} columns")
             except Exception as e:
                 logger.error(f"Error loading {parquet_file.name}: {e}")
         
-        self.log_memory_usage("Parquet ingestion")
-        return parquet_data
+        return group_parts(parquet_data)
     
-    def perform_joins(self, datasets: Dict[str, pd.DataFrame]) -> pd.DataFrame:
-        """Join datasets into unified DataFrame"""
-        logger.info("Performing cross-dataset joins...")
-        logger.debug(f'unified dataset products_data shape {datasets['products_data'].shape}, sales_data shape {datasets['sales_data'].shape}')
-        # Start with the largest dataset as base
-        base_name = max(datasets.keys(), key=lambda k: len(datasets[k]))
-        unified_df = datasets[base_name].copy()
-        logger.debug(f"Using {base_name} as base dataset with {len(unified_df)} rows")
-        
-        # Join other datasets
-        for name, df in datasets.items():
-            if name == base_name:
-                continue
+    def _load_args(self, file_path: Path, file_format: str) -> Tuple[tuple, bool]:
+        """Build load_raw_file arguments, preferring an explicit then a cached schema"""
+        schema, categories, cache_hit = self.schemas.get(self.dataset_name(file_path)), None, False
+        if schema is None and self.schema_cache is not None and file_format != 'parquet':
+            entry = self.schema_cache.lookup(file_path)
+            if entry is not None:
+                schema, categories, cache_hit = entry['columns'], entry['categories'], True
+        args = (file_path, file_format, self.json_batch_size, schema, categories,
+                self.schema_sample_rows, self.dtype_backend)
+        return args, cache_hit
+    
+    def _finish_load(self, file_path: Path, file_format: str, df: pd.DataFrame,
+                     seconds: float, cache_hit: bool) -> None:
+        """Record the read timing and remember newly chosen schemas"""
+        self._record_ingest_timing(file_path, file_format, df, seconds)
+        self.profiler.add_input(nbytes=file_path.stat().st_size)
+        if self.schema_cache is not None and file_format != 'parquet' and not cache_hit:
+            self.schema_cache.store(file_path, df)
+    
+    def _load_file(self, file_path: Path, file_format: str) -> pd.DataFrame:
+        """Load one raw file in the calling thread"""
+        args, cache_hit = self._load_args(file_path, file_format)
+        df, seconds = load_raw_file(*args)
+        self._finish_load(file_path, file_format, df, seconds, cache_hit)
+        return df
+    
+    def _record_ingest_timing(self, file_path: Path, file_format: str, df: pd.DataFrame, seconds: float) -> None:
+        """Keep per-file read timings so the slowest sources can be spotted"""
+        self.ingest_timings.append({
+            'file': file_path.name,
+            'format': file_format,
+            'rows': len(df),
+            'seconds': round(seconds, 4),
+            'mb_per_sec': round(file_path.stat().st_size / 1024 / 1024 / seconds, 2) if seconds > 0 else None
+        })
+        logger.debug(f"Read {file_path.name} in {seconds:.3f}s")
+    
+    def list_raw_files(self) -> List[Tuple[Path, str]]:
+        """All raw files with their format, in dataset merge order
+        
+        When raw_data holds a dataset manifest its part files are listed
+        instead of globbing, each dataset's parts in order.
+        """
+        parts = read_dataset_manifest(self.raw_data_path)
+        if parts is None:
+            self.dataset_names = {}
+            return [
+                (file_path, file_format)
+                for file_format in RAW_FILE_FORMATS
+                for file_path in raw_files(self.raw_data_path, file_format)
+            ]
+        self.dataset_names = {file_path: name for file_path, _, name in parts}
+        return [
+            (file_path, file_format)
+            for file_format in RAW_FILE_FORMATS
+            for file_path, part_format, _ in parts if part_format == file_format
+        ]
+    
+    def raw_files_of(self, file_format: str) -> List[Path]:
+        """Raw files (or manifest parts) of one format"""
+        return [file_path for file_path, fmt in self.list_raw_files() if fmt == file_format]
+    
+    def dataset_name(self, file_path: Path) -> str:
+        """Dataset a raw file belongs to: its manifest entry, else the file stem"""
+        return self.dataset_names.get(file_path, file_path.stem)
+    
+    @profiled("Parallel ingestion")
+    def ingest_parallel(self, files: Optional[List[Tuple[Path, str]]] = None) -> Dict[str, pd.DataFrame]:
+        """Ingest raw files concurrently, fanning out one task per file"""
+        if files is None:
+            files = self.list_raw_files()
+        loaded = self._load_parallel(files)
+        
+        # Keep the same {dataset: DataFrame} contract and precedence as the sequential path
+        datasets = group_parts((self.dataset_name(file_path), loaded[file_path])
+                               for file_path, _ in files if file_path in loaded)
+        
+        for timing in sorted(self.ingest_timings, key=lambda t: t['seconds'], reverse=True)[:5]:
+            logger.info(f"Slow read: {timing['file']} took {timing['seconds']}s ({timing['rows']} rows)")
+        
+        return datasets
+    
+    def _load_parallel(self, files: List[Tuple[Path, str]]) -> Dict[Path, pd.DataFrame]:
+        """Load raw files on the worker pool, returning the frames keyed by path"""
+        logger.info(f"Ingesting {len(files)} files with {self.max_workers} {self.executor} workers...")
+        
+        pool_cls = ProcessPoolExecutor if self.executor == "process" else ThreadPoolExecutor
+        loaded: Dict[Path, pd.DataFrame] = {}
+        
+        with pool_cls(max_workers=self.max_workers) as pool:
+            futures = {}
+            for file_path, file_format in files:
+                args, cache_hit = self._load_args(file_path, file_format)
+                futures[pool.submit(load_raw_file, *args)] = (file_path, file_format, cache_hit)
             
-            # Find common columns for joining
-            common_cols = set(unified_df.columns).intersection(set(df.columns))
-            if common_cols:
-                join_col = list(common_cols)[0]  # Use first common column
-                unified_df = unified_df.merge(
-                    df, 
-                    on=join_col, 
-                    how='left', 
-                    suffixes=('', f'_{name}')
-                )
-                logger.info(f"Joined {name} on column '{join_col}'")
+            for future in as_completed(futures):
+                file_path, file_format, cache_hit = futures[future]
+                try:
+                    df, seconds = future.result()
+                    loaded[file_path] = df
+                    self._finish_load(file_path, file_format, df, seconds, cache_hit)
+                    logger.info(f"Loaded {file_path.name}: {df.shape[0]} rows, {df.shape[1]} columns")
+                except Exception as e:
+                    logger.error(f"Error loading {file_path.name}: {e}")
+        
+        return loaded
+    
+    @profiled("Incremental ingestion")
+    def ingest_incremental(self) -> Optional[Dict[str, pd.DataFrame]]:
+        """Re-ingest only changed raw files, reloading the rest from the Arrow cache.
+        
+        Returns None when no raw file or output setting changed and the
+        outputs already exist.
+        """
+        files = self.list_raw_files()
+        paths = [file_path for file_path, _ in files]
+        changed = set(self.manifest.changed_files(paths))
+        removed = self.manifest.removed_files(paths)
+        unified_path = (self.unified_parquet_path() if 'parquet' in self.output_formats['unified']
+                        else self.processed_path / "unified_data.csv")
+        outputs_exist = unified_path.exists() and (self.processed_path / "kpis.json").exists()
+        settings = self.output_settings_fingerprint()
+        settings_changed = self.manifest.settings_changed(settings)
+        
+        if not changed and not removed and not settings_changed and outputs_exist:
+            return None
+        
+        logger.info(f"Incremental run: {len(changed)} changed, {len(files) - len(changed)} unchanged, "
+                    f"{len(removed)} removed raw files" + (", output settings changed" if settings_changed else ""))
+        for name in removed:
+            self.manifest.drop_frame(name)
+        
+        changed_files = [(file_path, file_format) for file_path, file_format in files if file_path in changed]
+        if self.max_workers > 1:
+            with self.profiler.stage("Parallel ingestion"):
+                fresh = self._load_parallel(changed_files)
+        else:
+            fresh = {file_path: self._load_file(file_path, file_format) for file_path, file_format in changed_files}
+        
+        parts, loaded = [], []
+        for file_path, _ in files:
+            if file_path in changed:
+                if file_path not in fresh:
+                    # Failed to load: forget it, so the next run retries it instead of serving a stale frame
+                    self.manifest.drop_frame(file_path.name)
+                    continue
+                df = fresh[file_path]
+                self.manifest.cache_frame(file_path, df)
             else:
-                logger.warning(f"No common columns found for {name}, skipping join")
+                df = self.manifest.load_frame(file_path, self.dtype_backend)
+                logger.info(f"Reused cached frame for unchanged {file_path.name}")
+            parts.append((self.dataset_name(file_path), df))
+            loaded.append(file_path)
+        
+        self.manifest.record(loaded, settings)
+        return group_parts(parts)
+    
+    def output_settings_fingerprint(self) -> str:
+        """Fingerprint the settings that shape the processed outputs, for the run manifest"""
+        return settings_fingerprint(schemas=self.schemas, join_keys=self.join_keys, fact_table=self.fact_table,
+                                    dtype_backend=self.dtype_backend, kpi_metrics=list(self.kpi_metrics),
+                                    kpi_percentiles=list(self.kpi_percentiles),
+                                    rollups=[rollup._asdict() for rollup in self.rollups],
+                                    partition_by=self.partition_by, row_group_size=self.row_group_size,
+                                    parquet_compression=self.parquet_compression,
+                                    output_formats={name: list(formats) for name, formats in self.output_formats.items()})
+    
+    @profiled("Data joins")
+    def perform_joins(self, datasets: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """Join datasets into unified DataFrame using the key-aware join planner"""
+        logger.info("Performing cross-dataset joins...")
+        logger.debug(f"Dataset shapes: { {name: df.shape for name, df in datasets.items()} }")
+        
+        # Largest dataset is the fact table, dimensions are joined smallest first
+        fact_name, steps = plan_joins(datasets, fact=self.fact_table, declared_keys=self.join_keys)
+        logger.debug(f"Using {fact_name} as base dataset with {len(datasets[fact_name])} rows")
+        logger.info(f"Join plan: {[(step.name, step.key) for step in steps]}")
+        
+        unified_df = execute_joins(datasets, fact_name, steps)
         
-        self.log_memory_usage("Data joins")
         return unified_df
     
+    @profiled("KPI calculation")
     def calculate_kpis_numpy(self, df: pd.DataFrame) -> Dict[str, float]:
-        """Calculate KPIs using NumPy for performance"""
+        """Calculate KPIs for all numeric columns in one vectorized NumPy pass"""
         logger.info("Calculating KPIs with NumPy...")
         
-        kpis = {}
-        
-        # Find numeric columns
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        
-        for col in numeric_cols:
-            values = df[col].dropna().values
-            if len(values) > 0:
-                kpis[f'{col}_mean'] = np.mean(values)
-                kpis[f'{col}_std'] = np.std(values)
-                kpis[f'{col}_median'] = np.median(values)
-                kpis[f'{col}_95th_percentile'] = np.percentile(values, 95)
+        kpis = compute_kpis(df, self.kpi_metrics, self.kpi_percentiles)
         
+        logger.info(f"Calculated {len(kpis)} KPIs")
         return kpis
     
+    @profiled("Polars aggregations")
     def aggregate_with_polars(self, df: pd.DataFrame) -> Dict[str, pl.DataFrame]:
         """Perform large aggregations using Polars"""
         logger.info("Performing aggregations with Polars...")
         
-        # Convert to Polars
-        pl_df = pl.from_pandas(df)
+        # Hand over through Arrow: Arrow-backed columns and category codes are not copied
+        pl_df = pl.from_arrow(pa.Table.from_pandas(df, preserve_index=False))
         aggregations = {}
         
-        # Find date column for time-based aggregations
-        date_cols = [col for col in df.columns if df[col].dtype == 'datetime64[ns]']
-        numeric_cols = [col for col in df.columns if df[col].dtype in ['int64', 'float64', 'int32', 'float32']]
-        
-        if date_cols and numeric_cols:
-            date_col = date_cols[0]
-            
-            try:
-                # Monthly aggregations
-                monthly_agg = (
-                    pl_df
-                    .with_columns(pl.col(date_col).dt.truncate("1mo").alias("month"))
-                    .group_by("month")
-                    .agg([
-                        pl.col(col).mean().alias(f"{col}_avg") for col in numeric_cols[:3]  # Limit to first 3 numeric cols
-                    ] + [
-                        pl.col(col).sum().alias(f"{col}_sum") for col in numeric_cols[:3]
-                    ])
-                )
-                aggregations['monthly'] = monthly_agg
-                
-                # Quarterly aggregations
-                quarterly_agg = (
-                    pl_df
-                    .with_columns(pl.col(date_col).dt.quarter().alias("quarter"))
-                    .group_by("quarter")
-                    .agg([
-                        pl.col(col).mean().alias(f"{col}_avg") for col in numeric_cols[:3]
-                    ])
-                )
-                aggregations['quarterly'] = quarterly_agg
-                
-                logger.info("Completed time-based aggregations")
+        try:
+            # Every rollup of the spec over the same frame, run together on Polars' thread pool
+            plans = build_rollups(pl_df.lazy(), self.rollups)
+            aggregations = dict(zip(plans, pl.collect_all(list(plans.values()))))
             
-            except Exception as e:
-                logger.warning(f"Could not perform time-based aggregations: {e}")
+            logger.info(f"Completed time-based aggregations {list(aggregations)}")
+        
+        except Exception as e:
+            logger.warning(f"Could not perform time-based aggregations: {e}")
         
-        self.log_memory_usage("Polars aggregations")
         return aggregations
     
-    def save_results(self, unified_df: pd.DataFrame, aggregations: Dict, kpis: Dict) -> None:
-        """Save processed results to files"""
+    def result_fingerprint(self, unified_df: Optional[pd.DataFrame] = None) -> str:
+        """Fingerprint the KPI / aggregation input for the result cache"""
+        if self.cache_key == "frame":
+            return frame_fingerprint(unified_df)
+        return inputs_fingerprint([file_path for file_path, _ in self.list_raw_files()],
+                                  schemas=self.schemas, join_keys=self.join_keys, fact_table=self.fact_table,
+                                  dtype_backend=self.dtype_backend)
+    
+    def cached_kpis(self, unified_df: pd.DataFrame, fingerprint: str) -> Dict[str, float]:
+        """KPIs from the result cache, computed and stored on a miss"""
+        key = self.result_cache.key('kpis', fingerprint, {'metrics': list(self.kpi_metrics),
+                                                          'percentiles': list(self.kpi_percentiles)})
+        kpis = self.result_cache.get_json(key)
+        if kpis is not None:
+            logger.info(f"Reused {len(kpis)} cached KPIs ({key})")
+            return kpis
+        kpis = self.calculate_kpis_numpy(unified_df)
+        self.result_cache.put_json(key, kpis)
+        return kpis
+    
+    def cached_aggregations(self, unified_df: pd.DataFrame, fingerprint: str) -> Dict[str, pl.DataFrame]:
+        """Time aggregations from the result cache, computed and stored on a miss"""
+        key = self.result_cache.key('aggregations', fingerprint,
+                                    {'rollups': [rollup._asdict() for rollup in self.rollups]})
+        aggregations = self.result_cache.get_frames(key)
+        if aggregations is not None:
+            logger.info(f"Reused cached aggregations {list(aggregations)} ({key})")
+            return aggregations
+        aggregations = self.aggregate_with_polars(unified_df)
+        self.result_cache.put_frames(key, aggregations)
+        return aggregations
+    
+    def unified_parquet_path(self) -> Path:
+        """unified_data/ dataset directory when partitioning, else unified_data.parquet"""
+        if self.partition_by:
+            return self.processed_path / "unified_data"
+        return self.processed_path / "unified_data.parquet"
+    
+    @profiled("Save results")
+    def save_results(self, unified_df: Optional[pd.DataFrame], aggregations: Dict, kpis: Dict) -> None:
+        """Save processed results to files (unified_df is None when it was streamed to disk)
+        
+        Every artifact is written in its configured formats on a background pool,
+        each file atomically replacing the previous one.
+        """
         logger.info("Saving processed results...")
+        sinks = OutputSinks(self.output_workers)
+        formats = self.output_formats
         
         # Save unified DataFrame
-        unified_df.to_parquet(self.processed_path / "unified_data.parquet", index=False)
-        unified_df.to_csv(self.processed_path / "unified_data.csv", index=False)
+        if unified_df is not None:
+            if 'parquet' in formats['unified']:
+                table = pa.Table.from_pandas(unified_df, preserve_index=False)
+                if self.partition_by:
+                    sinks.submit(self.unified_parquet_path(), lambda path: write_partitioned_dataset(
+                        table, path, self.partition_by, self.row_group_size, self.parquet_compression))
+                else:
+                    sinks.submit(self.unified_parquet_path(), lambda path: write_parquet_file(
+                        table, path, self.row_group_size, self.parquet_compression))
+            if 'csv' in formats['unified']:
+                sinks.submit(self.processed_path / "unified_data.csv",
+                             lambda path: write_csv(unified_df, path))
         
         # Save aggregations
         for agg_name, agg_df in aggregations.items():
             if isinstance(agg_df, pl.DataFrame):
-                agg_df.write_parquet(self.processed_path / f"{agg_name}_aggregation.parquet")
-                agg_df.write_csv(self.processed_path / f"{agg_name}_aggregation.csv")
+                if 'parquet' in formats['aggregations']:
+                    sinks.submit(self.processed_path / f"{agg_name}_aggregation.parquet", agg_df.write_parquet)
+                if 'csv' in formats['aggregations']:
+                    sinks.submit(self.processed_path / f"{agg_name}_aggregation.csv", agg_df.write_csv)
         
         # Save KPIs
-        with open(self.processed_path / "kpis.json", 'w') as f:
-            json.dump(kpis, f, indent=2, default=str)
-        
-        # Save memory logs
-        memory_df = pd.DataFrame(self.memory_logs)
-        memory_df.to_csv(self.processed_path / "memory_usage_log.csv", index=False)
-        
+        if 'json' in formats['kpis']:
+            def write_kpis(path: Path) -> None:
+                with open(path, 'w') as f:
+                    json.dump(kpis, f, indent=2, default=str)
+            sinks.submit(self.processed_path / "kpis.json", write_kpis)
+        
+        # Save per-file ingestion timings
+        if self.ingest_timings and 'csv' in formats['ingest_timings']:
+            timings_df = pd.DataFrame(self.ingest_timings).sort_values('seconds', ascending=False)
+            sinks.submit(self.processed_path / "ingest_timings.csv",
+                         lambda path: timings_df.to_csv(path, index=False))
+        
+        written = sinks.wait()
+        self.profiler.current.bytes_out = sum(path_bytes(path) for path in written)
         logger.info(f"Results saved to {self.processed_path}")
     
+    def save_profile(self) -> None:
+        """Write the stage profile (JSON lines and a summary CSV) and log the summary table"""
+        if not self.profiler.records:
+            return
+        logger.info(f"Stage profile:\n{self.profiler.summary_table()}")
+        formats = self.output_formats['profile']
+        if 'jsonl' in formats:
+            atomic_write(self.processed_path / "stage_profile.jsonl", self.profiler.write_jsonl)
+        if 'csv' in formats:
+            summary = self.profiler.summary()
+            atomic_write(self.processed_path / "stage_profile.csv", lambda path: summary.to_csv(path, index=False))
+        
+        if self.memory_sampler is not None and self.memory_sampler.samples:
+            stage, peak_mb = self.memory_sampler.high_water_mark()
+            logger.info(f"Sampled memory high-water mark: {peak_mb:.2f} MB during {stage} "
+                        f"({len(self.memory_sampler.samples)} samples)")
+            if 'csv' in self.output_formats['memory_timeline']:
+                timeline = self.memory_sampler.timeline()
+                atomic_write(self.processed_path / "memory_timeline.csv", lambda path: timeline.to_csv(path, index=False))
+        
+        if self.stage_graph is not None and self.stage_graph.timings and 'csv' in self.output_formats['stage_graph']:
+            graph_summary = self.stage_graph.summary()
+            atomic_write(self.processed_path / "stage_graph.csv", lambda path: graph_summary.to_csv(path, index=False))
+    
+    @profiled("Polars lazy plan")
+    def run_polars_engine(self) -> Tuple[pd.DataFrame, Dict[str, float], Dict[str, pl.DataFrame]]:
+        """Run ingestion, joins, KPIs and aggregations as one lazy Polars plan"""
+        logger.info("Building lazy Polars plan...")
+        engine = PolarsLazyEngine(
+            schemas=self.schemas,
+            schema_cache=self.schema_cache,
+            schema_sample_rows=self.schema_sample_rows,
+            json_batch_size=self.json_batch_size,
+            join_keys=self.join_keys,
+            fact_table=self.fact_table,
+            kpi_metrics=self.kpi_metrics,
+            kpi_percentiles=self.kpi_percentiles,
+            rollups=self.rollups
+        )
+        files = self.list_raw_files()
+        self.profiler.add_input(nbytes=sum(file_path.stat().st_size for file_path, _ in files))
+        unified_pl, kpis, aggregations = engine.run(files, self.dataset_names)
+        self.profiler.current.output(unified_pl)
+        
+        # Saved through the same writers as the pandas path
+        if self.dtype_backend == "pyarrow":
+            return unified_pl.to_arrow().to_pandas(types_mapper=arrow_types_mapper), kpis, aggregations
+        return unified_pl.to_pandas(), kpis, aggregations
+    
+    @profiled("Chunked processing")
+    def run_chunked(self) -> Tuple[int, Dict[str, float], Dict[str, pl.DataFrame]]:
+        """Stream the fact file in bounded chunks, enriching each against in-memory dimensions.
+        
+        KPIs and the rollups are kept as mergeable partial states and
+        combined at the end; enriched rows are appended straight to the unified outputs.
+        Returns (rows, kpis, aggregations).
+        """
+        files = self.list_raw_files()
+        if not files:
+            raise ValueError("No data files found! Please check the raw_data directory.")
+        
+        # The fact table is streamed, everything else is a dimension kept in memory
+        sizes: Dict[str, int] = {}
+        for file_path, _ in files:
+            name = self.dataset_name(file_path)
+            sizes[name] = sizes.get(name, 0) + file_path.stat().st_size
+        fact_name = self.fact_table if self.fact_table is not None else max(sizes, key=sizes.get)
+        if fact_name not in sizes:
+            raise ValueError(f"Fact table {fact_name!r} not found in {self.raw_data_path}")
+        fact_files = [(file_path, file_format) for file_path, file_format in files
+                      if self.dataset_name(file_path) == fact_name]
+        with self.profiler.stage("Dimension ingestion") as stage:
+            dims = group_parts(
+                (self.dataset_name(file_path), self._load_file(file_path, file_format))
+                for file_path, file_format in files if self.dataset_name(file_path) != fact_name
+            )
+            # Nullable ints keep gathered dimension columns at one dtype whether or not a chunk has misses
+            for name, dim in dims.items():
+                int_cols = [col for col in dim.columns if isinstance(dim[col].dtype, np.dtype) and dim[col].dtype.kind in 'iu']
+                dims[name] = dim.astype({col: 'Int64' for col in int_cols})
+            stage.output(dims)
+        self.profiler.add_input(nbytes=sizes[fact_name])
+        logger.info(f"Streaming {fact_name} ({len(fact_files)} files) in chunks of {self.chunk_size} rows "
+                    f"against {list(dims)}")
+        chunks = self._iter_fact_chunks(fact_files)
+        
+        writer = StreamingUnifiedWriter(self.processed_path, formats=self.output_formats['unified'],
+                                        partition_by=self.partition_by,
+                                        row_group_size=self.row_group_size, compression=self.parquet_compression)
+        kpi_state, rollups, steps = None, [], []
+        try:
+            for i, chunk in enumerate(chunks):
+                datasets = {fact_name: chunk, **dims}
+                if i == 0:
+                    _, steps = plan_joins(datasets, fact=fact_name, declared_keys=self.join_keys)
+                    logger.info(f"Join plan: {[(step.name, step.key) for step in steps]}")
+                enriched = execute_joins(datasets, fact_name, steps, log_level=logging.DEBUG)
+                
+                if i == 0:
+                    kpi_cols = list(enriched.select_dtypes(include=[np.number]).columns)
+                    kpi_state = StreamingKPIs(kpi_cols, self.kpi_sample_size)
+                    schema = pa.Schema.from_pandas(enriched.head(0), preserve_index=False)
+                    rollups = [StreamingRollup(rollup, schema) for rollup in self.rollups]
+                    for rollup in rollups:
+                        if not rollup.usable:
+                            logger.warning(f"Skipping rollup {rollup.rollup.name}: no date or metric columns")
+                    rollups = [rollup for rollup in rollups if rollup.usable]
+                
+                kpi_state.update(stack_numeric(enriched, kpi_state.columns))
+                for rollup in rollups:
+                    rollup.update(enriched)
+                writer.write(enriched)
+                logger.debug(f"Processed chunk {i} ({len(enriched)} rows, {writer.rows} total)")
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        self.profiler.current.rows_out = writer.rows
+        
+        kpis = kpi_state.result(self.kpi_metrics, self.kpi_percentiles) if kpi_state else {}
+        aggregations = {rollup.rollup.name: rollup.result() for rollup in rollups}
+        return writer.rows, kpis, aggregations
+    
+    def _iter_fact_chunks(self, fact_files: List[Tuple[Path, str]]) -> Iterator[pd.DataFrame]:
+        """Chunks of the fact table, part after part.
+        
+        Cached category vocabularies are only used for a single file; parts may
+        differ, so their category columns are streamed as strings.
+        """
+        for file_path, file_format in fact_files:
+            args, _ = self._load_args(file_path, file_format)
+            _, _, _, schema, categories, _, _ = args
+            yield from iter_raw_chunks(file_path, file_format, self.chunk_size, schema,
+                                       categories if len(fact_files) == 1 else None,
+                                       self.schema_sample_rows, self.dtype_backend)
+    
+    def build_stage_graph(self) -> StageGraph:
+        """Declare the pandas engine's stages and the results each one consumes"""
+        graph = StageGraph()
+        if self.manifest is not None:
+            graph.add('datasets', self.ingest_incremental)
+        elif self.max_workers > 1:
+            graph.add('datasets', self.ingest_parallel)
+        else:
+            graph.add('json', self.ingest_json_data)
+            graph.add('parquet', self.ingest_parquet_data)
+            graph.add('csv', self.ingest_csv_data)
+            # Combine all datasets
+            graph.add('datasets', lambda csv_data, json_data, parquet_data: {**csv_data, **json_data, **parquet_data},
+                      deps=('csv', 'json', 'parquet'))
+        
+        # Create unified DataFrame
+        graph.add('unified', self.perform_joins, deps=('datasets',))
+        # KPIs with NumPy and aggregations with Polars only need the unified frame
+        if self.result_cache is None:
+            graph.add('kpis', self.calculate_kpis_numpy, deps=('unified',))
+            graph.add('aggregations', self.aggregate_with_polars, deps=('unified',))
+        else:
+            # An inputs fingerprint does not need the unified frame and is taken while ingesting
+            graph.add('fingerprint', self.result_fingerprint, deps=('unified',) if self.cache_key == "frame" else ())
+            graph.add('kpis', self.cached_kpis, deps=('unified', 'fingerprint'))
+            graph.add('aggregations', self.cached_aggregations, deps=('unified', 'fingerprint'))
+        # Save all results
+        graph.add('save', self.save_results, deps=('unified', 'aggregations', 'kpis'))
+        return graph
+    
     def run_pipeline(self) -> None:
         """Execute the complete data pipeline"""
         start_time = time.time()
         logger.info("Starting data pipeline execution...")
+        if self.memory_sampler is not None:
+            self.memory_sampler.start()
         
         try:
-            # Ingest all data formats
-            json_data = self.ingest_json_data()
-            parquet_data = self.ingest_parquet_data()
-            csv_data = self.ingest_csv_data()
+            if self.chunk_size:
+                rows, kpis, aggregations = self.run_chunked()
+                self.save_results(None, aggregations, kpis)
+                
+                execution_time = time.time() - start_time
+                logger.info(f"Pipeline completed successfully in {execution_time:.2f} seconds")
+                logger.info(f"Processed {rows} total rows in chunks of {self.chunk_size}")
+                return
             
-            # Combine all datasets
-            all_datasets = {**csv_data, **json_data, **parquet_data}
+            if self.engine == "polars":
+                if self.manifest is not None:
+                    logger.warning("Incremental mode only applies to the pandas engine, running a full lazy plan")
+                unified_df, kpis, aggregations = self.run_polars_engine()
+                self.save_results(unified_df, aggregations, kpis)
+                
+                execution_time = time.time() - start_time
+                logger.info(f"Pipeline completed successfully in {execution_time:.2f} seconds")
+                logger.info(f"Processed {len(unified_df)} total rows with the Polars lazy engine")
+                return
             
-            if not all_datasets:
-                logger.error("No data files found! Please check the raw_data directory.")
+            # Stages run as a dependency graph; independent ones overlap on the stage pool
+            self.stage_graph = self.build_stage_graph()
+            
+            # Ingest all data formats first, so empty or unchanged inputs stop the run
+            all_datasets = self.stage_graph.run(self.stage_workers, targets=['datasets'])['datasets']
+            if all_datasets is None:
+                logger.info("No raw files or output settings changed since the last run, outputs are up to date")
                 return
             
-            # Create unified DataFrame
-            unified_df = self.perform_joins(all_datasets)
+            if self.schema_cache is not None:
+                self.schema_cache.save()
             
-            # Calculate KPIs with NumPy
-            kpis = self.calculate_kpis_numpy(unified_df)
+            if not all_datasets:
+                logger.error("No data files found! Please check the raw_data directory.")
+                return
             
-            # Perform aggregations with Polars
-            aggregations = self.aggregate_with_polars(unified_df)
+            # Joins, then KPIs and aggregations side by side, then saving
+            unified_df = self.stage_graph.run(self.stage_workers)['unified']
+            logger.info(self.stage_graph.report())
+            if self.result_cache is not None:
+                logger.info(f"Result cache: {self.result_cache.hits} hits, {self.result_cache.misses} misses")
             
-            # Save all results
-            self.save_results(unified_df, aggregations, kpis)
+            # Only mark inputs as processed once every output is written
+            if self.manifest is not None:
+                self.manifest.save()
             
             # Final statistics
             execution_time = time.time() - start_time
@@ -288,115 +805,115 @@ class DataPipeline:
         except Exception as e:
             logger.error(f"Pipeline failed: {e}")
             raise
+        finally:
+            if self.memory_sampler is not None:
+                self.memory_sampler.stop()
+            try:
+                self.save_profile()
+            except Exception as e:
+                logger.warning(f"Could not save the stage profile: {e}")
 
-# Sample Data Generator
-class SampleDataGenerator:
-    """Generate realistic sample datasets for the pipeline"""
-
-    def __init__(self, raw_data_path: str = "raw_data"):
-        self.raw_data_path = Path(raw_data_path)
-        self.raw_data_path.mkdir(exist_ok=True)
-    
-    def generate_sales_csv(self) -> None:
-        """Generate sales data CSV"""
-        logger.info(f"Generating sales_data.csv in {self.raw_data_path}...")
-        
-        # Generate 10,000 sales records
-        data = []
-        start_date = datetime(2023, 1, 1)
-        
-        for i in range(10000):
-            data.append({
-                'transaction_id': f'TXN_{i:06d}',
-                'customer_id': f'CUST_{random.randint(1, 2000):04d}',
-                'product_id': f'PROD_{random.randint(1, 500):03d}',
-                'sale_date': start_date + timedelta(days=random.randint(0, 365)),
-                'quantity': random.randint(1, 10),
-                'unit_price': round(random.uniform(10, 500), 2),
-                'total_amount': 0,  # Will calculate
-                'region': random.choice(['North', 'South', 'East', 'West']),
-                'sales_rep': f'REP_{random.randint(1, 50):02d}'
-            })
-        
-        # Calculate total amount
-        for record in data:
-            record['total_amount'] = round(float(record['quantity']) * float(record['unit_price']), 2)
-        
-        df = pd.DataFrame(data)
-        df.to_csv(self.raw_data_path / "sales_data.csv", index=False)
-        logger.info(f"Generated sales_data.csv with {len(data)} records")
-    
-    def generate_customers_json(self) -> None:
-        """Generate customer data JSON"""
-        logger.info("Generating customers_data.json...")
-        
-        customers = []
-        for i in range(2000):
-            customers.append({
-                'customer_id': f'CUST_{i+1:04d}',
-                'first_name': random.choice(['John', 'Jane', 'Bob', 'Alice', 'Charlie', 'Diana']),
-                'last_name': random.choice(['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia']),
-                'email': f'customer{i+1}@email.com',
-                'age': random.randint(18, 80),
-                'registration_date': (datetime(2020, 1, 1) + timedelta(days=random.randint(0, 1095))).isoformat(),
-                'customer_segment': random.choice(['Premium', 'Standard', 'Basic']),
-                'annual_spend': round(random.uniform(100, 5000), 2)
-            })
-        
-        with open(self.raw_data_path / "customers_data.json", 'w') as f:
-            json.dump(customers, f, indent=2)
-        logger.info(f"Generated customers_data.json with {len(customers)} records")
-    
-    def generate_products_parquet(self) -> None:
-        """Generate product data Parquet"""
-        logger.info("Generating products_data.parquet...")
-        
-        products = []
-        categories = ['Electronics', 'Clothing', 'Home', 'Sports', 'Books']
-        
-        for i in range(500):
-            products.append({
-                'product_id': f'PROD_{i+1:03d}',
-                'product_name': f'Product {i+1}',
-                'category': random.choice(categories),
-                'cost': round(random.uniform(5, 200), 2),
-                'price': round(random.uniform(10, 500), 2),
-                'stock_quantity': random.randint(0, 1000),
-                'supplier_id': f'SUP_{random.randint(1, 20):02d}',
-                'launch_date': datetime(2020, 1, 1) + timedelta(days=random.randint(0, 1095))
-            })
-        
-        df = pd.DataFrame(products)
-        df.to_parquet(self.raw_data_path / "products_data.parquet", index=False)
-        logger.info(f"Generated products_data.parquet with {len(products)} records")
-    
-    def generate_all_sample_data(self) -> None:
-        """Generate all sample datasets"""
-        logger.info("Generating all sample datasets...")
-        self.generate_sales_csv()
-        self.generate_customers_json()
-        self.generate_products_parquet()
-        logger.info("Sample data generation completed!")
+def parse_args() -> argparse.Namespace:
+    """Parse command line options for the pipeline run"""
+    parser = argparse.ArgumentParser(description="Multi-Format Data Pipeline")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of parallel ingestion workers (1 = sequential)")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread",
+                        help="pool type used for parallel ingestion")
+    parser.add_argument("--engine", choices=["pandas", "polars"], default="pandas",
+                        help="eager pandas stages or a single lazy Polars plan")
+    parser.add_argument("--kpis", nargs="+", default=list(DEFAULT_METRICS),
+                        help="KPI metrics per numeric column (count sum mean std min max median)")
+    parser.add_argument("--percentiles", nargs="*", type=float, default=list(DEFAULT_PERCENTILES),
+                        help="percentiles reported per numeric column")
+    parser.add_argument("--rollups", type=Path, default=None, metavar="SPEC.json",
+                        help="aggregation spec: JSON list of {name, window, metrics, by, columns} "
+                             "(default: monthly and quarterly averages)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="stream the fact file in batches of this many rows (out-of-core mode)")
+    parser.add_argument("--dtype-backend", choices=["pyarrow", "numpy_nullable"], default="pyarrow",
+                        help="Arrow-backed or NumPy nullable pandas dtypes")
+    parser.add_argument("--partition-by", nargs="*", default=[],
+                        help="Hive-partition the unified Parquet output by these columns (e.g. month region)")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE,
+                        help="maximum rows per Parquet row group")
+    parser.add_argument("--compression", default=DEFAULT_COMPRESSION,
+                        help="Parquet codec (zstd, snappy, gzip, lz4, none)")
+    parser.add_argument("--outputs", nargs="*", default=[], metavar="ARTIFACT=FMT[,FMT]",
+                        help="formats per artifact, e.g. unified=parquet to skip the unified CSV")
+    parser.add_argument("--output-workers", type=int, default=4,
+                        help="threads writing output artifacts concurrently")
+    parser.add_argument("--stage-workers", type=int, default=4,
+                        help="threads running independent pipeline stages concurrently (1 = sequential)")
+    parser.add_argument("--result-cache", type=float, nargs="?", const=DEFAULT_MAX_MB, default=None, metavar="MB",
+                        help=f"reuse KPIs/aggregations for unchanged inputs, keeping at most MB on disk (default {DEFAULT_MAX_MB})")
+    parser.add_argument("--cache-key", choices=["frame", "inputs"], default="frame",
+                        help="fingerprint the unified frame (exact) or only the raw files and settings (faster)")
+    parser.add_argument("--trace-malloc", action="store_true",
+                        help="record tracemalloc peaks per stage (slower)")
+    parser.add_argument("--sample-memory", type=float, nargs="?", const=0.05, default=None, metavar="SECONDS",
+                        help="sample RSS in a background thread every SECONDS (default 0.05)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only re-ingest raw files changed since the last run (keeps existing sample data)")
+    parser.add_argument("--skip-generate", action="store_true",
+                        help="run on the existing raw files instead of regenerating sample data")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="sample data scale factor (1 = 10,000 sales rows)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed for reproducible sample data")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="generate sample data as this many part files per dataset plus a dataset manifest")
+    parser.add_argument("--gen-workers", type=int, default=None,
+                        help="processes generating shards (default: one per CPU)")
+    return parser.parse_args()
 
 def main():
     """Main execution function"""
+    args = parse_args()
     print("🧱 Multi-Format Data Pipeline - Interview Capstone Project")
     print("=" * 60)
     
-    # Generate sample data
-    generator = SampleDataGenerator("Week2/raw_data")
-    generator.generate_all_sample_data()
+    # Generate sample data, unless it would only rewrite existing raw files (and their
+    # fingerprints) that an incremental run or the schema / result caches could reuse
+    raw_data_path = Path("Week2/raw_data")
+    has_raw_data = any(raw_files(raw_data_path, file_format) for file_format in RAW_FILE_FORMATS)
+    if has_raw_data and (args.skip_generate or args.incremental):
+        print(f"Using the existing raw files in {raw_data_path}")
+    else:
+        generator = SampleDataGenerator(str(raw_data_path), scale=args.scale, seed=args.seed)
+        if args.shards:
+            generator.generate_sharded(args.shards, args.gen_workers)
+        else:
+            generator.generate_all_sample_data()
     
     # Run the pipeline
-    pipeline = DataPipeline("Week2/raw_data", "Week2/processed")
+    pipeline = DataPipeline("Week2/raw_data", "Week2/processed",
+                            max_workers=args.workers, executor=args.executor,
+                            incremental=args.incremental, engine=args.engine,
+                            kpi_metrics=args.kpis, kpi_percentiles=args.percentiles,
+                            rollups=load_rollups(args.rollups) if args.rollups else DEFAULT_ROLLUPS,
+                            chunk_size=args.chunk_size, dtype_backend=args.dtype_backend,
+                            partition_by=args.partition_by, row_group_size=args.row_group_size,
+                            parquet_compression=args.compression,
+                            output_formats=parse_output_formats(args.outputs),
+                            output_workers=args.output_workers,
+                            trace_allocations=args.trace_malloc,
+                            memory_sample_interval=args.sample_memory,
+                            stage_workers=args.stage_workers, result_cache_mb=args.result_cache,
+                            cache_key=args.cache_key)
     pipeline.run_pipeline()
     
     print("\n✅ Pipeline execution completed!")
     print("Check the 'processed/' directory for results:")
-    print("  - unified_data.parquet/csv (joined datasets)")
+    print("  - unified_data.parquet/csv (joined datasets; unified_data/ when partitioned)")
     print("  - *_aggregation.parquet/csv (time-based aggregations)")
     print("  - kpis.json (NumPy-calculated metrics)")
-    print("  - memory_usage_log.csv (performance monitoring)")
+    print("  - stage_profile.jsonl/csv (per-stage time, memory and throughput)")
+    if args.sample_memory:
+        print("  - memory_timeline.csv (sampled RSS per stage)")
+    print("  - ingest_timings.csv (per-file read timings)")
+    if args.engine == "pandas" and not args.chunk_size:
+        print("  - stage_graph.csv (stage dependencies, timings and critical path)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""
+Declarative aggregation spec
+============================
+Describes the time rollups written next to the unified data:
+- A Rollup names a window (day, week, month, quarter, year, quarter_of_year
+  or rolling_<N>d), optional group-by dimensions (e.g. region, category),
+  the metrics (sum, mean, min, max, count, median, std) and the metric
+  columns (default: the first three numeric columns)
+- Specs load from a JSON list of objects with the same fields
+- Every rollup is a lazy Polars plan over the same input; collecting them
+  together with pl.collect_all evaluates the shared input once and runs the
+  group-bys on Polars' thread pool
+- Rolling windows and the chunked pipeline work on mergeable partial states
+  (per-key sums, counts, mins and maxes), so median and std are only
+  available for calendar windows over an in-memory frame
+"""
+
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import polars as pl
+
+logger = logging.getLogger(__name__)
+
+# Calendar windows and their Polars truncation intervals
+CALENDAR_WINDOWS = {'day': '1d', 'week': '1w', 'month': '1mo', 'quarter': '1q', 'year': '1y'}
+# Quarter number 1-4 across years (the original quarterly rollup)
+QUARTER_OF_YEAR = 'quarter_of_year'
+ROLLING_WINDOW = re.compile(r'^rolling_(\d+)d$')
+
+METRICS = ('sum', 'mean', 'min', 'max', 'count', 'median', 'std')
+# Metrics that can be combined from per-chunk / per-day partial states
+MERGEABLE_METRICS = ('sum', 'mean', 'min', 'max', 'count')
+# Output column suffixes that differ from the metric name
+METRIC_LABELS = {'mean': 'avg'}
+DEFAULT_METRIC_COLUMNS = 3
+
+
+class Rollup(NamedTuple):
+    """One aggregation: a time window, optional dimensions and metrics per column"""
+    name: str
+    window: str
+    metrics: Tuple[str, ...] = ('mean',)
+    by: Tuple[str, ...] = ()
+    columns: Optional[Tuple[str, ...]] = None
+    date_col: Optional[str] = None
+
+
+# Monthly averages/sums and quarter-of-year averages, as before the spec existed
+DEFAULT_ROLLUPS = (
+    Rollup('monthly', 'month', metrics=('mean', 'sum')),
+    Rollup('quarterly', QUARTER_OF_YEAR),
+)
+
+
+def rolling_days(window: str) -> Optional[int]:
+    """N for a rolling_<N>d window, None for calendar windows"""
+    match = ROLLING_WINDOW.match(window)
+    return int(match.group(1)) if match else None
+
+
+def key_column(rollup: Rollup) -> str:
+    """Name of the period column in a rollup's output"""
+    if rollup.window == QUARTER_OF_YEAR:
+        return 'quarter'
+    if rolling_days(rollup.window) is not None:
+        return 'date'
+    return rollup.window
+
+
+def parse_rollup(spec: Dict[str, Any]) -> Rollup:
+    """Validate one spec entry, e.g. {"name": "weekly", "window": "week", "by": ["region"]}"""
+    unknown = set(spec) - set(Rollup._fields)
+    if unknown:
+        raise ValueError(f"Unknown rollup fields {sorted(unknown)}, expected {list(Rollup._fields)}")
+    if 'name' not in spec or 'window' not in spec:
+        raise ValueError(f"Rollup spec needs a name and a window: {spec}")
+    window = spec['window']
+    if window not in CALENDAR_WINDOWS and window != QUARTER_OF_YEAR and not rolling_days(window):
+        raise ValueError(f"Unknown window {window!r}, expected one of {list(CALENDAR_WINDOWS)}, "
+                         f"{QUARTER_OF_YEAR!r} or rolling_<N>d")
+    metrics = tuple(spec.get('metrics', Rollup._field_defaults['metrics']))
+    unsupported = [metric for metric in metrics if metric not in METRICS]
+    if unsupported:
+        raise ValueError(f"Unsupported metrics {unsupported} in rollup {spec['name']!r}, expected {list(METRICS)}")
+    if rolling_days(window) and not set(metrics) <= set(MERGEABLE_METRICS):
+        raise ValueError(f"Rolling rollup {spec['name']!r} supports only {list(MERGEABLE_METRICS)}")
+    columns = spec.get('columns')
+    return Rollup(name=spec['name'], window=window, metrics=metrics, by=tuple(spec.get('by', ())),
+                  columns=tuple(columns) if columns is not None else None, date_col=spec.get('date_col'))
+
+
+def load_rollups(path: Path) -> List[Rollup]:
+    """Read a JSON list of rollup specs"""
+    with open(path, 'r') as f:
+        specs = json.load(f)
+    rollups = [parse_rollup(spec) for spec in specs]
+    names = [rollup.name for rollup in rollups]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Rollup names must be unique, got {names}")
+    return rollups
+
+
+def resolve_columns(rollup: Rollup, schema: pl.Schema) -> Tuple[Optional[str], List[str]]:
+    """Date column and metric columns a rollup uses on this schema ((None, []) if it cannot run)"""
+    date_cols = [name for name, dtype in schema.items() if isinstance(dtype, (pl.Datetime, pl.Date))]
+    date_col = rollup.date_col or (date_cols[0] if date_cols else None)
+    if rollup.columns is not None:
+        columns = list(rollup.columns)
+    else:
+        numeric = [name for name, dtype in schema.items() if dtype.is_numeric() and name not in rollup.by]
+        columns = numeric[:DEFAULT_METRIC_COLUMNS]
+    missing = [col for col in [date_col, *columns, *rollup.by] if col is not None and col not in schema]
+    if missing:
+        raise ValueError(f"Rollup {rollup.name!r} refers to missing columns {missing}")
+    return date_col, columns
+
+
+def window_expr(rollup: Rollup, date_col: str) -> pl.Expr:
+    """Period key of each row; rolling windows are built on days"""
+    if rollup.window == QUARTER_OF_YEAR:
+        expr = pl.col(date_col).dt.quarter()
+    elif rolling_days(rollup.window) is not None:
+        expr = pl.col(date_col).dt.truncate('1d')
+    else:
+        expr = pl.col(date_col).dt.truncate(CALENDAR_WINDOWS[rollup.window])
+    return expr.alias(key_column(rollup))
+
+
+def metric_expr(col: str, metric: str) -> pl.Expr:
+    """Aggregate of one column named <col>_<label>"""
+    expr = pl.col(col)
+    expr = expr.count() if metric == 'count' else getattr(expr, metric)()
+    return expr.alias(f"{col}_{METRIC_LABELS.get(metric, metric)}")
+
+
+def partial_rollup(lf: pl.LazyFrame, rollup: Rollup, date_col: str, columns: Sequence[str]) -> pl.LazyFrame:
+    """Mergeable state per period key and dimension: <col>__sum/__count/__min/__max"""
+    keys = [key_column(rollup), *rollup.by]
+    return (
+        lf
+        .with_columns(window_expr(rollup, date_col))
+        .group_by(keys)
+        .agg([
+            agg
+            for col in columns
+            for agg in (pl.col(col).sum().alias(f"{col}__sum"), pl.col(col).count().alias(f"{col}__count"),
+                        pl.col(col).min().alias(f"{col}__min"), pl.col(col).max().alias(f"{col}__max"))
+        ])
+    )
+
+
+def merge_partials(states: Iterable[pl.DataFrame], rollup: Rollup) -> pl.DataFrame:
+    """Combine partial states computed on separate chunks"""
+    keys = [key_column(rollup), *rollup.by]
+    combined = pl.concat(list(states), how='vertical_relaxed')
+    aggs = []
+    for col in combined.columns:
+        if col.endswith('__sum') or col.endswith('__count'):
+            aggs.append(pl.col(col).sum())
+        elif col.endswith('__min'):
+            aggs.append(pl.col(col).min())
+        elif col.endswith('__max'):
+            aggs.append(pl.col(col).max())
+    return combined.group_by(keys).agg(aggs)
+
+
+def finalize_rollup(state: pl.LazyFrame, rollup: Rollup, columns: Sequence[str]) -> pl.LazyFrame:
+    """Rollup output from a partial state, applying the rolling window if there is one"""
+    key = key_column(rollup)
+    days = rolling_days(rollup.window)
+    if days is not None:
+        state = (
+            state
+            .sort([*rollup.by, key])
+            .rolling(index_column=key, period=f"{days}d", group_by=list(rollup.by) or None)
+            .agg([
+                agg
+                for col in columns
+                for agg in (pl.col(f"{col}__sum").sum(), pl.col(f"{col}__count").sum(),
+                            pl.col(f"{col}__min").min(), pl.col(f"{col}__max").max())
+            ])
+        )
+    finals = {
+        'sum': lambda col: pl.col(f"{col}__sum"),
+        'count': lambda col: pl.col(f"{col}__count"),
+        'mean': lambda col: pl.col(f"{col}__sum") / pl.col(f"{col}__count"),
+        'min': lambda col: pl.col(f"{col}__min"),
+        'max': lambda col: pl.col(f"{col}__max"),
+    }
+    return (
+        state
+        .select([key, *rollup.by] + [
+            finals[metric](col).alias(f"{col}_{METRIC_LABELS.get(metric, metric)}")
+            for metric in rollup.metrics for col in columns
+        ])
+        .sort([key, *rollup.by])
+    )
+
+
+def build_rollup(lf: pl.LazyFrame, rollup: Rollup, date_col: str, columns: Sequence[str]) -> pl.LazyFrame:
+    """Lazy plan for one rollup over an in-memory or scanned frame"""
+    if rolling_days(rollup.window) is not None:
+        return finalize_rollup(partial_rollup(lf, rollup, date_col, columns), rollup, columns)
+    keys = [key_column(rollup), *rollup.by]
+    return (
+        lf
+        .with_columns(window_expr(rollup, date_col))
+        .group_by(keys)
+        .agg([metric_expr(col, metric) for metric in rollup.metrics for col in columns])
+        .sort(keys)
+    )
+
+
+def build_rollups(lf: pl.LazyFrame, rollups: Sequence[Rollup] = DEFAULT_ROLLUPS) -> Dict[str, pl.LazyFrame]:
+    """Lazy plans for every rollup that can run on lf's schema, to be collected together"""
+    schema = lf.collect_schema()
+    plans = {}
+    for rollup in rollups:
+        date_col, columns = resolve_columns(rollup, schema)
+        if date_col is None or not columns:
+            logger.warning(f"Skipping rollup {rollup.name}: no date or metric columns")
+            continue
+        plans[rollup.name] = build_rollup(lf, rollup, date_col, columns)
+    return plans
@@ -0,0 +1,243 @@
+"""
+CSV export
+==========
+Shared CSV writer for processed outputs, replacing DataFrame.to_csv:
+- Frames are handed to Polars' multi-threaded CSV writer through Arrow,
+  chunk_size rows at a time, so only one converted slice is alive at once
+- By default pandas frames come out as to_csv writes them: date-only
+  datetimes when every time is midnight, True/False booleans, empty strings
+  as empty fields and Python float reprs; float formatting can instead be
+  chosen explicitly (fixed decimals or scientific)
+- engine='pandas' keeps the plain to_csv path as a reference / fallback
+- Run this file directly to check both engines write the same file and
+  benchmark them on a synthetic frame
+"""
+
+import argparse
+import csv
+import io
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 250_000
+NS_PER_DAY = 86_400 * 10 ** 9
+# Python's float repr switches to an exponent below this magnitude, Polars only further down
+REPR_EXPONENT_BELOW = 1e-4
+
+
+def naive_datetime_format(series: pd.Series, dates_only: bool = True) -> str:
+    """strftime format to_csv uses for a naive datetime64 column.
+
+    Dates only when every value is at midnight (unless dates_only=False),
+    otherwise seconds with the fewest fraction digits (0, 3, 6 or 9) that
+    keep every value exact.
+    """
+    ns = series.dropna().to_numpy(dtype='datetime64[ns]').view('int64')
+    if dates_only and (ns % NS_PER_DAY == 0).all():
+        return '%Y-%m-%d'
+    digits = next(digits for digits in (0, 3, 6, 9) if (ns % 10 ** (9 - digits) == 0).all())
+    return '%Y-%m-%d %H:%M:%S' + (f'%.{digits}f' if digits else '')
+
+
+def naive_datetime_columns(df: pd.DataFrame) -> List[str]:
+    """Columns holding naive timestamps (datetime64 or Arrow timestamp without a zone)"""
+    return [str(name) for name, dtype in df.dtypes.items()
+            if pd.api.types.is_datetime64_any_dtype(dtype) and getattr(dtype, 'tz', None) is None
+            and not (isinstance(dtype, pd.ArrowDtype) and pa.types.is_date(dtype.pyarrow_dtype))]
+
+
+def to_csv_style(df: pd.DataFrame, index: bool,
+                 datetime_fmt: Union[str, Dict[str, str], None]) -> Dict[str, pl.Expr]:
+    """Per-column Polars expressions that make write_csv match to_csv's text, decided on the whole frame"""
+    frame = df.reset_index() if index else df
+    exprs = {}
+    for name, series in frame.items():
+        col = pl.col(str(name))
+        if pd.api.types.is_bool_dtype(series.dtype):
+            exprs[str(name)] = pl.when(col).then(pl.lit('True')).when(col.not_()).then(pl.lit('False'))
+        elif pd.api.types.is_datetime64_any_dtype(series.dtype) and not (
+                isinstance(series.dtype, pd.ArrowDtype) and pa.types.is_date(series.dtype.pyarrow_dtype)):
+            fmt = datetime_fmt.get(str(name)) if isinstance(datetime_fmt, dict) else datetime_fmt
+            if fmt:
+                exprs[str(name)] = col.dt.to_string(fmt)
+            elif series.dt.tz is None:
+                # Naive Arrow timestamps get the datetime64 format too, so the text does not depend on
+                # the dtype backend
+                exprs[str(name)] = col.dt.to_string(naive_datetime_format(series))
+            else:
+                # Zoned timestamps are written value by value like str(Timestamp): fraction digits only
+                # on values that have them
+                fmt = '%Y-%m-%d %H:%M:%S{}%:z'
+                exprs[str(name)] = (pl.when(col.dt.truncate('1s') == col).then(col.dt.to_string(fmt.format('')))
+                                    .when(col.dt.nanosecond() % 1000 == 0).then(col.dt.to_string(fmt.format('%.6f')))
+                                    .otherwise(col.dt.to_string(fmt.format('%.9f'))))
+        elif pd.api.types.is_string_dtype(series.dtype) or isinstance(series.dtype, pd.CategoricalDtype):
+            # Polars quotes empty strings, to_csv writes them like missing values
+            text = col.cast(pl.String)
+            exprs[str(name)] = pl.when(text != '').then(text)
+    return exprs
+
+
+def repr_float_columns(df: pd.DataFrame, index: bool, float_precision: Optional[int]) -> List[str]:
+    """Float columns holding values Polars would not format like Python's repr (e.g. 1e-05)"""
+    if float_precision is not None:
+        return []
+    frame = df.reset_index() if index else df
+    columns = []
+    for name, series in frame.items():
+        if pd.api.types.is_float_dtype(series.dtype):
+            values = np.abs(series.to_numpy(dtype='float64', na_value=np.nan))
+            if ((values > 0) & (values < REPR_EXPONENT_BELOW)).any():
+                columns.append(str(name))
+    return columns
+
+
+def header_line(df: pd.DataFrame, index: bool) -> bytes:
+    """to_csv's header row: csv-module quoting, unnamed index levels as empty fields"""
+    names = ([name if name is not None else '' for name in df.index.names] if index else []) + list(df.columns)
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerow(names)
+    return buffer.getvalue().encode()
+
+
+def _to_polars(df: pd.DataFrame, index: bool, style: Dict[str, pl.Expr], repr_columns: List[str]) -> pl.DataFrame:
+    """Arrow conversion of a pandas slice with to_csv's text for the styled columns"""
+    if index:
+        df = df.reset_index(names=[name if name is not None else '' for name in df.index.names])
+    df = df.set_axis(map(str, df.columns), axis=1)
+    if repr_columns:
+        df = df.assign(**{col: df[col].map(lambda value: repr(float(value)), na_action='ignore').astype(object)
+                          for col in repr_columns})
+    out = pl.from_arrow(pa.Table.from_pandas(df, preserve_index=False))
+    # Polars names blank columns column_<i>; restore the original headers
+    out = out.rename(dict(zip(out.columns, df.columns)))
+    return out.with_columns(**style) if style else out
+
+
+def write_csv(df: Union[pd.DataFrame, pl.DataFrame], path: Union[str, Path], index: bool = False,
+              chunk_size: int = DEFAULT_CHUNK_SIZE, float_precision: Optional[int] = None,
+              float_scientific: Optional[bool] = None, datetime_format: Union[str, Dict[str, str], None] = None,
+              append: bool = False, engine: str = 'polars') -> int:
+    """Write a pandas or Polars frame to CSV and return the number of rows written.
+
+    Pandas frames get the same text to_csv would write unless a float or
+    datetime format is given; float_precision fixes the number of decimals; float_scientific forces
+    (True) or disables (False) scientific notation. datetime_format may also
+    map column names to formats, e.g. to keep appended chunks of one file
+    consistent; other datetime columns keep the default. Columns Arrow cannot
+    represent (mixed-type objects) fall back to the pandas writer.
+    append=True adds the rows to an existing file without a header.
+    """
+    if engine not in ('polars', 'pandas'):
+        raise ValueError(f"engine must be 'polars' or 'pandas', got {engine!r}")
+    path = Path(path)
+    column_formats = datetime_format if isinstance(datetime_format, dict) else {}
+    options = {'float_precision': float_precision, 'float_scientific': float_scientific,
+               'datetime_format': None if column_formats else datetime_format}
+
+    if isinstance(df, pl.DataFrame):
+        if engine == 'pandas':
+            df = df.to_pandas()
+        else:
+            with open(path, 'ab' if append else 'wb') as f:
+                df.with_columns(pl.col(name).dt.to_string(fmt) for name, fmt in column_formats.items()).write_csv(
+                    f, include_header=not append, **options)
+            return df.height
+
+    if engine == 'pandas':
+        float_format = f"%.{float_precision}{'e' if float_scientific else 'f'}" if float_precision is not None else None
+        if column_formats:
+            df = df.assign(**{name: df[name].dt.strftime(fmt) for name, fmt in column_formats.items()})
+        df.to_csv(path, index=index, float_format=float_format, date_format=options['datetime_format'],
+                  mode='a' if append else 'w', header=not append)
+        return len(df)
+
+    if any(pd.api.types.is_timedelta64_dtype(dtype) for dtype in df.dtypes):
+        # Polars cannot write durations; to_csv writes them as '1 days 02:00:00'
+        return write_csv(df, path, index=index, float_precision=float_precision, float_scientific=float_scientific,
+                         datetime_format=datetime_format, append=append, engine='pandas')
+
+    style = to_csv_style(df, index, datetime_format)
+    repr_columns = repr_float_columns(df, index, float_precision)
+    try:
+        with open(path, 'ab' if append else 'wb') as f:
+            if not append:
+                f.write(header_line(df, index))
+            # The csv module quotes the empty field of a one-column row
+            null_value = '""' if len(df.columns) + (df.index.nlevels if index else 0) == 1 else ''
+            for start in range(0, max(len(df), 1), chunk_size):
+                _to_polars(df.iloc[start:start + chunk_size], index, style, repr_columns).write_csv(
+                    f, include_header=False, null_value=null_value, **options)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        logger.warning(f"Arrow cannot convert {path.name} ({e}), writing it with pandas")
+        return write_csv(df, path, index=index, float_precision=float_precision, float_scientific=float_scientific,
+                         datetime_format=datetime_format, append=append, engine='pandas')
+    logger.debug(f"Wrote {len(df)} rows to {path} in chunks of {chunk_size}")
+    return len(df)
+
+
+def benchmark(rows: int = 1_000_000, output_dir: Path = Path('.'), repeats: int = 3) -> Dict[str, float]:
+    """Best-of-repeats seconds to export a mixed-type frame with to_csv and write_csv"""
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        'id': np.arange(rows),
+        'region': pd.Categorical(rng.choice(['North', 'South', 'East', 'West'], rows)),
+        'product': rng.choice(['Laptop', 'Chair', 'Shirt', 'Rice'], rows).astype(str),
+        'price': rng.uniform(1, 2000, rows),
+        'quantity': rng.integers(1, 10, rows),
+        'order_date': pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365, rows), unit='D'),
+    })
+
+    cases = {
+        'pandas to_csv': lambda path: df.to_csv(path, index=False),
+        'write_csv polars': lambda path: write_csv(df, path),
+        'write_csv polars float_precision=2': lambda path: write_csv(df, path, float_precision=2),
+    }
+    # Timings only compare like with like: each write_csv case must reproduce its to_csv file
+    references = {
+        'write_csv polars': lambda path: df.to_csv(path, index=False),
+        'write_csv polars float_precision=2': lambda path: df.to_csv(path, index=False, float_format='%.2f'),
+    }
+    for name, reference in references.items():
+        expected_path = Path(output_dir) / 'csv_export_expected.csv'
+        actual_path = Path(output_dir) / 'csv_export_actual.csv'
+        reference(expected_path)
+        cases[name](actual_path)
+        same = expected_path.read_bytes() == actual_path.read_bytes()
+        expected_path.unlink()
+        actual_path.unlink()
+        if not same:
+            raise AssertionError(f"{name} does not write the same CSV as to_csv")
+
+    results = {}
+    for name, run in cases.items():
+        path = Path(output_dir) / 'csv_export_benchmark.csv'
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run(path)
+            timings.append(time.perf_counter() - start)
+        results[name] = min(timings)
+        path.unlink(missing_ok=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CSV export paths")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    results = benchmark(args.rows, repeats=args.repeats)
+    baseline = results['pandas to_csv']
+    for name, seconds in results.items():
+        print(f"{name:<36} {seconds:8.3f}s  {baseline / seconds:5.1f}x")
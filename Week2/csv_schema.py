@@ -0,0 +1,246 @@
+"""
+Read-time CSV schemas
+=====================
+Decides column dtypes before a CSV file is parsed so that the first
+materialization is already the compact one:
+- A schema is inferred from a leading sample of rows (or passed explicitly)
+- Low-cardinality strings become 'category', ISO dates become datetimes,
+  integers/floats use the nullable Int64/Float64 dtypes
+- The schema is handed straight to the parser, preferring the Arrow engine;
+  Int64 columns are left to the parser, which widens them to floats when a
+  row past the sample holds a fraction, and a file that still does not fit
+  its sampled schema is re-inferred from every row
+- Chosen schemas and category vocabularies are cached on disk, keyed by a
+  file fingerprint, so unchanged files skip inference on repeat runs
+- Schemas use logical dtype names; dtype_backend='pyarrow' decodes them into
+  Arrow-backed pandas dtypes instead of NumPy/nullable ones
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# dtype string used in schemas for columns parsed as dates
+DATETIME_DTYPE = 'datetime64[ns]'
+
+# Logical schema dtypes decoded as Arrow-backed pandas dtypes
+ARROW_DTYPES = {
+    'Int64': pd.ArrowDtype(pa.int64()),
+    'Float64': pd.ArrowDtype(pa.float64()),
+    'boolean': pd.ArrowDtype(pa.bool_()),
+    'string': pd.ArrowDtype(pa.string()),
+    'str': pd.ArrowDtype(pa.string()),
+    DATETIME_DTYPE: pd.ArrowDtype(pa.timestamp('us')),
+}
+
+
+def arrow_types_mapper(arrow_type: pa.DataType):
+    """types_mapper for Table.to_pandas: Arrow-backed dtypes, except dictionaries stay pandas categoricals"""
+    if pa.types.is_dictionary(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
+
+
+def infer_dtype(series: pd.Series, category_threshold: float = 0.5) -> str:
+    """Pick the compact dtype for one sampled column"""
+    if pd.api.types.is_bool_dtype(series):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(series):
+        return 'Int64'
+    if pd.api.types.is_float_dtype(series):
+        # Whole-number floats stay floats: a later row may hold a fraction
+        return 'Float64'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return DATETIME_DTYPE
+
+    non_null = series.dropna()
+    if len(non_null) == 0:
+        return 'string'
+
+    parsed = pd.to_datetime(non_null, format='ISO8601', errors='coerce')
+    if parsed.notna().all():
+        return DATETIME_DTYPE
+
+    if non_null.nunique() / len(non_null) < category_threshold:
+        return 'category'
+    return 'string'
+
+
+def infer_csv_schema(file_path: Path, sample_rows: Optional[int] = 10_000,
+                     category_threshold: float = 0.5) -> Dict[str, str]:
+    """Infer a {column: dtype} schema from the first sample_rows rows of a CSV file (all rows if None)"""
+    sample = pd.read_csv(file_path, nrows=sample_rows)
+    schema = {col: infer_dtype(sample[col], category_threshold) for col in sample.columns}
+    logger.debug(f"Inferred schema for {Path(file_path).name} from {len(sample)} rows: {schema}")
+    return schema
+
+
+def schema_dtypes(schema: Dict[str, str], categories: Optional[Dict[str, List]] = None,
+                  dtype_backend: str = 'numpy_nullable') -> Dict:
+    """Turn a schema into pandas dtypes, pinning known category vocabularies.
+
+    With the NumPy backend date columns are left out (they go through parse_dates);
+    with the pyarrow backend they decode straight into timestamp[us].
+    """
+    categories = categories or {}
+    dtypes = {}
+    for col, dtype in schema.items():
+        if dtype == 'category':
+            dtypes[col] = pd.CategoricalDtype(categories[col]) if col in categories else 'category'
+        elif dtype_backend == 'pyarrow':
+            dtypes[col] = ARROW_DTYPES.get(dtype, dtype)
+        elif dtype != DATETIME_DTYPE:
+            dtypes[col] = dtype
+    return dtypes
+
+
+def parse_dtypes(schema: Dict[str, str], categories: Optional[Dict[str, List]] = None,
+                 dtype_backend: str = 'numpy_nullable') -> Dict:
+    """schema_dtypes for the CSV parser, without the Int64 columns.
+
+    Forcing Int64 on a column whose later rows hold fractions either fails or,
+    with the Arrow engine and NumPy-backed output, truncates the fractions; left
+    to the parser, whole-number columns still come back as (nullable) int64.
+    """
+    dtypes = schema_dtypes(schema, categories, dtype_backend)
+    return {col: dtype for col, dtype in dtypes.items() if schema.get(col) != 'Int64'}
+
+
+def apply_schema(df: pd.DataFrame, schema: Dict[str, str], categories: Optional[Dict[str, List]] = None,
+                 dtype_backend: str = 'numpy_nullable') -> pd.DataFrame:
+    """Cast an already loaded DataFrame to a schema (used for non-CSV sources)"""
+    dtypes = {col: dtype for col, dtype in schema_dtypes(schema, categories, dtype_backend).items()
+              if col in df.columns}
+    df = df.astype(dtypes)
+    if dtype_backend != 'pyarrow':
+        for col, dtype in schema.items():
+            if dtype == DATETIME_DTYPE and col in df.columns:
+                df[col] = pd.to_datetime(df[col], format='ISO8601')
+    return df
+
+
+def read_csv_with_schema(file_path: Path, schema: Dict[str, str], engine: str = 'pyarrow',
+                         categories: Optional[Dict[str, List]] = None,
+                         dtype_backend: str = 'numpy_nullable') -> pd.DataFrame:
+    """Read a CSV file decoding every column straight into its schema dtype.
+
+    If the file does not fit the schema (e.g. a date column with a non-date
+    value past the sample), the schema is re-inferred from every row and the
+    file read again rather than failing the whole source.
+    """
+    def read(schema: Dict[str, str], engine: str) -> pd.DataFrame:
+        options = {'dtype': parse_dtypes(schema, categories, dtype_backend), 'dtype_backend': dtype_backend}
+        if dtype_backend != 'pyarrow':
+            options['parse_dates'] = [col for col, dtype in schema.items() if dtype == DATETIME_DTYPE]
+        return pd.read_csv(file_path, engine=engine, **options)
+
+    try:
+        return read(schema, engine)
+    except (ImportError, ValueError, TypeError) as e:
+        if engine != 'c':
+            logger.warning(f"{engine} engine could not read {Path(file_path).name} ({e}), "
+                           f"falling back to the C engine")
+            try:
+                return read(schema, 'c')
+            except (ValueError, TypeError) as c_error:
+                e = c_error
+        logger.warning(f"{Path(file_path).name} does not fit its schema ({e}); re-inferring it from every row")
+        return read(infer_csv_schema(file_path, sample_rows=None), 'c')
+
+
+def file_fingerprint(file_path: Path, header_bytes: int = 4096) -> str:
+    """Fingerprint a file by size, modification time and a hash of its header"""
+    stat = Path(file_path).stat()
+    with open(file_path, 'rb') as f:
+        header_hash = hashlib.sha1(f.read(header_bytes)).hexdigest()
+    return f"{stat.st_size}:{stat.st_mtime_ns}:{header_hash}"
+
+
+def arrow_logical_dtype(arrow_type: pa.DataType) -> str:
+    """Logical schema name for an Arrow type, so cached schemas work with either backend"""
+    if pa.types.is_integer(arrow_type):
+        return 'Int64'
+    if pa.types.is_floating(arrow_type):
+        return 'Float64'
+    if pa.types.is_boolean(arrow_type):
+        return 'boolean'
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        return DATETIME_DTYPE
+    if pa.types.is_dictionary(arrow_type):
+        return 'category'
+    return 'string'
+
+
+def schema_from_frame(df: pd.DataFrame) -> Dict:
+    """Capture the dtypes and category vocabularies of a loaded DataFrame"""
+    columns, categories = {}, {}
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            columns[col] = 'category'
+            categories[col] = dtype.categories.tolist()
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            columns[col] = DATETIME_DTYPE
+        elif isinstance(dtype, pd.ArrowDtype):
+            columns[col] = arrow_logical_dtype(dtype.pyarrow_dtype)
+        else:
+            columns[col] = str(dtype)
+    return {'columns': columns, 'categories': categories}
+
+
+class SchemaCache:
+    """
+    Persistent schema store keyed by file path
+    Each entry remembers the file fingerprint it was built from, so a
+    changed file is treated as a miss and re-inferred
+    """
+
+    def __init__(self, cache_path: Path):
+        self.cache_path = Path(cache_path)
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+
+        if self.cache_path.exists():
+            try:
+                with open(self.cache_path, 'r') as f:
+                    self.entries = json.load(f)
+                logger.info(f"Loaded {len(self.entries)} cached schemas from {self.cache_path}")
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable schema cache {self.cache_path}: {e}")
+
+    @staticmethod
+    def _key(file_path: Path) -> str:
+        return str(Path(file_path).resolve())
+
+    def lookup(self, file_path: Path) -> Optional[Dict]:
+        """Return the cached schema for an unchanged file, or None"""
+        entry = self.entries.get(self._key(file_path))
+        if entry is None or entry['fingerprint'] != file_fingerprint(file_path):
+            return None
+        logger.info(f"Schema cache hit for {Path(file_path).name}")
+        return entry
+
+    def store(self, file_path: Path, df: pd.DataFrame) -> None:
+        """Remember the schema a file was decoded into"""
+        self.entries[self._key(file_path)] = {
+            'fingerprint': file_fingerprint(file_path),
+            **schema_from_frame(df)
+        }
+        self.dirty = True
+
+    def save(self) -> None:
+        """Write the cache back to disk if anything changed"""
+        if not self.dirty:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.cache_path, 'w') as f:
+            json.dump(self.entries, f, indent=2, default=str)
+        self.dirty = False
+        logger.info(f"Saved {len(self.entries)} schemas to {self.cache_path}")
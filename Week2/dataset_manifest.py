@@ -0,0 +1,104 @@
+"""
+Multi-file dataset manifest
+===========================
+Describes raw datasets that are split over several part files (e.g. the
+shards written by SampleDataGenerator.generate_sharded):
+- raw_data/dataset_manifest.json maps each dataset name to its format and
+  its part files (relative paths, in order) with their row counts
+- When the manifest exists the pipeline ingests exactly the listed parts and
+  concatenates them per dataset instead of globbing raw_data
+- Part files keep unique names (sales_data-00003.csv) so per-file schema and
+  incremental caches still work
+"""
+
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from output_sinks import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DATASET_MANIFEST = "dataset_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def write_dataset_manifest(raw_data_path: Path, datasets: Dict[str, Dict[str, Any]], **info) -> Path:
+    """Atomically write raw_data/dataset_manifest.json.
+
+    datasets maps name -> {'format': ..., 'files': [{'path': relative path, 'rows': n}, ...]};
+    info (seed, shards, ...) is stored alongside for provenance.
+    """
+    raw_data_path = Path(raw_data_path)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'created': datetime.now().isoformat(),
+        **info,
+        'datasets': {
+            name: {**dataset, 'rows': sum(part['rows'] for part in dataset['files'])}
+            for name, dataset in datasets.items()
+        },
+    }
+
+    def write(path: Path) -> None:
+        with open(path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    path = atomic_write(raw_data_path / DATASET_MANIFEST, write)
+    logger.info(f"Wrote dataset manifest for {len(datasets)} datasets to {path}")
+    return path
+
+
+def read_dataset_manifest(raw_data_path: Path) -> Optional[List[Tuple[Path, str, str]]]:
+    """(part path, format, dataset name) for every listed part, or None without a manifest"""
+    manifest_path = Path(raw_data_path) / DATASET_MANIFEST
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported dataset manifest version {manifest.get('version')!r} in {manifest_path}")
+
+    parts = []
+    for name, dataset in manifest['datasets'].items():
+        for part in dataset['files']:
+            file_path = Path(raw_data_path) / part['path']
+            if not file_path.exists():
+                raise FileNotFoundError(f"{manifest_path.name} lists missing part {file_path}")
+            parts.append((file_path, dataset['format'], name))
+    return parts
+
+
+def concat_parts(parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate the part frames of one dataset, keeping categorical columns categorical.
+
+    Parts read separately carry their own category sets (or may not be
+    categorical at all), which plain pd.concat would turn into object columns.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    parts = list(parts)
+    for col in parts[0].columns:
+        is_category = [isinstance(part[col].dtype, pd.CategoricalDtype) for part in parts]
+        if all(is_category):
+            categories = pd.Index(pd.unique(pd.concat([part[col].cat.categories.to_series() for part in parts])))
+            for i, part in enumerate(parts):
+                if not part[col].cat.categories.equals(categories):
+                    parts[i] = part.assign(**{col: part[col].cat.set_categories(categories)})
+        elif any(is_category):
+            dtype = next(part[col].dtype for part, category in zip(parts, is_category) if not category)
+            parts = [part.assign(**{col: part[col].astype(dtype)}) if category else part
+                     for part, category in zip(parts, is_category)]
+    return pd.concat(parts, ignore_index=True)
+
+
+def group_parts(frames: Iterable[Tuple[str, pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
+    """{dataset: frame} from (dataset, part frame) pairs given in part order"""
+    grouped: Dict[str, List[pd.DataFrame]] = {}
+    for name, df in frames:
+        grouped.setdefault(name, []).append(df)
+    return {name: concat_parts(parts) for name, parts in grouped.items()}
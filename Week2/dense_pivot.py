@@ -0,0 +1,214 @@
+"""
+Dense pivot engine
+==================
+pd.pivot_table replacement for low-cardinality dimensions (Region x
+Category x Month and the like):
+- Every index / column dimension is encoded to integer codes (category
+  codes or a sorted factorize), and the codes are combined into one flat
+  cell number with np.ravel_multi_index
+- One reduction over the flat cell numbers fills a preallocated array:
+  np.bincount for counts and float sums, np.add.at for exact integer sums;
+  means are sum / count
+- The flat array is reshaped into the index x column grid; combinations
+  that never occur are dropped like pivot_table does, and empty cells get
+  fill_value
+- benchmark() times it against pd.pivot_table on the same frame
+
+Run from the repository root to benchmark on replicated mock sales data:
+    python Week2/dense_pivot.py --scales 1 10 100
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+AGGFUNCS = ('sum', 'count', 'mean')
+# Largest grid (product of dimension cardinalities) the engine allocates
+DEFAULT_MAX_CELLS = 10_000_000
+# Integer dimensions spanning fewer values than this are encoded as offsets
+MAX_INTEGER_RANGE = 1 << 16
+
+MOCK_SALES = Path(__file__).resolve().with_name("mock_sales_data.csv")
+
+
+def encode(series: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Integer codes (-1 for missing) and the sorted distinct values they index.
+
+    Categories are used as they are; small-range integers are offsets from the
+    minimum (unused values are dropped with the empty pivot rows / columns);
+    strings go through Arrow's dictionary encoding, which beats a hash
+    factorize of Python objects.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), pd.CategoricalIndex(series.cat.categories, dtype=series.dtype,
+                                                                name=series.name)
+    if pd.api.types.is_integer_dtype(series.dtype) and isinstance(series.dtype, np.dtype) and len(series):
+        values = series.to_numpy()
+        low, high = values.min(), values.max()
+        if high - low < MAX_INTEGER_RANGE:
+            return values - low, pd.Index(np.arange(low, high + 1, dtype=series.dtype), name=series.name)
+    if pd.api.types.is_string_dtype(series.dtype):
+        try:
+            array = pa.array(series, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            array = None  # mixed Python objects
+        if isinstance(array, pa.ChunkedArray):
+            array = array.combine_chunks()
+        if array is not None and (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+            encoded = pc.dictionary_encode(array)
+            order = pc.sort_indices(encoded.dictionary).to_numpy()
+            rank = np.empty(len(order) + 1, dtype=np.intp)
+            rank[order] = np.arange(len(order))
+            rank[-1] = -1
+            codes = rank[encoded.indices.fill_null(-1).to_numpy()]
+            uniques = encoded.dictionary.take(order).to_numpy(zero_copy_only=False)
+            # object columns of strings come back from pivot_table with an inferred string level
+            dtype = series.dtype if series.dtype != object else None
+            return codes, pd.Index(uniques, dtype=dtype, name=series.name)
+    codes, uniques = pd.factorize(series, sort=True)
+    return codes, pd.Index(uniques, name=series.name)
+
+
+def grid_index(levels: List[pd.Index]) -> pd.Index:
+    """Index over every combination of levels, in ravel_multi_index order"""
+    if len(levels) == 1:
+        return levels[0]
+    return pd.MultiIndex.from_product(levels)
+
+
+def dense_pivot(df: pd.DataFrame, values: str, index: Union[str, Sequence[str]],
+                columns: Union[str, Sequence[str]], aggfunc: str = 'sum', fill_value: Any = None,
+                max_cells: int = DEFAULT_MAX_CELLS) -> pd.DataFrame:
+    """pd.pivot_table(df, values, index, columns, aggfunc, fill_value) for sum, count or mean"""
+    if aggfunc not in AGGFUNCS:
+        raise ValueError(f"aggfunc must be one of {list(AGGFUNCS)}, got {aggfunc!r}")
+    index = [index] if isinstance(index, str) else list(index)
+    columns = [columns] if isinstance(columns, str) else list(columns)
+
+    encoded = [encode(df[dim]) for dim in index + columns]
+    shape = tuple(len(levels) for _, levels in encoded)
+    n_cells = int(np.prod(shape))
+    if n_cells > max_cells:
+        raise ValueError(f"{n_cells} pivot cells exceed max_cells={max_cells}; use pd.pivot_table")
+
+    # Flat cell number per row; rows with a missing key belong to no cell
+    cells = np.zeros(len(df), dtype=np.int32 if n_cells < 2 ** 31 else np.int64)
+    for (code, _), size in zip(encoded, shape):
+        cells *= size
+        cells += code
+    missing = [code < 0 for code, _ in encoded if len(code) and code.min() < 0]
+    keyed = ~np.logical_or.reduce(missing) if missing else slice(None)
+    if missing:
+        cells = cells[keyed]
+
+    column = df[values]
+    is_integer = pd.api.types.is_integer_dtype(column.dtype) and not column.hasnans
+    if is_integer:
+        vals = column.to_numpy(dtype='int64')[keyed]
+        valid = slice(None)
+    else:
+        vals = column.to_numpy(dtype='float64', na_value=np.nan)[keyed]
+        valid = ~np.isnan(vals)
+
+    count = np.bincount(cells[valid], minlength=n_cells)
+    occupied = count > 0 if is_integer or valid.all() else np.bincount(cells, minlength=n_cells) > 0
+    if aggfunc == 'count':
+        result = count
+    elif is_integer and aggfunc == 'sum':
+        result = np.zeros(n_cells, dtype=np.int64)
+        np.add.at(result, cells, vals)
+    else:
+        result = np.bincount(cells[valid], weights=vals[valid], minlength=n_cells)
+        if aggfunc == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = result / count
+
+    # Keep only index / column combinations that occur, like pivot_table
+    n_rows = int(np.prod(shape[:len(index)]))
+    used = occupied.reshape(n_rows, -1)
+    row_mask, col_mask = used.any(axis=1), used.any(axis=0)
+    grid = result.reshape(n_rows, -1)[row_mask][:, col_mask]
+    empty = ~used[row_mask][:, col_mask]
+    if aggfunc == 'mean':
+        empty |= np.isnan(grid)
+    if empty.any():
+        grid = np.where(empty, np.nan if fill_value is None else fill_value, grid)
+
+    pivot = pd.DataFrame(
+        grid,
+        index=grid_index([levels for _, levels in encoded[:len(index)]])[row_mask],
+        columns=grid_index([levels for _, levels in encoded[len(index):]])[col_mask],
+    )
+    # Nullable and Arrow-backed values aggregate to the dtype groupby would give them
+    result_dtype = column.iloc[:0].groupby(np.empty(0, dtype=np.intp)).agg(aggfunc).dtype
+    if not isinstance(result_dtype, np.dtype):
+        pivot = pivot.astype(result_dtype)
+    return pivot
+
+
+def best_of(fn, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def benchmark(df: pd.DataFrame, values: str, index: Sequence[str], columns: Union[str, Sequence[str]],
+              aggfuncs: Sequence[str] = AGGFUNCS, repeats: int = 5) -> pd.DataFrame:
+    """Best-of-repeats seconds of pd.pivot_table vs dense_pivot per aggfunc, after checking they agree"""
+    rows = []
+    dims = 'category' if isinstance(df[index[0]].dtype, pd.CategoricalDtype) else str(df[index[0]].dtype)
+    for aggfunc in aggfuncs:
+        expected = pd.pivot_table(df, values=values, index=index, columns=columns, aggfunc=aggfunc, fill_value=0)
+        actual = dense_pivot(df, values, index, columns, aggfunc, fill_value=0)
+        pd.testing.assert_frame_equal(actual, expected)
+
+        pivot_s = best_of(lambda: pd.pivot_table(df, values=values, index=index, columns=columns,
+                                                 aggfunc=aggfunc, fill_value=0), repeats)
+        dense_s = best_of(lambda: dense_pivot(df, values, index, columns, aggfunc, fill_value=0), repeats)
+        rows.append({'aggfunc': aggfunc, 'rows': len(df), 'dims': dims, 'pivot_table_s': round(pivot_s, 5),
+                     'dense_pivot_s': round(dense_s, 5), 'speedup': round(pivot_s / dense_s, 1)})
+    return pd.DataFrame(rows)
+
+
+def load_mock_sales() -> pd.DataFrame:
+    """mock_sales_data.csv with the Month column 1_Practice.py pivots on"""
+    df = pd.read_csv(MOCK_SALES, parse_dates=['OrderDate'])
+    df['Month'] = df['OrderDate'].dt.month
+    return df
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark dense_pivot against pd.pivot_table")
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10],
+                        help="copies of the 50k-row mock sales data to pivot")
+    parser.add_argument("--aggfuncs", nargs="+", choices=list(AGGFUNCS), default=list(AGGFUNCS))
+    parser.add_argument("--repeats", type=int, default=5)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    base = load_mock_sales()
+    results = []
+    for scale in args.scales:
+        df = pd.concat([base] * scale, ignore_index=True) if scale > 1 else base
+        results.append(benchmark(df, 'Sales', ['Region', 'Category'], 'Month', args.aggfuncs, args.repeats))
+        # Categorical dimensions (1_Practice.py's memory optimization) skip the string encoding
+        df = df.astype({'Region': 'category', 'Category': 'category'})
+        results.append(benchmark(df, 'Sales', ['Region', 'Category'], 'Month', args.aggfuncs, args.repeats))
+    print(pd.concat(results, ignore_index=True).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""
+Streaming top-N and heavy hitters
+=================================
+Rank keys (products, customers, ...) by summed value or frequency while
+reading record batches, without holding the rows or sorting every group:
+- Each batch is pre-aggregated (factorize + np.bincount), so the operators
+  see one (key, weight) pair per distinct key and batch
+- StreamingTopN: exact totals per key; the top n are picked with a bounded
+  heap (heapq.nlargest) instead of a full sort of the groups
+- SpaceSaving: at most `capacity` counters; every estimate overcounts by at
+  most its recorded error, and any key it dropped has a total of at most
+  the smallest counter (<= total weight / capacity)
+- CountMinTopN: a depth x width Count-Min sketch plus a small candidate pool;
+  estimates overcount by at most epsilon x total weight with probability
+  1 - delta
+- result() returns RankedKey tuples with lower/upper bounds on the true
+  total; `guaranteed` marks keys whose lower bound beats every other key's
+  upper bound (certainly in the true top n)
+
+Weights must be non-negative for the approximate operators.
+
+Run from the repository root, e.g. on the capstone's sample data:
+    python Week2/heavy_hitters.py Week2/raw_data/sales_data.csv --key product_id --value total_amount --check
+"""
+
+import argparse
+import heapq
+import logging
+import math
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from out_of_core import iter_raw_chunks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPACITY = 1000
+DEFAULT_EPSILON = 0.001
+DEFAULT_DELTA = 0.01
+# Count-Min candidate pool size per requested key
+CANDIDATE_FACTOR = 4
+DEFAULT_BATCH_ROWS = 100_000
+
+
+class RankedKey(NamedTuple):
+    """One ranked key with bounds on its true total"""
+    key: Any
+    estimate: float
+    lower: float
+    upper: float
+    guaranteed: bool
+
+
+def as_numpy(values: Any) -> np.ndarray:
+    """1-D NumPy view of a pandas / Polars Series, Arrow array or sequence"""
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        return values.to_numpy(zero_copy_only=False)
+    if hasattr(values, 'to_numpy'):
+        return values.to_numpy()
+    return np.asarray(values)
+
+
+def aggregate_batch(keys: Any, weights: Any = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct non-null keys of a batch and their summed weights (counts when weights is None)"""
+    codes, uniques = pd.factorize(as_numpy(keys))
+    valid = codes >= 0
+    if weights is not None:
+        weights = as_numpy(weights).astype('float64')
+        valid &= ~np.isnan(weights)
+        weights = weights[valid]
+    sums = np.bincount(codes[valid], weights=weights, minlength=len(uniques))
+    return np.asarray(uniques, dtype=object), sums
+
+
+def ranked(items: Iterable[Tuple[Any, float, float, float]], n: int, largest: bool = True,
+           unlisted: float = 0.0) -> List[RankedKey]:
+    """Top n of (key, estimate, lower, upper) by estimate, flagging keys certainly in the top n.
+
+    For largest, a key is guaranteed when its lower bound is at least every
+    other key's upper bound, including `unlisted`, the bound on keys the
+    summary no longer holds; for smallest, when its upper bound is at most
+    every other key's lower bound.
+    """
+    items = list(items)
+    select = heapq.nlargest if largest else heapq.nsmallest
+    top = select(n, range(len(items)), key=lambda i: items[i][1])
+    chosen = set(top)
+    if largest:
+        threshold = max([items[i][3] for i in range(len(items)) if i not in chosen] + [unlisted])
+        return [RankedKey(*items[i], items[i][2] >= threshold) for i in top]
+    threshold = min((items[i][2] for i in range(len(items)) if i not in chosen), default=math.inf)
+    return [RankedKey(*items[i], items[i][3] <= threshold) for i in top]
+
+
+class StreamingTopN:
+    """
+    Exact per-key totals over a stream of batches
+    Memory grows with the number of distinct keys, not rows; selection keeps
+    a heap of n entries instead of sorting all groups
+    """
+
+    def __init__(self, n: int = 10, largest: bool = True):
+        self.n = n
+        self.largest = largest
+        self.totals: Dict[Any, float] = {}
+        self.total_weight = 0.0
+
+    def update(self, keys: Any, weights: Any = None) -> None:
+        uniques, sums = aggregate_batch(keys, weights)
+        totals = self.totals
+        for key, weight in zip(uniques.tolist(), sums.tolist()):
+            totals[key] = totals.get(key, 0.0) + weight
+        self.total_weight += float(sums.sum())
+
+    def result(self) -> List[RankedKey]:
+        return ranked(((key, total, total, total) for key, total in self.totals.items()), self.n, self.largest)
+
+    def bounds(self) -> Dict[str, Any]:
+        return {'method': 'exact', 'keys': len(self.totals), 'total_weight': self.total_weight,
+                'max_error': 0.0, 'confidence': 1.0}
+
+
+class SpaceSaving:
+    """
+    Weighted Space-Saving summary with a fixed number of counters
+    A new key evicts the smallest counter and inherits its count as error,
+    so count - error <= true total <= count for every monitored key
+    """
+
+    def __init__(self, n: int = 10, capacity: int = DEFAULT_CAPACITY):
+        if capacity < n:
+            raise ValueError(f"capacity ({capacity}) must be at least n ({n})")
+        self.n = n
+        self.capacity = capacity
+        self.counts: Dict[Any, float] = {}
+        self.errors: Dict[Any, float] = {}
+        # (count, tiebreak, key) min-heap; entries go stale when a count grows and are skipped on pop
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._pushes = 0
+        self.total_weight = 0.0
+
+    def _push(self, key: Any) -> None:
+        self._pushes += 1
+        heapq.heappush(self._heap, (self.counts[key], self._pushes, key))
+
+    def _pop_min(self) -> Any:
+        while True:
+            count, _, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                return key
+
+    def update(self, keys: Any, weights: Any = None) -> None:
+        uniques, sums = aggregate_batch(keys, weights)
+        if len(sums) and sums.min() < 0:
+            raise ValueError("Space-Saving needs non-negative weights")
+        self.total_weight += float(sums.sum())
+        counts, errors = self.counts, self.errors
+        for key, weight in zip(uniques.tolist(), sums.tolist()):
+            if key in counts:
+                counts[key] += weight
+            elif len(counts) < self.capacity:
+                counts[key], errors[key] = weight, 0.0
+            else:
+                evicted = self._pop_min()
+                floor = counts.pop(evicted)
+                errors.pop(evicted)
+                counts[key], errors[key] = floor + weight, floor
+            self._push(key)
+        # Drop stale heap entries once they outnumber the live ones
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, i, key) for i, (key, count) in enumerate(counts.items())]
+            heapq.heapify(self._heap)
+
+    def min_count(self) -> float:
+        """Upper bound on the total of any key that is not monitored"""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0.0
+
+    def result(self) -> List[RankedKey]:
+        items = [(key, count, count - self.errors[key], count) for key, count in self.counts.items()]
+        return ranked(items, self.n, unlisted=self.min_count())
+
+    def bounds(self) -> Dict[str, Any]:
+        return {'method': 'space_saving', 'keys': len(self.counts), 'total_weight': self.total_weight,
+                'max_error': self.total_weight / self.capacity, 'confidence': 1.0}
+
+
+class CountMinTopN:
+    """
+    Count-Min sketch of per-key totals plus a candidate pool for the top n
+    width = e / epsilon and depth = ln(1 / delta) bound the overcount of any
+    key by epsilon x total weight with probability 1 - delta; `guaranteed`
+    compares candidates only, since keys dropped from the pool are not tracked
+    """
+
+    def __init__(self, n: int = 10, epsilon: float = DEFAULT_EPSILON, delta: float = DEFAULT_DELTA,
+                 seed: int = 0):
+        self.n = n
+        self.epsilon = epsilon
+        self.delta = delta
+        # Width rounded up to a power of two for multiply-shift hashing
+        self.width_bits = max(1, math.ceil(math.log2(math.e / epsilon)))
+        self.depth = max(1, math.ceil(math.log(1 / delta)))
+        self.table = np.zeros((self.depth, 1 << self.width_bits))
+        rng = np.random.default_rng(seed)
+        self.multipliers = rng.integers(1, 2 ** 63, size=self.depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.pool = CANDIDATE_FACTOR * n
+        self.candidates: Dict[Any, np.uint64] = {}
+        self.total_weight = 0.0
+
+    def _columns(self, hashes: np.ndarray) -> np.ndarray:
+        """depth x len(hashes) counter positions"""
+        return (self.multipliers[:, None] * hashes[None, :]) >> np.uint64(64 - self.width_bits)
+
+    def estimate(self, hashes: np.ndarray) -> np.ndarray:
+        rows = np.arange(self.depth)[:, None]
+        return self.table[rows, self._columns(hashes)].min(axis=0)
+
+    def update(self, keys: Any, weights: Any = None) -> None:
+        uniques, sums = aggregate_batch(keys, weights)
+        if len(sums) and sums.min() < 0:
+            raise ValueError("Count-Min needs non-negative weights")
+        self.total_weight += float(sums.sum())
+        hashes = pd.util.hash_array(uniques)
+        for row, columns in enumerate(self._columns(hashes)):
+            self.table[row] += np.bincount(columns.astype(np.intp), weights=sums, minlength=self.table.shape[1])
+
+        # Re-rank this batch's keys together with the current candidates
+        pool_keys = list(self.candidates) + [key for key in uniques.tolist() if key not in self.candidates]
+        pool_hashes = np.concatenate([np.fromiter(self.candidates.values(), dtype=np.uint64, count=len(self.candidates)),
+                                      hashes[[key not in self.candidates for key in uniques.tolist()]]])
+        estimates = self.estimate(pool_hashes)
+        keep = np.argsort(-estimates, kind='stable')[:self.pool]
+        self.candidates = {pool_keys[i]: pool_hashes[i] for i in keep}
+
+    def result(self) -> List[RankedKey]:
+        keys = list(self.candidates)
+        estimates = self.estimate(np.fromiter(self.candidates.values(), dtype=np.uint64, count=len(keys)))
+        slack = self.epsilon * self.total_weight
+        items = [(key, float(estimate), max(0.0, float(estimate) - slack), float(estimate))
+                 for key, estimate in zip(keys, estimates)]
+        return ranked(items, self.n)
+
+    def bounds(self) -> Dict[str, Any]:
+        return {'method': 'count_min', 'keys': len(self.candidates), 'total_weight': self.total_weight,
+                'max_error': self.epsilon * self.total_weight, 'confidence': 1 - self.delta,
+                'sketch': f"{self.depth}x{self.table.shape[1]}"}
+
+
+METHODS = {'exact': StreamingTopN, 'space_saving': SpaceSaving, 'count_min': CountMinTopN}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Streaming top-N / heavy hitters of a raw data file")
+    parser.add_argument("path", type=Path, help="CSV, JSON or Parquet file")
+    parser.add_argument("--key", required=True, help="column to rank")
+    parser.add_argument("--value", default=None, help="column to sum per key (default: count rows)")
+    parser.add_argument("-n", type=int, default=10)
+    parser.add_argument("--method", choices=list(METHODS), default='space_saving')
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="Space-Saving counters")
+    parser.add_argument("--epsilon", type=float, default=DEFAULT_EPSILON, help="Count-Min relative error")
+    parser.add_argument("--delta", type=float, default=DEFAULT_DELTA, help="Count-Min failure probability")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument("--check", action="store_true", help="also compute the exact ranking and compare")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    options = {'space_saving': {'capacity': args.capacity},
+               'count_min': {'epsilon': args.epsilon, 'delta': args.delta}}.get(args.method, {})
+    operators = [METHODS[args.method](args.n, **options)]
+    if args.check and args.method != 'exact':
+        operators.append(StreamingTopN(args.n))
+
+    file_format = args.path.suffix.lstrip('.').replace('ndjson', 'json')
+    for chunk in iter_raw_chunks(args.path, file_format, args.batch_rows):
+        for operator in operators:
+            operator.update(chunk[args.key], chunk[args.value] if args.value else None)
+
+    result = pd.DataFrame(operators[0].result())
+    if len(operators) > 1:
+        exact = operators[1]
+        result['true'] = [exact.totals.get(key) for key in result['key']]
+        result['in_true_top'] = result['key'].isin([ranked_key.key for ranked_key in exact.result()])
+    print(result.to_string(index=False))
+    print(f"\nBounds: {operators[0].bounds()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
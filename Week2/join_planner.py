@@ -0,0 +1,143 @@
+"""
+Key-aware join planner
+======================
+Plans and executes the star joins of the pipeline deterministically:
+- Join keys are declared (e.g. customer_id, product_id) or detected as
+  shared columns that uniquely identify rows of a dimension
+- The largest dataset is the fact table; dimensions are joined smallest first
+- Dimensions are broadcast as hash maps; for categorical keys the lookup is
+  done once per category and mapped through the codes, not once per row
+- The fact table is never copied up front; new columns are gathered by position
+"""
+
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+
+logger = logging.getLogger(__name__)
+
+
+class JoinStep(NamedTuple):
+    """One planned join of a dimension onto the unified frame"""
+    name: str
+    key: str
+    rows: int
+
+
+def detect_key(fact_columns: List[str], dim: pd.DataFrame,
+               declared_keys: Optional[List[str]] = None) -> Optional[str]:
+    """Pick the column joining a dimension onto the fact columns.
+
+    Declared keys win in the order given; otherwise shared columns that are
+    unique in the dimension are considered, preferring *_id columns, then by name.
+    """
+    shared = [col for col in dim.columns if col in fact_columns]
+    if declared_keys:
+        for key in declared_keys:
+            if key in shared:
+                return key
+
+    candidates = sorted(shared, key=lambda col: (not col.endswith('_id'), col))
+    for col in candidates:
+        if dim[col].is_unique:
+            return col
+    return candidates[0] if candidates else None
+
+
+def detect_key_by_name(fact_columns: List[str], dim_columns: List[str],
+                       declared_keys: Optional[List[str]] = None) -> Optional[str]:
+    """Pick a join key from column names alone, for plans built before any data is read"""
+    shared = [col for col in dim_columns if col in fact_columns]
+    if declared_keys:
+        for key in declared_keys:
+            if key in shared:
+                return key
+    candidates = sorted(shared, key=lambda col: (not col.endswith('_id'), col))
+    return candidates[0] if candidates else None
+
+
+def order_joins(columns: Dict[str, List[str]], sizes: Dict[str, int],
+                choose_key: Callable[[str, List[str]], Optional[str]],
+                fact: Optional[str] = None) -> Tuple[str, List[JoinStep]]:
+    """Order dimension joins smallest first from column lists and size estimates.
+
+    choose_key(name, available_columns) returns the key for a dimension or None.
+    A dimension whose key only appears in another dimension is scheduled after
+    the dimension that brings that key in.
+    """
+    if fact is None:
+        fact = max(sorted(columns), key=lambda name: sizes[name])
+
+    available = list(columns[fact])
+    pending = sorted((name for name in columns if name != fact), key=lambda name: (sizes[name], name))
+    steps: List[JoinStep] = []
+
+    while pending:
+        for name in pending:
+            key = choose_key(name, available)
+            if key is not None:
+                steps.append(JoinStep(name, key, sizes[name]))
+                available.extend(col for col in columns[name] if col != key)
+                pending.remove(name)
+                break
+        else:
+            for name in pending:
+                logger.warning(f"No common columns found for {name}, skipping join")
+            break
+
+    return fact, steps
+
+
+def plan_joins(datasets: Dict[str, pd.DataFrame], fact: Optional[str] = None,
+               declared_keys: Optional[List[str]] = None) -> Tuple[str, List[JoinStep]]:
+    """Return (fact_name, [JoinStep, ...]) for in-memory DataFrames"""
+    return order_joins(
+        columns={name: list(df.columns) for name, df in datasets.items()},
+        sizes={name: len(df) for name, df in datasets.items()},
+        choose_key=lambda name, available: detect_key(available, datasets[name], declared_keys),
+        fact=fact
+    )
+
+
+def _lookup_positions(keys: pd.Series, dim_index: pd.Index) -> np.ndarray:
+    """Map each fact key to a dimension row position (-1 when missing)"""
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        category_positions = dim_index.get_indexer(keys.cat.categories)
+        codes = keys.cat.codes.to_numpy()
+        return np.where(codes >= 0, category_positions[codes], -1)
+    return dim_index.get_indexer(keys)
+
+
+def broadcast_join(left: pd.DataFrame, dim: pd.DataFrame, key: str, suffix: str) -> pd.DataFrame:
+    """Left-join a dimension with unique keys by gathering its rows by position"""
+    dim_index = pd.Index(dim[key])
+    positions = _lookup_positions(left[key], dim_index)
+
+    new_columns = {}
+    for col in dim.columns:
+        if col == key:
+            continue
+        out_name = f"{col}{suffix}" if col in left.columns else col
+        values = take(dim[col].array, positions, allow_fill=True)
+        new_columns[out_name] = pd.Series(values, index=left.index, name=out_name)
+
+    return pd.concat([left, pd.DataFrame(new_columns, index=left.index)], axis=1)
+
+
+def execute_joins(datasets: Dict[str, pd.DataFrame], fact: str, steps: List[JoinStep],
+                  log_level: int = logging.INFO) -> pd.DataFrame:
+    """Run a join plan, broadcasting unique-key dimensions and merging the rest"""
+    unified = datasets[fact]
+    for step in steps:
+        dim = datasets[step.name]
+        suffix = f"_{step.name}"
+        if dim[step.key].is_unique:
+            unified = broadcast_join(unified, dim, step.key, suffix)
+            logger.log(log_level, f"Joined {step.name} on column '{step.key}' (broadcast, {step.rows} rows)")
+        else:
+            unified = unified.merge(dim, on=step.key, how='left', suffixes=('', suffix))
+            logger.log(log_level, f"Joined {step.name} on column '{step.key}' (hash merge, key not unique)")
+    return unified
@@ -0,0 +1,183 @@
+"""
+Streaming JSON reader
+=====================
+Reads large JSON files without loading the whole text or the full Python
+object tree into memory:
+- Top-level JSON arrays are decoded element by element from buffered chunks
+- Newline-delimited JSON (NDJSON / JSON Lines) is decoded line by line
+- Any other top-level JSON object (e.g. pandas' column-oriented output) is
+  read whole with pd.read_json, as before streaming existed
+- Records are grouped into fixed-size batches and turned into typed Arrow
+  columns straight away, so only one batch of Python dicts is alive at a time
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Iterator, List
+
+import pandas as pd
+import pyarrow as pa
+
+from csv_schema import arrow_types_mapper
+
+logger = logging.getLogger(__name__)
+
+NDJSON_SUFFIXES = {'.ndjson', '.jsonl'}
+_WHITESPACE = ' \t\n\r'
+
+
+def _first_char(file_path: Path) -> str:
+    """Return the first non-whitespace character of a text file"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            chunk = f.read(1024)
+            if not chunk:
+                return ''
+            stripped = chunk.lstrip(_WHITESPACE)
+            if stripped:
+                return stripped[0]
+
+
+def _looks_like_ndjson(file_path: Path) -> bool:
+    """True if the first non-empty line is a complete JSON object that reads as a record.
+
+    A file that is a single line holding only nested objects / arrays is
+    taken for a column-oriented table (pandas' default to_json output).
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        lines = (line for line in f if line.strip())
+        first = next(lines, None)
+        if first is None:
+            return False
+        try:
+            record = json.loads(first)
+        except json.JSONDecodeError:
+            return False
+        if not isinstance(record, dict):
+            return False
+        if next(lines, None) is not None:
+            return True
+        return not record or not all(isinstance(value, (dict, list)) for value in record.values())
+
+
+def is_ndjson(file_path: Path) -> bool:
+    """Detect newline-delimited JSON by suffix, else by a first line that is a whole record"""
+    if file_path.suffix.lower() in NDJSON_SUFFIXES:
+        return True
+    return _first_char(file_path) == '{' and _looks_like_ndjson(file_path)
+
+
+def is_json_array(file_path: Path) -> bool:
+    """Detect a top-level JSON array"""
+    return _first_char(file_path) == '['
+
+
+def iter_ndjson_records(file_path: Path) -> Iterator[dict]:
+    """Yield one record per non-empty line of an NDJSON file"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {line_no} of {file_path.name}: {e}") from e
+
+
+def iter_json_array_records(file_path: Path, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """Yield the elements of a top-level JSON array one at a time.
+
+    The file is read in chunk_size pieces; only the undecoded tail of the
+    buffer is kept between reads.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = f.read(chunk_size).lstrip(_WHITESPACE)
+        if not buffer.startswith('['):
+            raise ValueError(f"{file_path.name} does not contain a top-level JSON array")
+        pos = 1
+        eof = False
+
+        while True:
+            # Skip whitespace and element separators
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE + ',':
+                pos += 1
+
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+
+            if pos >= len(buffer):
+                buffer, pos = f.read(chunk_size), 0
+                if not buffer:
+                    raise ValueError(f"Unterminated JSON array in {file_path.name}")
+                continue
+
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                record, end = None, None
+
+            # A value touching the end of the buffer may have been cut short
+            if end is None or (end == len(buffer) and not eof):
+                more = f.read(chunk_size)
+                if not more:
+                    if end is None:
+                        raise ValueError(f"Malformed JSON element in {file_path.name} near offset {pos}")
+                    eof = True
+                    continue
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+
+            yield record
+            pos = end
+
+
+def iter_json_records(file_path: Path) -> Iterator[dict]:
+    """Yield records from either a JSON array file or an NDJSON file"""
+    file_path = Path(file_path)
+    if is_ndjson(file_path):
+        return iter_ndjson_records(file_path)
+    return iter_json_array_records(file_path)
+
+
+def iter_json_batches(file_path: Path, batch_size: int = 5000) -> Iterator[pa.Table]:
+    """Group streamed records into Arrow tables of at most batch_size rows"""
+    file_path = Path(file_path)
+    if not is_ndjson(file_path) and not is_json_array(file_path):
+        # Other top-level objects have no record stream to follow; pandas decodes them whole
+        table = pa.Table.from_pandas(pd.read_json(file_path), preserve_index=False)
+        logger.debug(f"{file_path.name} is not a JSON array or NDJSON, read it with pd.read_json")
+        for batch in table.to_batches(max_chunksize=batch_size):
+            yield pa.Table.from_batches([batch])
+        return
+
+    batch: List[dict] = []
+    for record in iter_json_records(file_path):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield pa.Table.from_pylist(batch)
+            batch = []
+    if batch:
+        yield pa.Table.from_pylist(batch)
+
+
+def read_json_streaming(file_path: Path, batch_size: int = 5000,
+                        dtype_backend: str = 'numpy_nullable') -> pd.DataFrame:
+    """Read a JSON array or NDJSON file into a DataFrame with bounded peak memory.
+
+    dtype_backend='pyarrow' wraps the Arrow columns in pd.ArrowDtype without converting them.
+    """
+    file_path = Path(file_path)
+    tables = list(iter_json_batches(file_path, batch_size))
+    if not tables:
+        return pd.DataFrame()
+
+    # Batches may disagree on types (e.g. all-null or int vs float columns)
+    table = pa.concat_tables(tables, promote_options='permissive')
+    logger.debug(f"Streamed {table.num_rows} records from {file_path.name} in {len(tables)} batches")
+    if dtype_backend == 'pyarrow':
+        return table.to_pandas(types_mapper=arrow_types_mapper)
+    return table.to_pandas()
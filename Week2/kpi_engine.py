@@ -0,0 +1,128 @@
+"""
+Vectorized KPI engine
+=====================
+Computes per-column KPIs for every numeric column at once:
+- All numeric columns are stacked into one 2D float array with a NaN mask
+- count/sum/mean/std/min/max are column-wise reductions over that array
+- Every requested quantile (median included) comes from a single
+  np.partition call, interpolated linearly like np.percentile
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_METRICS = ('count', 'sum', 'mean', 'std', 'min', 'max', 'median')
+DEFAULT_METRICS = ('mean', 'std', 'median')
+DEFAULT_PERCENTILES = (95,)
+
+
+def percentile_label(p: float) -> str:
+    """95 -> '95th_percentile', 1 -> '1st_percentile', 99.9 -> '99.9th_percentile'"""
+    text = f"{p:g}"
+    suffix = 'th'
+    if float(p).is_integer() and int(p) % 100 not in (11, 12, 13):
+        suffix = {1: 'st', 2: 'nd', 3: 'rd'}.get(int(p) % 10, 'th')
+    return f"{text}{suffix}_percentile"
+
+
+def stack_numeric(df: pd.DataFrame, columns: Sequence[str]) -> np.ndarray:
+    """Copy numeric columns into one column-major (rows, columns) float64 array, missing values as NaN"""
+    values = np.empty((len(df), len(columns)), dtype=np.float64, order="F")
+    for j, col in enumerate(columns):
+        values[:, j] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+    return values
+
+
+def column_quantiles(values: np.ndarray, counts: np.ndarray, qs: Sequence[float]) -> np.ndarray:
+    """Linear-interpolated quantiles per column from one np.partition call.
+
+    NaNs are partitioned to the end of each column, so column j only uses its
+    first counts[j] positions. Returns an array of shape (len(qs), columns).
+    """
+    n_cols = values.shape[1]
+    result = np.full((len(qs), n_cols), np.nan)
+    valid = counts > 0
+    if not qs or not valid.any():
+        return result
+
+    # Fractional positions per (quantile, column)
+    positions = np.outer(qs, np.maximum(counts - 1, 0))
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+    kth = np.unique(np.concatenate([lower[:, valid].ravel(), upper[:, valid].ravel()]))
+
+    partitioned = np.partition(values, kth, axis=0)
+    cols = np.arange(n_cols)
+    low_vals = partitioned[lower, cols]
+    high_vals = partitioned[upper, cols]
+    result[:, valid] = (low_vals + (high_vals - low_vals) * (positions - lower))[:, valid]
+    return result
+
+
+def compute_kpis(df: pd.DataFrame, metrics: Iterable[str] = DEFAULT_METRICS,
+                 percentiles: Iterable[float] = DEFAULT_PERCENTILES,
+                 columns: Optional[Sequence[str]] = None) -> Dict[str, float]:
+    """Return {'<col>_<metric>': value} for every numeric column in a single pass.
+
+    Columns with no non-missing values are skipped.
+    """
+    metrics = list(metrics)
+    percentiles = list(percentiles)
+    unknown = set(metrics) - set(SUPPORTED_METRICS)
+    if unknown:
+        raise ValueError(f"Unsupported KPI metrics: {sorted(unknown)}")
+    if any(not 0 <= p <= 100 for p in percentiles):
+        raise ValueError("Percentiles must be between 0 and 100")
+
+    if columns is None:
+        columns = list(df.select_dtypes(include=[np.number]).columns)
+    if not columns:
+        return {}
+
+    values = stack_numeric(df, columns)
+    mask = np.isnan(values)
+    counts = (~mask).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sums = np.where(mask, 0.0, values).sum(axis=0)
+        means = sums / counts
+        centered = np.where(mask, 0.0, values - means)
+        stds = np.sqrt((centered * centered).sum(axis=0) / counts)
+    del centered
+
+    results: Dict[str, np.ndarray] = {}
+    if 'count' in metrics:
+        results['count'] = counts
+    if 'sum' in metrics:
+        results['sum'] = sums
+    if 'mean' in metrics:
+        results['mean'] = means
+    if 'std' in metrics:
+        results['std'] = stds
+    if 'min' in metrics:
+        results['min'] = np.where(mask, np.inf, values).min(axis=0)
+    if 'max' in metrics:
+        results['max'] = np.where(mask, -np.inf, values).max(axis=0)
+
+    qs = ([0.5] if 'median' in metrics else []) + [p / 100 for p in percentiles]
+    quantiles = column_quantiles(values, counts, qs)
+    if 'median' in metrics:
+        results['median'] = quantiles[0]
+    for i, p in enumerate(percentiles, start=len(qs) - len(percentiles)):
+        results[percentile_label(p)] = quantiles[i]
+
+    # Keep the requested order per column, columns in frame order
+    order: List[str] = metrics + [percentile_label(p) for p in percentiles]
+
+    kpis = {}
+    for j, col in enumerate(columns):
+        if counts[j] == 0:
+            continue
+        for name in order:
+            kpis[f'{col}_{name}'] = float(results[name][j])
+    logger.debug(f"Computed {len(kpis)} KPIs over {len(columns)} columns and {len(df)} rows")
+    return kpis
@@ -0,0 +1,291 @@
+"""
+Out-of-core building blocks
+===========================
+Pieces used by DataPipeline's chunked mode, where the fact file is streamed
+in bounded batches instead of being loaded whole:
+- Chunk readers for CSV, JSON / NDJSON and Parquet raw files
+- StreamingKPIs: mergeable count/sum/mean/std/min/max state plus a bounded
+  bottom-k random sample for the median and percentiles
+- StreamingRollup: an aggregation spec rollup kept as mergeable per-period
+  sums, counts, mins and maxes
+- StreamingUnifiedWriter: appends enriched chunks to the unified Parquet/CSV
+  (flat file or Hive-partitioned dataset)
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from aggregation_spec import (MERGEABLE_METRICS, Rollup, finalize_rollup, merge_partials, partial_rollup,
+                              resolve_columns)
+from csv_export import naive_datetime_columns, naive_datetime_format, write_csv
+from csv_schema import DATETIME_DTYPE, apply_schema, arrow_types_mapper, infer_csv_schema, parse_dtypes
+from json_stream import iter_json_batches
+from kpi_engine import DEFAULT_METRICS, DEFAULT_PERCENTILES, column_quantiles, percentile_label
+from output_sinks import commit_path, discard_path, temp_path_for
+from parquet_output import DEFAULT_COMPRESSION, DEFAULT_ROW_GROUP_SIZE, write_partitioned_dataset
+
+logger = logging.getLogger(__name__)
+
+
+def iter_raw_chunks(file_path: Path, file_format: str, chunk_size: int,
+                    schema: Optional[Dict[str, str]] = None,
+                    categories: Optional[Dict[str, List]] = None,
+                    schema_sample_rows: int = 10_000,
+                    dtype_backend: str = 'numpy_nullable') -> Iterator[pd.DataFrame]:
+    """Yield a raw file as DataFrames of at most chunk_size rows.
+
+    Category columns without a known vocabulary are read as strings, because
+    per-chunk categories would not line up between chunks.
+    """
+    if file_format == 'csv':
+        if schema is None:
+            schema = infer_csv_schema(file_path, schema_sample_rows)
+        categories = categories or {}
+        schema = {col: 'string' if dtype == 'category' and col not in categories else dtype
+                  for col, dtype in schema.items()}
+        date_cols = [col for col, dtype in schema.items() if dtype == DATETIME_DTYPE]
+        options = {'dtype': parse_dtypes(schema, categories, dtype_backend), 'dtype_backend': dtype_backend}
+        if dtype_backend != 'pyarrow':
+            options['parse_dates'] = date_cols
+        yield from pd.read_csv(file_path, chunksize=chunk_size, **options)
+    elif file_format == 'json':
+        for table in iter_json_batches(file_path, chunk_size):
+            df = table.to_pandas(types_mapper=arrow_types_mapper if dtype_backend == 'pyarrow' else None)
+            yield apply_schema(df, schema, categories, dtype_backend) if schema else df
+    elif file_format == 'parquet':
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas(types_mapper=arrow_types_mapper if dtype_backend == 'pyarrow' else None)
+    else:
+        raise ValueError(f"Unsupported file format: {file_format}")
+
+
+class StreamingKPIs:
+    """
+    Mergeable KPI state over a fixed set of numeric columns
+    Moments are combined with Chan's parallel update; quantiles come from a
+    bottom-k sample by random priority, exact while rows <= sample_size
+    """
+
+    def __init__(self, columns: Sequence[str], sample_size: int = 100_000, seed: int = 42):
+        n_cols = len(columns)
+        self.columns = list(columns)
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+        self.count = np.zeros(n_cols)
+        self.sum = np.zeros(n_cols)
+        self.mean = np.zeros(n_cols)
+        self.m2 = np.zeros(n_cols)
+        self.min = np.full(n_cols, np.inf)
+        self.max = np.full(n_cols, -np.inf)
+        self.sample_keys = np.empty(0)
+        self.sample_values = np.empty((0, n_cols))
+        self.rows = 0
+
+    def update(self, values: np.ndarray) -> None:
+        """Fold a (rows, columns) float array with NaNs for missing values into the state"""
+        mask = np.isnan(values)
+        filled = np.where(mask, 0.0, values)
+        count_b = (~mask).sum(axis=0)
+        sum_b = filled.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_b = np.where(count_b > 0, sum_b / count_b, 0.0)
+            centered = np.where(mask, 0.0, values - mean_b)
+            m2_b = (centered * centered).sum(axis=0)
+
+            total = self.count + count_b
+            delta = mean_b - self.mean
+            ratio = np.where(total > 0, count_b / total, 0.0)
+            self.mean = self.mean + delta * ratio
+            self.m2 = self.m2 + m2_b + delta * delta * self.count * ratio
+        self.count = total
+        self.sum += sum_b
+        self.min = np.minimum(self.min, np.where(mask, np.inf, values).min(axis=0, initial=np.inf))
+        self.max = np.maximum(self.max, np.where(mask, -np.inf, values).max(axis=0, initial=-np.inf))
+
+        # Bottom-k sample: keep the rows with the smallest random priorities
+        keys = np.concatenate([self.sample_keys, self.rng.random(len(values))])
+        rows = np.concatenate([self.sample_values, values])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size - 1)[:self.sample_size]
+            keys, rows = keys[keep], rows[keep]
+        self.sample_keys, self.sample_values = keys, rows
+        self.rows += len(values)
+
+    def merge(self, other: 'StreamingKPIs') -> None:
+        """Combine another partial state over the same columns into this one"""
+        total = self.count + other.count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = other.mean - self.mean
+            ratio = np.where(total > 0, other.count / total, 0.0)
+            self.mean = self.mean + delta * ratio
+            self.m2 = self.m2 + other.m2 + delta * delta * self.count * ratio
+        self.count = total
+        self.sum += other.sum
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+
+        keys = np.concatenate([self.sample_keys, other.sample_keys])
+        rows = np.concatenate([self.sample_values, other.sample_values])
+        if len(keys) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size - 1)[:self.sample_size]
+            keys, rows = keys[keep], rows[keep]
+        self.sample_keys, self.sample_values = keys, rows
+        self.rows += other.rows
+
+    def result(self, metrics: Sequence[str] = DEFAULT_METRICS,
+               percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        """Final KPIs named like kpi_engine.compute_kpis"""
+        metrics, percentiles = list(metrics), list(percentiles)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = {
+                'count': self.count,
+                'sum': self.sum,
+                'mean': self.mean,
+                'std': np.sqrt(self.m2 / self.count),
+                'min': self.min,
+                'max': self.max,
+            }
+
+        qs = ([0.5] if 'median' in metrics else []) + [p / 100 for p in percentiles]
+        sample_counts = (~np.isnan(self.sample_values)).sum(axis=0)
+        quantiles = column_quantiles(self.sample_values, sample_counts, qs)
+        if 'median' in metrics:
+            values['median'] = quantiles[0]
+        for i, p in enumerate(percentiles, start=len(qs) - len(percentiles)):
+            values[percentile_label(p)] = quantiles[i]
+
+        if self.rows > self.sample_size and qs:
+            logger.info(f"Quantile KPIs estimated from a {self.sample_size}-row sample of {self.rows} rows")
+
+        order = metrics + [percentile_label(p) for p in percentiles]
+        kpis = {}
+        for j, col in enumerate(self.columns):
+            if self.count[j] == 0:
+                continue
+            for name in order:
+                kpis[f'{col}_{name}'] = float(values[name][j])
+        return kpis
+
+
+class StreamingRollup:
+    """
+    One aggregation spec Rollup folded chunk by chunk
+    Keeps per-period sums, counts, mins and maxes; metrics are derived (and
+    rolling windows applied) only when the rollup is finalized
+    """
+
+    def __init__(self, rollup: Rollup, schema: pa.Schema):
+        if not set(rollup.metrics) <= set(MERGEABLE_METRICS):
+            raise ValueError(f"Rollup {rollup.name!r} uses {list(rollup.metrics)}; chunked mode supports "
+                             f"only {list(MERGEABLE_METRICS)}")
+        self.rollup = rollup
+        self.date_col, self.metric_cols = resolve_columns(rollup, pl.from_arrow(schema.empty_table()).schema)
+        self.state: Optional[pl.DataFrame] = None
+
+    @property
+    def usable(self) -> bool:
+        return self.date_col is not None and bool(self.metric_cols)
+
+    def update(self, df: pd.DataFrame) -> None:
+        """Fold one enriched chunk into the partial state"""
+        columns = list(dict.fromkeys([self.date_col, *self.rollup.by, *self.metric_cols]))
+        chunk = pl.from_arrow(pa.Table.from_pandas(df[columns], preserve_index=False))
+        self.merge_state(partial_rollup(chunk.lazy(), self.rollup, self.date_col, self.metric_cols).collect())
+
+    def merge_state(self, partial: pl.DataFrame) -> None:
+        """Combine a partial state (from a chunk or another worker) with this one"""
+        self.state = partial if self.state is None else merge_partials([self.state, partial], self.rollup)
+
+    def result(self) -> pl.DataFrame:
+        """Final rollup, sorted by period and group-by columns"""
+        return finalize_rollup(self.state.lazy(), self.rollup, self.metric_cols).collect()
+
+
+class StreamingUnifiedWriter:
+    """
+    Appends enriched chunks to unified_data.parquet (row groups of at most
+    row_group_size rows per chunk) and/or unified_data.csv, fixing the schema
+    and the CSV datetime formats from the first chunk. With partition_by the Parquet chunks go to a
+    Hive-partitioned unified_data/ dataset instead, one file per chunk and partition.
+    Output is built under temporary names and only moved into place by close().
+    """
+
+    def __init__(self, processed_path: Path, formats: Sequence[str] = ('parquet', 'csv'),
+                 partition_by: Optional[Sequence[str]] = None,
+                 row_group_size: int = DEFAULT_ROW_GROUP_SIZE, compression: str = DEFAULT_COMPRESSION):
+        self.formats = tuple(formats)
+        self.partition_by = list(partition_by or [])
+        self.parquet_path = Path(processed_path) / ("unified_data" if self.partition_by else "unified_data.parquet")
+        self.csv_path = Path(processed_path) / "unified_data.csv"
+        self.tmp_paths = {path: temp_path_for(path) for path in (self.parquet_path, self.csv_path)}
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.schema: Optional[pa.Schema] = None
+        self.writer: Optional[pq.ParquetWriter] = None
+        self.datetime_formats: Optional[Dict[str, str]] = None
+        self.chunks = 0
+        self.rows = 0
+
+    def write(self, df: pd.DataFrame) -> None:
+        if 'parquet' in self.formats:
+            if self.schema is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self.schema = table.schema
+            else:
+                table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+
+            tmp_path = self.tmp_paths[self.parquet_path]
+            if self.partition_by:
+                write_partitioned_dataset(table, tmp_path, self.partition_by, self.row_group_size,
+                                          self.compression, basename_template=f"part-{self.chunks}-{{i}}.parquet",
+                                          replace=self.chunks == 0)
+            else:
+                if self.writer is None:
+                    self.writer = pq.ParquetWriter(tmp_path, self.schema, compression=self.compression,
+                                                   use_dictionary=True, write_statistics=True)
+                self.writer.write_table(table, row_group_size=self.row_group_size)
+
+        if 'csv' in self.formats:
+            self.datetime_formats = self.csv_datetime_formats(df)
+            write_csv(df, self.tmp_paths[self.csv_path], datetime_format=self.datetime_formats, append=self.rows > 0)
+        self.chunks += 1
+        self.rows += len(df)
+
+    def csv_datetime_formats(self, df: pd.DataFrame) -> Dict[str, str]:
+        """Naive datetime formats for this chunk, kept from the first chunk so appended rows read alike.
+
+        A chunk cannot tell whether later chunks are all midnight, so the time
+        of day is always written. A chunk needing more fraction digits widens
+        the format from then on instead of truncating its values.
+        """
+        needed = {name: naive_datetime_format(df[name], dates_only=False) for name in naive_datetime_columns(df)}
+        if self.datetime_formats is None:
+            return needed
+        # '...%S' < '...%S%.3f' < '...%S%.6f' < '...%S%.9f'
+        widened = {name: fmt for name, fmt in needed.items() if fmt > self.datetime_formats.get(name, '')}
+        if widened:
+            logger.warning(f"Chunk {self.chunks} needs finer datetime formats than earlier chunks: {widened}")
+        return {**self.datetime_formats, **widened}
+
+    def close(self) -> None:
+        """Finish the files and rename them onto their final paths"""
+        if self.writer is not None:
+            self.writer.close()
+        for path, tmp_path in self.tmp_paths.items():
+            if tmp_path.exists():
+                commit_path(tmp_path, path)
+                logger.info(f"Streamed {self.rows} unified rows to {path}")
+
+    def abort(self) -> None:
+        """Drop partially written output after a failure"""
+        if self.writer is not None:
+            self.writer.close()
+        for tmp_path in self.tmp_paths.values():
+            discard_path(tmp_path)
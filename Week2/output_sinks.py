@@ -0,0 +1,135 @@
+"""
+Output sinks
+============
+Writes the pipeline's processed artifacts:
+- Each artifact (unified data, aggregations, KPIs, stage profile, memory timeline,
+  ingest timings, stage graph)
+  has its own list of formats, so e.g. the unified CSV copy can be switched off
+- Writers run concurrently on a background thread pool
+- Every file is written under a hidden temporary name next to its target and
+  renamed into place once complete, so readers never see partial output
+"""
+
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Formats each artifact can be written in
+SUPPORTED_FORMATS = {
+    'unified': ('parquet', 'csv'),
+    'aggregations': ('parquet', 'csv'),
+    'kpis': ('json',),
+    'profile': ('jsonl', 'csv'),
+    'memory_timeline': ('csv',),
+    'ingest_timings': ('csv',),
+    'stage_graph': ('csv',),
+}
+
+# Every artifact is written in all of its formats unless overridden
+DEFAULT_OUTPUT_FORMATS = dict(SUPPORTED_FORMATS)
+
+
+def resolve_output_formats(overrides: Optional[Dict[str, Sequence[str]]] = None) -> Dict[str, Tuple[str, ...]]:
+    """Default formats per artifact with overrides applied and validated"""
+    formats = dict(DEFAULT_OUTPUT_FORMATS)
+    for artifact, chosen in (overrides or {}).items():
+        if artifact not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unknown output artifact {artifact!r}, expected one of {sorted(SUPPORTED_FORMATS)}")
+        unsupported = [fmt for fmt in chosen if fmt not in SUPPORTED_FORMATS[artifact]]
+        if unsupported:
+            raise ValueError(f"Unsupported formats for {artifact}: {unsupported}")
+        formats[artifact] = tuple(chosen)
+    return formats
+
+
+def parse_output_formats(specs: Sequence[str]) -> Dict[str, Tuple[str, ...]]:
+    """Parse CLI specs like 'unified=parquet' or 'aggregations=parquet,csv' ('profile=' disables it)"""
+    overrides = {}
+    for spec in specs:
+        artifact, sep, formats = spec.partition('=')
+        if not sep:
+            raise ValueError(f"Output spec must look like artifact=fmt[,fmt], got {spec!r}")
+        overrides[artifact.strip()] = tuple(fmt.strip() for fmt in formats.split(',') if fmt.strip())
+    return resolve_output_formats(overrides)
+
+
+def temp_path_for(path: Path) -> Path:
+    """Hidden sibling path for writing path before it is renamed into place"""
+    path = Path(path)
+    return path.with_name(f".{path.name}.tmp-{uuid.uuid4().hex[:8]}")
+
+
+def commit_path(tmp_path: Path, path: Path) -> None:
+    """Move a finished temporary file or directory onto its final path.
+
+    Files are swapped with a single atomic os.replace. An existing directory
+    (a partitioned dataset) is first moved aside, so readers see either the
+    old or the new complete dataset.
+    """
+    tmp_path, path = Path(tmp_path), Path(path)
+    if path.is_dir() and not path.is_symlink():
+        old_path = temp_path_for(path)
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.replace(tmp_path, path)
+
+
+def discard_path(tmp_path: Path) -> None:
+    """Remove a temporary output left behind by a failed writer"""
+    tmp_path = Path(tmp_path)
+    if tmp_path.is_dir():
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    else:
+        tmp_path.unlink(missing_ok=True)
+
+
+def atomic_write(path: Path, write: Callable[[Path], object]) -> Path:
+    """Call write(tmp_path) and rename the result onto path only if it succeeds"""
+    tmp_path = temp_path_for(path)
+    try:
+        write(tmp_path)
+        commit_path(tmp_path, path)
+    except BaseException:
+        discard_path(tmp_path)
+        raise
+    return Path(path)
+
+
+class OutputSinks:
+    """
+    Background pool of artifact writers
+    submit() queues an atomic write, wait() blocks until all are on disk
+    and re-raises the first failure
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="output-sink")
+        self.pending: List[Tuple[Path, Future]] = []
+
+    def submit(self, path: Path, write: Callable[[Path], object]) -> None:
+        self.pending.append((Path(path), self.pool.submit(atomic_write, path, write)))
+
+    def wait(self) -> List[Path]:
+        written, errors = [], []
+        try:
+            for path, future in self.pending:
+                try:
+                    written.append(future.result())
+                except Exception as e:
+                    logger.error(f"Failed to write {path.name}: {e}")
+                    errors.append(e)
+        finally:
+            self.pool.shutdown(wait=True)
+            self.pending = []
+        if errors:
+            raise errors[0]
+        logger.debug(f"Wrote {len(written)} output files")
+        return written
@@ -0,0 +1,98 @@
+"""
+Parquet output layout
+=====================
+Writes the unified frame so downstream readers can skip data they do not need:
+- Row groups are bounded by row_group_size and every column gets min/max
+  statistics, so filters prune whole row groups
+- String columns are dictionary encoded; categoricals are already Arrow dictionaries
+- Optionally the output is a Hive-style dataset (unified_data/month=2023-01/region=North/...)
+  where 'month' is derived from the first date column; readers pass
+  filters=[('month', '=', '2023-01')] or filters on region to pd.read_parquet /
+  pl.scan_parquet(..., hive_partitioning=True) and only open matching directories
+"""
+
+import logging
+import shutil
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION_BY = ('month', 'region')
+DEFAULT_ROW_GROUP_SIZE = 128 * 1024
+DEFAULT_COMPRESSION = 'zstd'
+
+# Derived partition column holding the first date column as 'YYYY-MM'
+MONTH_PARTITION = 'month'
+
+
+def first_date_column(schema: pa.Schema) -> Optional[str]:
+    """Name of the first timestamp/date column, if any"""
+    for field in schema:
+        if pa.types.is_timestamp(field.type) or pa.types.is_date(field.type):
+            return field.name
+    return None
+
+
+def add_partition_columns(table: pa.Table, partition_by: Sequence[str],
+                          date_col: Optional[str] = None) -> pa.Table:
+    """Append the derived 'month' column when it is requested and not already present"""
+    if MONTH_PARTITION not in partition_by or MONTH_PARTITION in table.column_names:
+        return table
+    date_col = date_col or first_date_column(table.schema)
+    if date_col is None:
+        raise ValueError("Partitioning by month needs a date column in the unified data")
+    month = pc.strftime(table.column(date_col), format='%Y-%m')
+    return table.append_column(MONTH_PARTITION, month)
+
+
+def write_parquet_file(table: pa.Table, path: Path, row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                       compression: str = DEFAULT_COMPRESSION) -> None:
+    """Write one Parquet file with bounded row groups, statistics and dictionary encoding"""
+    pq.write_table(table, path, row_group_size=row_group_size, compression=compression,
+                   use_dictionary=True, write_statistics=True)
+
+
+def write_partitioned_dataset(table: pa.Table, root: Path, partition_by: Sequence[str] = DEFAULT_PARTITION_BY,
+                              row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                              compression: str = DEFAULT_COMPRESSION, date_col: Optional[str] = None,
+                              basename_template: str = 'part-{i}.parquet', replace: bool = True) -> List[str]:
+    """Write table as a Hive-partitioned Parquet dataset under root and return the written file paths.
+
+    replace=False adds files next to the existing ones (used by the chunked
+    writer, which passes a distinct basename_template per chunk).
+    """
+    root = Path(root)
+    if replace and root.exists():
+        shutil.rmtree(root)
+
+    table = add_partition_columns(table, partition_by, date_col)
+    missing = [col for col in partition_by if col not in table.column_names]
+    if missing:
+        raise ValueError(f"Partition columns not found in unified data: {missing}")
+
+    # Partition values are directory names, so they are written as plain strings
+    partition_schema = pa.schema([(col, pa.string()) for col in partition_by])
+    for col in partition_by:
+        index = table.schema.get_field_index(col)
+        table = table.set_column(index, col, table.column(col).cast(pa.string()))
+
+    file_options = ds.ParquetFileFormat().make_write_options(
+        compression=compression, use_dictionary=True, write_statistics=True)
+    written: List[str] = []
+    ds.write_dataset(
+        table, root, format='parquet', file_options=file_options,
+        partitioning=ds.partitioning(partition_schema, flavor='hive'),
+        basename_template=basename_template,
+        max_rows_per_group=row_group_size,
+        min_rows_per_group=row_group_size,
+        existing_data_behavior='overwrite_or_ignore',
+        file_visitor=lambda written_file: written.append(written_file.path),
+    )
+    logger.debug(f"Wrote {table.num_rows} rows into {len(written)} partition files under {root}")
+    return written
@@ -0,0 +1,248 @@
+"""
+Pipeline benchmark suite
+========================
+Measures how DataPipeline scales, entirely offline on one machine:
+- Sample data is generated once per scale factor (1x = 10k sales rows, seeded
+  with the scale) under Week2/benchmarks/data/scale_<n>x and reused by later runs
+- Every (scale, mode) pair runs in a fresh process so peak RSS is its own;
+  the stage profiler supplies per-stage wall times and a memory sampler the
+  high-water mark including worker processes
+- Results are compared against a stored baseline; a run slower or larger
+  than the threshold is reported as a regression (exit code 1)
+
+Usage (from any directory):
+    python Week2/pipeline_benchmark.py --scales 1 10 --modes pandas polars chunked
+    python Week2/pipeline_benchmark.py --scales 1 10 --update-baseline
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from sample_data import BASE_SALES, SampleDataGenerator
+
+logger = logging.getLogger(__name__)
+
+# Next to this file, whatever the working directory
+BENCH_DIR = Path(__file__).resolve().parent / "benchmarks"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+SCALE_FACTORS = (1, 10, 100, 1000)
+
+# DataPipeline options per benchmarked engine / mode
+MODES: Dict[str, Dict[str, Any]] = {
+    'pandas': {},
+    'parallel': {'max_workers': 4},
+    'process': {'max_workers': 4, 'executor': 'process'},
+    'polars': {'engine': 'polars'},
+    'chunked': {'chunk_size': 250_000},
+    'numpy_nullable': {'dtype_backend': 'numpy_nullable'},
+}
+
+# Relative increase over the baseline that counts as a regression
+DEFAULT_TIME_THRESHOLD = 0.25
+DEFAULT_MEMORY_THRESHOLD = 0.25
+# Timings below this many seconds are too noisy to compare
+MIN_COMPARABLE_SECONDS = 0.05
+
+
+def _capstone():
+    """The capstone module (its file name is not a valid identifier)"""
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    return importlib.import_module("7_Capstone_project")
+
+
+def dataset_path(scale: int) -> Path:
+    return BENCH_DIR / "data" / f"scale_{scale}x" / "raw_data"
+
+
+def ensure_dataset(scale: int) -> Path:
+    """Generate the raw files for a scale factor unless a complete set already exists"""
+    raw_path = dataset_path(scale)
+    marker = raw_path / ".complete"
+    if marker.exists():
+        return raw_path
+    if raw_path.exists():
+        shutil.rmtree(raw_path)
+    start = time.perf_counter()
+    SampleDataGenerator(str(raw_path), scale=scale, seed=scale).generate_all_sample_data()
+    marker.write_text(datetime.now().isoformat())
+    logger.info(f"Generated {scale}x dataset in {time.perf_counter() - start:.1f}s")
+    return raw_path
+
+
+def run_once(scale: int, mode: str, sample_interval: float = 0.05) -> Dict[str, Any]:
+    """One end-to-end pipeline run; executed in its own process"""
+    capstone = _capstone()
+    logging.getLogger().setLevel(logging.WARNING)
+    # a spawned child inherits 'spawn'; give the pipeline's own worker pools
+    # the platform default like a normal command-line run
+    multiprocessing.set_start_method(None, force=True)
+
+    processed_path = BENCH_DIR / "runs" / f"{mode}_{scale}x" / "processed"
+    if processed_path.exists():
+        shutil.rmtree(processed_path)
+    processed_path.parent.mkdir(parents=True, exist_ok=True)
+
+    pipeline = capstone.DataPipeline(str(dataset_path(scale)), str(processed_path), use_schema_cache=False,
+                                     memory_sample_interval=sample_interval, **MODES[mode])
+    start = time.perf_counter()
+    pipeline.run_pipeline()
+    total = time.perf_counter() - start
+
+    stages = {}
+    for record in pipeline.profiler.records:
+        if record['depth'] == 0:
+            stages[record['stage']] = stages.get(record['stage'], 0.0) + record['wall_s']
+    _, sampled_peak = pipeline.memory_sampler.high_water_mark()
+    return {
+        'total_s': round(total, 4),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+        'sampled_peak_mb': sampled_peak,
+        'stages': {name: round(seconds, 4) for name, seconds in stages.items()},
+    }
+
+
+def run_isolated(scale: int, mode: str) -> Dict[str, Any]:
+    """run_once in a freshly spawned process"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(run_once, scale, mode).result()
+
+
+def run_suite(scales: Sequence[int], modes: Sequence[str], repeats: int = 3) -> Dict[str, Dict[str, Any]]:
+    """Best-of-repeats timings and worst-case memory for every (scale, mode)"""
+    results = {}
+    for scale in scales:
+        ensure_dataset(scale)
+        for mode in modes:
+            runs = [run_isolated(scale, mode) for _ in range(repeats)]
+            best = min(runs, key=lambda run: run['total_s'])
+            results[f"{mode}@{scale}x"] = {
+                'scale': scale,
+                'mode': mode,
+                'rows': BASE_SALES * scale,
+                'total_s': best['total_s'],
+                'rows_per_s': round(BASE_SALES * scale / best['total_s']),
+                'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+                'sampled_peak_mb': max(run['sampled_peak_mb'] for run in runs),
+                'stages': {name: min(run['stages'].get(name, float('inf')) for run in runs)
+                           for name in best['stages']},
+            }
+            logger.info(f"{mode}@{scale}x: {best['total_s']:.3f}s, peak RSS {results[f'{mode}@{scale}x']['peak_rss_mb']} MB")
+    return results
+
+
+def machine_info() -> Dict[str, Any]:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpus': multiprocessing.cpu_count(),
+        'pandas': pd.__version__,
+    }
+
+
+def compare(current: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            time_threshold: float = DEFAULT_TIME_THRESHOLD,
+            memory_threshold: float = DEFAULT_MEMORY_THRESHOLD) -> pd.DataFrame:
+    """One row per compared metric with its relative change and status"""
+    rows = []
+    for key, result in current.items():
+        base = baseline.get(key)
+        metrics = [('total_s', result['total_s'], base and base.get('total_s'), time_threshold),
+                   ('peak_rss_mb', result['peak_rss_mb'], base and base.get('peak_rss_mb'), memory_threshold)]
+        metrics += [(f"stage:{name}", seconds, base and base.get('stages', {}).get(name), time_threshold)
+                    for name, seconds in result['stages'].items()]
+        for metric, value, base_value, threshold in metrics:
+            if base_value is None:
+                status, change = 'new', None
+            else:
+                change = (value - base_value) / base_value if base_value else 0.0
+                if metric != 'peak_rss_mb' and max(value, base_value) < MIN_COMPARABLE_SECONDS:
+                    status = 'ok'
+                elif change > threshold:
+                    status = 'REGRESSION'
+                elif change < -threshold:
+                    status = 'improved'
+                else:
+                    status = 'ok'
+            rows.append({'run': key, 'metric': metric, 'baseline': base_value, 'current': value,
+                         'change_pct': round(change * 100, 1) if change is not None else None, 'status': status})
+    return pd.DataFrame(rows, columns=['run', 'metric', 'baseline', 'current', 'change_pct', 'status'])
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    if not Path(path).exists():
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_report(results: Dict[str, Dict[str, Any]], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'created': datetime.now().isoformat(), 'machine': machine_info(), 'results': results}, f, indent=2)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark DataPipeline across scale factors and modes")
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10],
+                        help=f"scale factors to run (suite: {' '.join(map(str, SCALE_FACTORS))})")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=['pandas', 'polars', 'chunked'])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run as the new baseline instead of comparing")
+    parser.add_argument("--time-threshold", type=float, default=DEFAULT_TIME_THRESHOLD)
+    parser.add_argument("--memory-threshold", type=float, default=DEFAULT_MEMORY_THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    results = run_suite(args.scales, args.modes, args.repeats)
+    report_path = BENCH_DIR / "results" / f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    save_report(results, report_path)
+
+    summary = pd.DataFrame(results.values())[['mode', 'scale', 'rows', 'total_s', 'rows_per_s',
+                                              'peak_rss_mb', 'sampled_peak_mb']]
+    print(summary.to_string(index=False))
+    print(f"\nFull results: {report_path}")
+
+    if args.update_baseline:
+        save_report(results, args.baseline)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    comparison = compare(results, baseline['results'], args.time_threshold, args.memory_threshold)
+    print(f"\nCompared with baseline from {baseline['created']}:")
+    print(comparison.to_string(index=False, na_rep='-'))
+    regressions = comparison[comparison['status'] == 'REGRESSION']
+    if len(regressions):
+        print(f"\n{len(regressions)} regression(s) above the thresholds")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Incremental run manifest
+========================
+Tracks which raw files a pipeline run was built from so repeat runs only
+redo the work that changed:
+- Each raw file is fingerprinted (size, mtime, header hash)
+- The settings that shape the outputs are fingerprinted too, so changing
+  them rebuilds the outputs even when no raw file changed
+- Ingested frames are cached as Arrow IPC files under processed/_cache,
+  next to the manifest itself
+- Unchanged sources are reloaded from the cache instead of being re-parsed
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from csv_schema import arrow_types_mapper, file_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+def settings_fingerprint(**settings: Any) -> str:
+    """Hash of the run settings that shape the processed outputs"""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class RunManifest:
+    """
+    Raw-file and settings fingerprints of the last successful run plus a
+    cache of the frames ingested from the raw files
+    """
+
+    def __init__(self, processed_path: Path):
+        self.processed_path = Path(processed_path)
+        self.cache_dir = self.processed_path / "_cache"
+        self.manifest_path = self.cache_dir / "manifest.json"
+        self.fingerprints: Dict[str, str] = {}
+        self.settings: Optional[str] = None
+
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r') as f:
+                    manifest = json.load(f)
+                self.fingerprints = manifest.get('inputs', {})
+                self.settings = manifest.get('settings')
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable manifest {self.manifest_path}: {e}")
+
+    def _frame_path(self, file_path: Path) -> Path:
+        return self.cache_dir / f"{Path(file_path).name}.arrow"
+
+    def changed_files(self, files: Iterable[Path]) -> List[Path]:
+        """Return the raw files that are new, modified or missing a cached frame"""
+        return [
+            file_path for file_path in files
+            if self.fingerprints.get(file_path.name) != file_fingerprint(file_path)
+            or not self._frame_path(file_path).exists()
+        ]
+
+    def removed_files(self, files: Iterable[Path]) -> List[str]:
+        """Return names recorded in the manifest that no longer exist in raw_data"""
+        current = {file_path.name for file_path in files}
+        return [name for name in self.fingerprints if name not in current]
+
+    def settings_changed(self, settings: str) -> bool:
+        """Whether the outputs were built with different settings (or none recorded)"""
+        return self.settings != settings
+
+    def cache_frame(self, file_path: Path, df: pd.DataFrame) -> None:
+        """Store an ingested frame as Arrow IPC for the next run"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        df.reset_index(drop=True).to_feather(self._frame_path(file_path))
+
+    def load_frame(self, file_path: Path, dtype_backend: str = 'numpy_nullable') -> pd.DataFrame:
+        """Reload a previously ingested frame from the Arrow cache"""
+        if dtype_backend == 'pyarrow':
+            return feather.read_table(self._frame_path(file_path)).to_pandas(types_mapper=arrow_types_mapper)
+        return pd.read_feather(self._frame_path(file_path))
+
+    def drop_frame(self, name: str) -> None:
+        """Forget a raw file that has been removed"""
+        self._frame_path(Path(name)).unlink(missing_ok=True)
+        self.fingerprints.pop(name, None)
+
+    def record(self, files: Iterable[Path], settings: str) -> None:
+        """Remember the fingerprints of the files and settings a successful run was built from"""
+        self.fingerprints = {file_path.name: file_fingerprint(file_path) for file_path in files}
+        self.settings = settings
+
+    def save(self) -> None:
+        """Write the manifest to processed/_cache/manifest.json"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.manifest_path, 'w') as f:
+            json.dump({'inputs': self.fingerprints, 'settings': self.settings}, f, indent=2)
+        logger.info(f"Saved manifest for {len(self.fingerprints)} raw files to {self.manifest_path}")
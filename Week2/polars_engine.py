@@ -0,0 +1,211 @@
+"""
+Polars lazy execution engine
+============================
+Alternative engine for DataPipeline that expresses the whole run as lazy
+Polars plans and executes them together:
+- Raw files are scanned (scan_csv / scan_parquet) or streamed (JSON / NDJSON)
+- Joins follow the same smallest-dimension-first plan as the pandas path
+- KPIs and the aggregation spec's rollups are Polars expressions on the
+  unified plan, so projection/predicate pushdown and multi-threading apply
+- A single collect_all materializes the unified frame, KPIs and rollups
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import polars as pl
+import pyarrow as pa
+
+from aggregation_spec import DEFAULT_ROLLUPS, Rollup, build_rollups
+from csv_schema import DATETIME_DTYPE, SchemaCache, infer_csv_schema
+from json_stream import is_ndjson, iter_json_batches
+from join_planner import JoinStep, detect_key_by_name, order_joins
+from kpi_engine import DEFAULT_METRICS, DEFAULT_PERCENTILES, percentile_label
+
+logger = logging.getLogger(__name__)
+
+# Schema dtype strings (see csv_schema) mapped to Polars dtypes
+POLARS_DTYPES = {
+    'category': pl.Categorical,
+    'Int64': pl.Int64,
+    'Float64': pl.Float64,
+    'boolean': pl.Boolean,
+    'string': pl.String,
+    'str': pl.String,
+}
+
+
+def time_aggregation_columns(schema: pl.Schema) -> Tuple[Optional[str], List[str]]:
+    """Return the first date/datetime column and all numeric columns of a Polars schema"""
+    date_cols = [name for name, dtype in schema.items() if isinstance(dtype, (pl.Datetime, pl.Date))]
+    numeric_cols = [name for name, dtype in schema.items() if dtype.is_numeric()]
+    return (date_cols[0] if date_cols else None), numeric_cols
+
+
+def kpi_expressions(numeric_cols: List[str], metrics: Sequence[str] = DEFAULT_METRICS,
+                    percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> List[pl.Expr]:
+    """Polars equivalents of kpi_engine.compute_kpis, named the same way"""
+    exprs = []
+    for col in numeric_cols:
+        values = pl.col(col).cast(pl.Float64)
+        builders = {
+            'count': values.count().cast(pl.Float64),
+            'sum': values.sum(),
+            'mean': values.mean(),
+            'std': values.std(ddof=0),
+            'min': values.min(),
+            'max': values.max(),
+            'median': values.median(),
+        }
+        exprs += [builders[metric].alias(f'{col}_{metric}') for metric in metrics]
+        exprs += [
+            values.quantile(p / 100, interpolation='linear').alias(f'{col}_{percentile_label(p)}')
+            for p in percentiles
+        ]
+    return exprs
+
+
+class PolarsLazyEngine:
+    """
+    Builds one lazy plan per pipeline output and collects them together
+    Reuses the pandas path's schemas and join planner so results match
+    """
+
+    def __init__(self, schemas: Optional[Dict[str, Dict[str, str]]] = None,
+                 schema_cache: Optional[SchemaCache] = None, schema_sample_rows: int = 10_000,
+                 json_batch_size: int = 5000, join_keys: Optional[List[str]] = None,
+                 fact_table: Optional[str] = None, kpi_metrics: Sequence[str] = DEFAULT_METRICS,
+                 kpi_percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                 rollups: Sequence[Rollup] = DEFAULT_ROLLUPS):
+        self.schemas = schemas or {}
+        self.schema_cache = schema_cache
+        self.schema_sample_rows = schema_sample_rows
+        self.json_batch_size = json_batch_size
+        self.join_keys = join_keys
+        self.fact_table = fact_table
+        self.kpi_metrics = kpi_metrics
+        self.kpi_percentiles = kpi_percentiles
+        self.rollups = rollups
+
+    def _schema_for(self, file_path: Path, name: Optional[str] = None) -> Optional[Dict[str, str]]:
+        """Explicit schema (by dataset name), then cached schema, for a raw file"""
+        name = name or file_path.stem
+        if name in self.schemas:
+            return self.schemas[name]
+        if self.schema_cache is not None:
+            entry = self.schema_cache.lookup(file_path)
+            if entry is not None:
+                return entry['columns']
+        return None
+
+    @staticmethod
+    def _apply_schema(lf: pl.LazyFrame, schema: Dict[str, str]) -> pl.LazyFrame:
+        """Cast scanned columns to their schema dtypes, parsing date columns (Int64 columns keep the
+        integer or float type they were read with)"""
+        casts = []
+        for col, dtype in schema.items():
+            if dtype == DATETIME_DTYPE:
+                casts.append(pl.col(col).cast(pl.String).str.to_datetime(time_unit='us'))
+            elif dtype in POLARS_DTYPES and dtype != 'Int64':
+                casts.append(pl.col(col).cast(POLARS_DTYPES[dtype]))
+        return lf.with_columns(casts) if casts else lf
+
+    def scan_csv(self, file_path: Path, name: Optional[str] = None) -> pl.LazyFrame:
+        """Scan a CSV file with the same schema the pandas path would use"""
+        schema = self._schema_for(file_path, name) or infer_csv_schema(file_path, self.schema_sample_rows)
+        # Dates are read as strings and parsed in the plan; Int64 columns are inferred from every
+        # row instead, so a fraction past the sample widens the column to Float64 (a forced or cast
+        # Int64 would fail or truncate it)
+        overrides = {col: POLARS_DTYPES.get(dtype, pl.String) for col, dtype in schema.items() if dtype != 'Int64'}
+        return self._apply_schema(pl.scan_csv(file_path, schema_overrides=overrides, infer_schema_length=None), schema)
+
+    def scan_json(self, file_path: Path, name: Optional[str] = None) -> pl.LazyFrame:
+        """Scan an NDJSON file lazily, or stream a JSON array into Arrow and hand it to Polars without copying"""
+        schema = self._schema_for(file_path, name)
+        if is_ndjson(file_path):
+            # Types are inferred from every line, like the batch reader's permissive concat
+            lf = pl.scan_ndjson(file_path, infer_schema_length=None)
+        else:
+            # Polars has no lazy reader for a top-level JSON array, so it is materialized here and
+            # projections / predicates only apply after the read
+            tables = list(iter_json_batches(file_path, self.json_batch_size))
+            table = pa.concat_tables(tables, promote_options='permissive') if tables else pa.table({})
+            lf = pl.from_arrow(table).lazy()
+        return self._apply_schema(lf, schema) if schema else lf
+
+    def scan_sources(self, files: List[Tuple[Path, str]],
+                     dataset_names: Optional[Dict[Path, str]] = None) -> Tuple[Dict[str, pl.LazyFrame], Dict[str, int]]:
+        """Lazy frames for the raw datasets plus on-disk sizes used to order joins.
+
+        dataset_names maps part files of a multi-file dataset to its name; the
+        parts are concatenated in order. Other files are named by their stem.
+        """
+        parts: Dict[str, List[pl.LazyFrame]] = {}
+        sizes: Dict[str, int] = {}
+        for file_path, file_format in files:
+            name = (dataset_names or {}).get(file_path, file_path.stem)
+            if file_format == 'csv':
+                frame = self.scan_csv(file_path, name)
+            elif file_format == 'json':
+                frame = self.scan_json(file_path, name)
+            elif file_format == 'parquet':
+                frame = pl.scan_parquet(file_path)
+            else:
+                raise ValueError(f"Unsupported file format: {file_format}")
+            parts.setdefault(name, []).append(frame)
+            sizes[name] = sizes.get(name, 0) + file_path.stat().st_size
+            logger.info(f"Scanned {file_path.name} lazily")
+        frames = {name: scans[0] if len(scans) == 1 else pl.concat(scans, how='vertical_relaxed')
+                  for name, scans in parts.items()}
+        return frames, sizes
+
+    def plan_joins(self, frames: Dict[str, pl.LazyFrame], sizes: Dict[str, int]) -> Tuple[str, List[JoinStep]]:
+        """Smallest-dimension-first join plan from schemas and file sizes"""
+        columns = {name: frame.collect_schema().names() for name, frame in frames.items()}
+        return order_joins(
+            columns=columns,
+            sizes=sizes,
+            choose_key=lambda name, available: detect_key_by_name(available, columns[name], self.join_keys),
+            fact=self.fact_table
+        )
+
+    @staticmethod
+    def _join(left: pl.LazyFrame, dim: pl.LazyFrame, step: JoinStep) -> pl.LazyFrame:
+        """Left-join a dimension, aligning key dtypes (e.g. Categorical vs String) first"""
+        left_dtype = left.collect_schema()[step.key]
+        dim_dtype = dim.collect_schema()[step.key]
+        if left_dtype != dim_dtype:
+            left = left.with_columns(pl.col(step.key).cast(pl.String))
+            dim = dim.with_columns(pl.col(step.key).cast(pl.String))
+        return left.join(dim, on=step.key, how='left', suffix=f"_{step.name}", maintain_order='left')
+
+    def build_plan(self, files: List[Tuple[Path, str]], dataset_names: Optional[Dict[Path, str]] = None
+                   ) -> Tuple[pl.LazyFrame, pl.LazyFrame, Dict[str, pl.LazyFrame]]:
+        """Return lazy plans for the unified frame, the KPI row and the rollups"""
+        frames, sizes = self.scan_sources(files, dataset_names)
+        if not frames:
+            raise ValueError("No data files found! Please check the raw_data directory.")
+
+        fact, steps = self.plan_joins(frames, sizes)
+        logger.info(f"Lazy join plan: {fact} <- {[(step.name, step.key) for step in steps]}")
+
+        unified = frames[fact]
+        for step in steps:
+            unified = self._join(unified, frames[step.name], step)
+
+        schema = unified.collect_schema()
+        _, numeric_cols = time_aggregation_columns(schema)
+        kpis = unified.select(kpi_expressions(numeric_cols, self.kpi_metrics, self.kpi_percentiles))
+        aggregations = build_rollups(unified, self.rollups)
+        return unified, kpis, aggregations
+
+    def run(self, files: List[Tuple[Path, str]], dataset_names: Optional[Dict[Path, str]] = None
+            ) -> Tuple[pl.DataFrame, Dict[str, float], Dict[str, pl.DataFrame]]:
+        """Collect every output in one multi-threaded pass"""
+        unified, kpis, aggregations = self.build_plan(files, dataset_names)
+        results = pl.collect_all([unified, kpis, *aggregations.values()])
+
+        unified_df, kpi_row = results[0], results[1]
+        kpi_values = {name: value for name, value in kpi_row.row(0, named=True).items() if value is not None}
+        return unified_df, kpi_values, dict(zip(aggregations, results[2:]))
@@ -0,0 +1,142 @@
+"""
+Result cache
+============
+Content-addressed cache for the KPI and aggregation stages:
+- Entries are keyed by a fingerprint of the stage input plus the stage
+  parameters. The input is either the unified frame itself (row hashes of
+  every column) or, cheaper, the raw input files and the settings that
+  shape the unified frame.
+- KPI dicts are stored as JSON and aggregation frames as Parquet, one
+  directory per entry under processed/_cache/results
+- Hits refresh an entry's mtime; once the cache grows past max_bytes the
+  least recently used entries are evicted
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import pandas as pd
+import polars as pl
+
+from csv_schema import file_fingerprint
+from output_sinks import atomic_write
+from stage_profiler import path_bytes
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MB = 256
+# Bump when the KPI / aggregation code changes what a key would produce
+CACHE_VERSION = 1
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Hash of a frame's columns, dtypes and every row's values (not its index)"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def inputs_fingerprint(files: Sequence[Path], **settings: Any) -> str:
+    """Hash of the raw files' fingerprints (size, mtime, header) and the settings applied to them"""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'files': [[Path(file_path).name, file_fingerprint(file_path)] for file_path in files],
+        'settings': settings,
+    }, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Size-bounded LRU store of stage results on disk
+    Safe to use from concurrently running stages
+    """
+
+    def __init__(self, cache_dir: Path, max_mb: float = DEFAULT_MAX_MB):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(stage: str, fingerprint: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """Cache key for a stage run on the fingerprinted input with these parameters"""
+        payload = json.dumps({'version': CACHE_VERSION, 'stage': stage, 'input': fingerprint,
+                              'params': params or {}}, sort_keys=True, default=str)
+        return f"{stage}-{hashlib.sha256(payload.encode()).hexdigest()[:32]}"
+
+    def _entry(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def _hit(self, key: str) -> Optional[Path]:
+        entry = self._entry(key)
+        with self._lock:
+            if not entry.is_dir():
+                self.misses += 1
+                return None
+            self.hits += 1
+            os.utime(entry)
+        return entry
+
+    def _store(self, key: str, write) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            atomic_write(self._entry(key), write)
+        except OSError as e:
+            logger.warning(f"Could not cache {key}: {e}")
+            return
+        self.evict()
+
+    def get_json(self, key: str) -> Optional[Any]:
+        entry = self._hit(key)
+        if entry is None:
+            return None
+        with open(entry / "result.json", 'r') as f:
+            return json.load(f)
+
+    def put_json(self, key: str, value: Any) -> None:
+        def write(path: Path) -> None:
+            path.mkdir()
+            with open(path / "result.json", 'w') as f:
+                json.dump(value, f, default=str)
+        self._store(key, write)
+
+    def get_frames(self, key: str) -> Optional[Dict[str, pl.DataFrame]]:
+        entry = self._hit(key)
+        if entry is None:
+            return None
+        with open(entry / "frames.json", 'r') as f:
+            names = json.load(f)
+        return {name: pl.read_parquet(entry / f"{i}.parquet") for i, name in enumerate(names)}
+
+    def put_frames(self, key: str, frames: Dict[str, pl.DataFrame]) -> None:
+        def write(path: Path) -> None:
+            path.mkdir()
+            for i, frame in enumerate(frames.values()):
+                frame.write_parquet(path / f"{i}.parquet")
+            with open(path / "frames.json", 'w') as f:
+                json.dump(list(frames), f)
+        self._store(key, write)
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            if not self.cache_dir.exists():
+                return
+            entries = [(entry.stat().st_mtime, path_bytes(entry), entry)
+                       for entry in self.cache_dir.iterdir() if entry.is_dir() and not entry.name.startswith('.')]
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                logger.info(f"Evicted cached result {entry.name} ({size / 1024:.1f} KB)")
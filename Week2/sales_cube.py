@@ -0,0 +1,170 @@
+"""
+Materialized sales cube
+=======================
+Pre-aggregates mock_sales_data.csv so the practice scripts' group-bys answer
+from a few hundred rows instead of re-reading every order:
+- One row per Region x Category x Product x month with the mergeable
+  sum/count/min/max state of Sales, Price and Quantity (the aggregation
+  spec's partial rollup states)
+- Stored as zstd Parquet with dictionary-encoded dimensions next to the
+  source (mock_sales_data_cube.parquet); the consumed byte offset and a hash
+  of the bytes before it live in the Parquet key-value metadata
+- refresh() parses only the orders appended since the last build and merges
+  them into the cube; a rewritten or truncated source is rebuilt from scratch
+- query() rolls the cube up to any subset of the dimensions (or expressions
+  on them) with sum, count, min, max and mean
+"""
+
+import hashlib
+import io
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple, Union
+
+import polars as pl
+
+from aggregation_spec import Rollup, key_column, merge_partials, partial_rollup
+from output_sinks import atomic_write
+
+logger = logging.getLogger(__name__)
+
+CUBE_VERSION = 1
+CUBE_METADATA_KEY = "sales_cube"
+# Bytes before the consumed offset hashed to detect a rewritten source
+TAIL_HASH_BYTES = 64 * 1024
+
+DATE_COLUMN = 'OrderDate'
+DIMENSIONS = ('Region', 'Category', 'Product')
+MEASURES = ('Sales', 'Price', 'Quantity')
+SOURCE_SCHEMA = {'OrderDate': pl.Date, 'Region': pl.String, 'Category': pl.String, 'Product': pl.String,
+                 'Price': pl.Float64, 'Quantity': pl.Int64, 'Sales': pl.Float64}
+
+CUBE_ROLLUP = Rollup('sales_cube', 'month', by=DIMENSIONS, columns=MEASURES, date_col=DATE_COLUMN)
+CUBE_METRICS = ('sum', 'count', 'min', 'max', 'mean')
+
+
+def tail_hash(source: Path, offset: int) -> str:
+    """Hash of the TAIL_HASH_BYTES bytes before offset"""
+    with open(source, 'rb') as f:
+        f.seek(max(0, offset - TAIL_HASH_BYTES))
+        return hashlib.sha256(f.read(offset - f.tell())).hexdigest()
+
+
+class SalesCube:
+    """
+    Region x Category x Product x month cube over a sales CSV
+    Orders are assumed to be appended only; a trailing line without a
+    newline is treated as still being written and left for the next refresh
+    """
+
+    def __init__(self, source: Path, cube_path: Optional[Path] = None):
+        self.source = Path(source)
+        self.cube_path = Path(cube_path) if cube_path else self.source.with_name(f"{self.source.stem}_cube.parquet")
+        self.cube: Optional[pl.DataFrame] = None
+        self.info: Dict[str, Any] = {}
+
+    def _read_info(self) -> Optional[Dict[str, Any]]:
+        """Refresh state stored with the cube, or None if there is no usable cube"""
+        if not self.cube_path.exists():
+            return None
+        try:
+            info = json.loads(pl.read_parquet_metadata(self.cube_path)[CUBE_METADATA_KEY])
+        except (KeyError, ValueError, OSError) as e:
+            logger.warning(f"Ignoring unreadable cube {self.cube_path}: {e}")
+            return None
+        if info.get('version') != CUBE_VERSION or info.get('source') != self.source.name:
+            return None
+        return info
+
+    def _parse(self, offset: int) -> Tuple[pl.DataFrame, int, bytes]:
+        """(orders from offset up to the last complete line, end offset, header)"""
+        with open(self.source, 'rb') as f:
+            header = f.readline()
+            f.seek(max(offset, len(header)))
+            body = f.read()
+        end = body.rfind(b'\n') + 1
+        orders = pl.read_csv(io.BytesIO(header + body[:end]), schema_overrides=SOURCE_SCHEMA)
+        return orders, max(offset, len(header)) + end, header
+
+    def _partial(self, orders: pl.DataFrame) -> pl.DataFrame:
+        return partial_rollup(orders.lazy(), CUBE_ROLLUP, DATE_COLUMN, MEASURES).collect()
+
+    def _write(self, cube: pl.DataFrame, info: Dict[str, Any]) -> None:
+        keys = [key_column(CUBE_ROLLUP), *DIMENSIONS]
+        cube = cube.with_columns(pl.col(list(DIMENSIONS)).cast(pl.Categorical)).sort(keys)
+        atomic_write(self.cube_path, lambda path: cube.write_parquet(
+            path, compression='zstd', metadata={CUBE_METADATA_KEY: json.dumps(info)}))
+        self.cube, self.info = cube, info
+
+    def build(self) -> pl.DataFrame:
+        """Aggregate the whole source into a new cube"""
+        orders, offset, header = self._parse(0)
+        info = {'version': CUBE_VERSION, 'source': self.source.name, 'offset': offset, 'rows': len(orders),
+                'header': hashlib.sha256(header).hexdigest(), 'tail_hash': tail_hash(self.source, offset)}
+        self._write(self._partial(orders), info)
+        logger.info(f"Built {self.cube_path.name}: {len(self.cube)} cells from {len(orders)} orders")
+        return self.cube
+
+    def refresh(self) -> pl.DataFrame:
+        """Bring the cube up to date with the source, reading only appended orders when possible"""
+        info = self._read_info()
+        if info is None:
+            return self.build()
+
+        size = self.source.stat().st_size
+        with open(self.source, 'rb') as f:
+            header = f.readline()
+        if (size < info['offset'] or hashlib.sha256(header).hexdigest() != info['header']
+                or tail_hash(self.source, info['offset']) != info['tail_hash']):
+            logger.info(f"{self.source.name} was rewritten; rebuilding {self.cube_path.name}")
+            return self.build()
+
+        cube = pl.read_parquet(self.cube_path)
+        orders, offset, _ = self._parse(info['offset'])
+        if not len(orders):
+            self.cube, self.info = cube, info
+            logger.info(f"{self.cube_path.name} is up to date ({info['rows']} orders)")
+            return cube
+
+        merged = merge_partials([cube.with_columns(pl.col(list(DIMENSIONS)).cast(pl.String)),
+                                 self._partial(orders)], CUBE_ROLLUP)
+        info = {**info, 'offset': offset, 'rows': info['rows'] + len(orders),
+                'tail_hash': tail_hash(self.source, offset)}
+        self._write(merged, info)
+        logger.info(f"Appended {len(orders)} orders to {self.cube_path.name} ({len(self.cube)} cells)")
+        return self.cube
+
+    def query(self, by: Sequence[Union[str, pl.Expr]], measure: str = 'Sales',
+              metrics: Sequence[str] = ('sum',)) -> pl.DataFrame:
+        """Roll the cube up to by (dimension names or expressions such as pl.col('month').dt.month())
+
+        Returns one column per metric, named after the metric, sorted by the group keys;
+        dimension keys come back as strings so they join with the source's other tables.
+        """
+        if self.cube is None:
+            self.refresh()
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown measure {measure!r}, expected one of {list(MEASURES)}")
+        unsupported = [metric for metric in metrics if metric not in CUBE_METRICS]
+        if unsupported:
+            raise ValueError(f"Unsupported metrics {unsupported}, expected {list(CUBE_METRICS)}")
+
+        total, count = pl.col(f"{measure}__sum").sum(), pl.col(f"{measure}__count").sum()
+        aggs = {
+            'sum': total,
+            'count': count,
+            'min': pl.col(f"{measure}__min").min(),
+            'max': pl.col(f"{measure}__max").max(),
+            'mean': total / count,
+        }
+        keys = [pl.col(key) if isinstance(key, str) else key for key in by]
+        names = [key.meta.output_name() for key in keys]
+        return (
+            self.cube.lazy()
+            .group_by(keys)
+            .agg([aggs[metric].alias(metric) for metric in metrics])
+            .with_columns(pl.col([name for name in names if name in DIMENSIONS]).cast(pl.String))
+            .sort(names)
+            .collect()
+        )
@@ -0,0 +1,284 @@
+"""
+Sample data generator
+=====================
+Vectorized synthetic datasets for the pipeline and its benchmarks:
+- Every column is drawn as a NumPy array from one seeded Generator, so the
+  same seed (and chunk size) always produces the same files
+- scale multiplies the base sizes (10,000 sales, 2,000 customers, 500 products)
+- Rows are produced chunk_size at a time and appended to the CSV, JSON and
+  Parquet outputs, so memory stays flat however many rows are requested
+- generate_sharded splits every dataset into row-range shards written by a
+  process pool; each shard draws from its own SeedSequence child stream, so
+  the files are bit-for-bit identical whatever the number of workers, and a
+  dataset manifest lets the pipeline ingest the parts as one dataset
+"""
+
+import logging
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import repeat
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import polars as pl
+import pyarrow.parquet as pq
+
+from csv_export import write_csv
+from dataset_manifest import DATASET_MANIFEST, write_dataset_manifest
+
+logger = logging.getLogger(__name__)
+
+BASE_SALES = 10_000
+BASE_CUSTOMERS = 2_000
+BASE_PRODUCTS = 500
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+REGIONS = ['North', 'South', 'East', 'West']
+FIRST_NAMES = ['John', 'Jane', 'Bob', 'Alice', 'Charlie', 'Diana']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia']
+SEGMENTS = ['Premium', 'Standard', 'Basic']
+CATEGORIES = ['Electronics', 'Clothing', 'Home', 'Sports', 'Books']
+
+# Sharded datasets: name -> (format, row count attribute, writer method)
+SHARDED_DATASETS = {
+    'sales_data': ('csv', 'n_sales', 'write_sales_csv'),
+    'customers_data': ('json', 'n_customers', 'write_customers_json'),
+    'products_data': ('parquet', 'n_products', 'write_products_parquet'),
+}
+
+
+def format_ids(prefix: str, numbers: np.ndarray, width: int) -> pl.Series:
+    """Zero-padded string keys like CUST_0042 for an array of integers"""
+    return prefix + pl.Series(numbers).cast(pl.String).str.zfill(width)
+
+
+def random_dates(rng: np.random.Generator, start: str, days: int, size: int) -> np.ndarray:
+    """Dates uniformly spread over start .. start + days (inclusive)"""
+    return np.datetime64(start, 'D') + rng.integers(0, days + 1, size)
+
+
+def choose(rng: np.random.Generator, values: list, size: int) -> pl.Series:
+    """Uniform picks from a small list of labels"""
+    return pl.Series(values).gather(rng.integers(0, len(values), size))
+
+
+def shard_bounds(n_rows: int, shard: int, n_shards: int) -> Tuple[int, int]:
+    """Row range start .. stop covered by one shard"""
+    return n_rows * shard // n_shards, n_rows * (shard + 1) // n_shards
+
+
+def shard_file(dataset: str, file_format: str, shard: int) -> str:
+    """Part file of a shard relative to raw_data, e.g. sales_data/sales_data-00003.csv"""
+    return f"{dataset}/{dataset}-{shard:05d}.{file_format}"
+
+
+def _generate_shard(raw_data_path: str, scale: int, chunk_size: int, seed: np.random.SeedSequence,
+                    shard: int, n_shards: int) -> Dict[str, int]:
+    """Write one shard of every dataset and return its row counts.
+
+    Kept at module level so it can be shipped to a process pool.
+    """
+    generator = SampleDataGenerator(raw_data_path, scale, seed=seed, chunk_size=chunk_size)
+    rows = {}
+    for name, (file_format, size_attr, write) in SHARDED_DATASETS.items():
+        start, stop = shard_bounds(getattr(generator, size_attr), shard, n_shards)
+        path = generator.raw_data_path / shard_file(name, file_format, shard)
+        rows[name] = getattr(generator, write)(path, start, stop)
+    return rows
+
+
+class SampleDataGenerator:
+    """Generate realistic sample datasets for the pipeline
+
+    scale multiplies the base sizes (10,000 sales, 2,000 customers, 500 products)
+    seed (an int or a SeedSequence) makes the output reproducible; None draws
+    fresh entropy each run
+    """
+
+    def __init__(self, raw_data_path: str = "raw_data", scale: int = 1,
+                 seed: Optional[Union[int, np.random.SeedSequence]] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.raw_data_path = Path(raw_data_path)
+        self.raw_data_path.mkdir(parents=True, exist_ok=True)
+        self.scale = scale
+        self.n_sales = BASE_SALES * scale
+        self.n_customers = BASE_CUSTOMERS * scale
+        self.n_products = BASE_PRODUCTS * scale
+        # ID widths grow with scale so keys stay fixed-width and unique
+        self.sales_width = max(6, len(str(self.n_sales - 1)))
+        self.customer_width = max(4, len(str(self.n_customers)))
+        self.product_width = max(3, len(str(self.n_products)))
+        self.chunk_size = chunk_size
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+
+    def _chunks(self, start: int, stop: int, build: Callable[[int, int], pl.DataFrame]) -> Iterator[pl.DataFrame]:
+        for chunk_start in range(start, stop, self.chunk_size):
+            yield build(chunk_start, min(self.chunk_size, stop - chunk_start))
+
+    def sales_chunk(self, start: int, size: int) -> pl.DataFrame:
+        """Sales rows start .. start + size"""
+        rng = self.rng
+        quantity = rng.integers(1, 11, size)
+        unit_price = np.round(rng.uniform(10, 500, size), 2)
+        return pl.DataFrame({
+            'transaction_id': format_ids('TXN_', np.arange(start, start + size), self.sales_width),
+            'customer_id': format_ids('CUST_', rng.integers(1, self.n_customers + 1, size), self.customer_width),
+            'product_id': format_ids('PROD_', rng.integers(1, self.n_products + 1, size), self.product_width),
+            'sale_date': random_dates(rng, '2023-01-01', 365, size),
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'total_amount': np.round(quantity * unit_price, 2),
+            'region': choose(rng, REGIONS, size),
+            'sales_rep': format_ids('REP_', rng.integers(1, 51, size), 2),
+        })
+
+    def customers_chunk(self, start: int, size: int) -> pl.DataFrame:
+        """Customer rows start .. start + size"""
+        rng = self.rng
+        numbers = np.arange(start + 1, start + size + 1)
+        return pl.DataFrame({
+            'customer_id': format_ids('CUST_', numbers, self.customer_width),
+            'first_name': choose(rng, FIRST_NAMES, size),
+            'last_name': choose(rng, LAST_NAMES, size),
+            'email': 'customer' + pl.Series(numbers).cast(pl.String) + '@email.com',
+            'age': rng.integers(18, 81, size),
+            'registration_date': pl.Series(random_dates(rng, '2020-01-01', 1095, size)).dt.strftime('%Y-%m-%dT00:00:00'),
+            'customer_segment': choose(rng, SEGMENTS, size),
+            'annual_spend': np.round(rng.uniform(100, 5000, size), 2),
+        })
+
+    def products_chunk(self, start: int, size: int) -> pl.DataFrame:
+        """Product rows start .. start + size"""
+        rng = self.rng
+        numbers = np.arange(start + 1, start + size + 1)
+        return pl.DataFrame({
+            'product_id': format_ids('PROD_', numbers, self.product_width),
+            'product_name': format_ids('Product ', numbers, 1),
+            'category': choose(rng, CATEGORIES, size),
+            'cost': np.round(rng.uniform(5, 200, size), 2),
+            'price': np.round(rng.uniform(10, 500, size), 2),
+            'stock_quantity': rng.integers(0, 1001, size),
+            'supplier_id': format_ids('SUP_', rng.integers(1, 21, size), 2),
+            'launch_date': random_dates(rng, '2020-01-01', 1095, size).astype('datetime64[us]'),
+        })
+
+    def write_sales_csv(self, path: Path, start: int = 0, stop: Optional[int] = None) -> int:
+        """Write sales rows start .. stop to a CSV file and return the row count"""
+        written = 0
+        for chunk in self._chunks(start, self.n_sales if stop is None else stop, self.sales_chunk):
+            written += write_csv(chunk, path, append=written > 0)
+        return written
+
+    def write_customers_json(self, path: Path, start: int = 0, stop: Optional[int] = None) -> int:
+        """Write customer rows start .. stop as a top-level JSON array, one record per line"""
+        written = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('[\n')
+            for chunk in self._chunks(start, self.n_customers if stop is None else stop, self.customers_chunk):
+                if written:
+                    f.write(',\n')
+                f.write(chunk.write_ndjson().rstrip('\n').replace('\n', ',\n'))
+                written += chunk.height
+            f.write('\n]\n')
+        return written
+
+    def write_products_parquet(self, path: Path, start: int = 0, stop: Optional[int] = None) -> int:
+        """Write product rows start .. stop to a Parquet file and return the row count"""
+        writer = None
+        written = 0
+        try:
+            for chunk in self._chunks(start, self.n_products if stop is None else stop, self.products_chunk):
+                table = chunk.to_arrow()
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                written += chunk.height
+        finally:
+            if writer is not None:
+                writer.close()
+        return written
+
+    def generate_sales_csv(self) -> None:
+        """Generate sales data CSV"""
+        logger.info(f"Generating sales_data.csv in {self.raw_data_path}...")
+        written = self.write_sales_csv(self.raw_data_path / "sales_data.csv")
+        logger.info(f"Generated sales_data.csv with {written} records")
+
+    def generate_customers_json(self) -> None:
+        """Generate customer data JSON"""
+        logger.info("Generating customers_data.json...")
+        written = self.write_customers_json(self.raw_data_path / "customers_data.json")
+        logger.info(f"Generated customers_data.json with {written} records")
+
+    def generate_products_parquet(self) -> None:
+        """Generate product data Parquet"""
+        logger.info("Generating products_data.parquet...")
+        written = self.write_products_parquet(self.raw_data_path / "products_data.parquet")
+        logger.info(f"Generated products_data.parquet with {written} records")
+
+    def shard_seeds(self, n_shards: int) -> List[np.random.SeedSequence]:
+        """Independent child streams of the generator's seed, one per shard.
+
+        Equivalent to SeedSequence.spawn but without advancing the parent, so
+        calling it again yields the same streams.
+        """
+        root = self.seed_sequence
+        return [np.random.SeedSequence(root.entropy, spawn_key=(*root.spawn_key, shard))
+                for shard in range(n_shards)]
+
+    def generate_sharded(self, n_shards: int, workers: Optional[int] = None) -> Path:
+        """Generate every dataset as n_shards part files plus a dataset manifest.
+
+        Shard i covers the i-th row range of each dataset and is drawn from the
+        i-th child seed, so the output depends on the seed, scale, shard count
+        and chunk size but not on workers. Returns the manifest path.
+        """
+        if not 1 <= n_shards <= min(self.n_sales, self.n_customers, self.n_products):
+            raise ValueError(f"n_shards must be between 1 and the smallest dataset size, got {n_shards}")
+        workers = max(1, min(workers or os.cpu_count() or 1, n_shards))
+        logger.info(f"Generating {n_shards} shards in {self.raw_data_path} with {workers} workers...")
+
+        # No manifest while parts are rewritten, so a half-written dataset is never ingested
+        (self.raw_data_path / DATASET_MANIFEST).unlink(missing_ok=True)
+        for name in SHARDED_DATASETS:
+            shutil.rmtree(self.raw_data_path / name, ignore_errors=True)
+            (self.raw_data_path / name).mkdir()
+
+        generate = partial(_generate_shard, str(self.raw_data_path), self.scale, self.chunk_size)
+        seeds = self.shard_seeds(n_shards)
+        if workers == 1:
+            rows = list(map(generate, seeds, range(n_shards), repeat(n_shards)))
+        else:
+            # spawn, not fork: forking after Polars has started its thread pool can deadlock
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                rows = list(pool.map(generate, seeds, range(n_shards), repeat(n_shards)))
+
+        datasets = {
+            name: {
+                'format': file_format,
+                'files': [{'path': shard_file(name, file_format, shard), 'rows': rows[shard][name]}
+                          for shard in range(n_shards)],
+            }
+            for name, (file_format, _, _) in SHARDED_DATASETS.items()
+        }
+        manifest_path = write_dataset_manifest(
+            self.raw_data_path, datasets, scale=self.scale, shards=n_shards, chunk_size=self.chunk_size,
+            seed_entropy=self.seed_sequence.entropy, spawn_key=list(self.seed_sequence.spawn_key))
+        logger.info(f"Generated {n_shards} shards: " +
+                    ", ".join(f"{name} {sum(shard[name] for shard in rows)} records" for name in SHARDED_DATASETS))
+        return manifest_path
+
+    def generate_all_sample_data(self) -> None:
+        """Generate all sample datasets"""
+        logger.info("Generating all sample datasets...")
+        # A manifest left by a sharded run would shadow the flat files
+        (self.raw_data_path / DATASET_MANIFEST).unlink(missing_ok=True)
+        self.generate_sales_csv()
+        self.generate_customers_json()
+        self.generate_products_parquet()
+        logger.info("Sample data generation completed!")
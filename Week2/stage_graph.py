@@ -0,0 +1,160 @@
+"""
+Stage graph scheduler
+=====================
+Runs pipeline stages as a dependency graph instead of a fixed sequence:
+- Every stage names the stages whose results it consumes; its function is
+  called with those results, in the declared order, as positional arguments
+- A stage is submitted to a thread pool as soon as its dependencies have
+  finished, so independent stages (the per-format ingests, KPIs next to
+  aggregations) overlap
+- Start/end times of every stage give the critical path: the dependency
+  chain with the largest summed duration, a lower bound on wall time that
+  more workers cannot beat. Stages off that path add no wall time.
+"""
+
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class StageNode(NamedTuple):
+    """One declared stage of the graph"""
+    name: str
+    fn: Callable[..., Any]
+    deps: Tuple[str, ...]
+
+
+class StageGraph:
+    """
+    Dependency graph of pipeline stages
+    Stages must be added after their dependencies, which keeps the graph
+    acyclic and makes insertion order a valid sequential order
+    """
+
+    def __init__(self):
+        self.nodes: Dict[str, StageNode] = {}
+        self.results: Dict[str, Any] = {}
+        # name -> (start, end) in seconds since the first run() call
+        self.timings: Dict[str, Tuple[float, float]] = {}
+        self._origin: Optional[float] = None
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Sequence[str] = ()) -> None:
+        if name in self.nodes:
+            raise ValueError(f"Stage {name!r} is already declared")
+        missing = [dep for dep in deps if dep not in self.nodes]
+        if missing:
+            raise ValueError(f"Stage {name!r} depends on undeclared stages {missing}")
+        self.nodes[name] = StageNode(name, fn, tuple(deps))
+
+    def _required(self, targets: Optional[Sequence[str]]) -> List[str]:
+        """Stages still to run for targets (all stages when None), in insertion order"""
+        if targets is None:
+            needed = set(self.nodes)
+        else:
+            needed, stack = set(), list(targets)
+            while stack:
+                name = stack.pop()
+                if name not in self.nodes:
+                    raise KeyError(f"Unknown stage {name!r}")
+                if name not in needed:
+                    needed.add(name)
+                    stack.extend(self.nodes[name].deps)
+        return [name for name in self.nodes if name in needed and name not in self.results]
+
+    def _execute(self, name: str) -> None:
+        node = self.nodes[name]
+        start = time.perf_counter()
+        result = node.fn(*(self.results[dep] for dep in node.deps))
+        end = time.perf_counter()
+        self.timings[name] = (start - self._origin, end - self._origin)
+        self.results[name] = result
+
+    def run(self, max_workers: int = 4, targets: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Run the stages needed for targets (default: all) and return every result so far.
+
+        Stages already run are not repeated, so a graph can be run up to a
+        checkpoint, inspected and then finished. max_workers=1 runs the stages
+        one after another in the calling thread. The first failure stops new
+        stages from starting and is re-raised once running ones finish.
+        """
+        pending = self._required(targets)
+        if self._origin is None:
+            self._origin = time.perf_counter()
+
+        if max_workers <= 1:
+            for name in pending:
+                self._execute(name)
+            return self.results
+
+        error: Optional[BaseException] = None
+        running: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage") as pool:
+            while pending or running:
+                if error is None:
+                    ready = [name for name in pending if all(dep in self.results for dep in self.nodes[name].deps)]
+                    for name in ready:
+                        pending.remove(name)
+                        running[pool.submit(self._execute, name)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        logger.error(f"Stage {name} failed: {e}")
+                        error = error or e
+        if error is not None:
+            raise error
+        return self.results
+
+    def critical_path(self) -> Tuple[List[str], float]:
+        """Longest chain of finished stages by summed duration, with that duration"""
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for name, node in self.nodes.items():
+            if name not in self.timings:
+                continue
+            start, end = self.timings[name]
+            before = max(((finish[dep], dep) for dep in node.deps if dep in finish), default=(0.0, None))
+            finish[name] = before[0] + end - start
+            previous[name] = before[1]
+        if not finish:
+            return [], 0.0
+
+        name = max(finish, key=finish.get)
+        total = finish[name]
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1], total
+
+    def summary(self) -> pd.DataFrame:
+        """One row per finished stage: dependencies, start/end, duration and critical-path flag"""
+        path, _ = self.critical_path()
+        rows = [{
+            'stage': name,
+            'depends_on': ', '.join(self.nodes[name].deps),
+            'start_s': round(start, 4),
+            'end_s': round(end, 4),
+            'duration_s': round(end - start, 4),
+            'critical': name in path,
+        } for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0])]
+        return pd.DataFrame(rows, columns=['stage', 'depends_on', 'start_s', 'end_s', 'duration_s', 'critical'])
+
+    def report(self) -> str:
+        """Critical path with its share of the graph's wall time"""
+        path, total = self.critical_path()
+        if not path:
+            return "No stages have run"
+        wall = max(end for _, end in self.timings.values()) - min(start for start, _ in self.timings.values())
+        busy = sum(end - start for start, end in self.timings.values())
+        return (f"Critical path: {' -> '.join(path)} ({total:.3f}s); "
+                f"wall {wall:.3f}s for {busy:.3f}s of stage time")
@@ -0,0 +1,364 @@
+"""
+Stage profiler
+==============
+Measures every pipeline stage instead of logging a single RSS reading:
+- Wall time, CPU time (including reaped worker processes) and CPU utilisation
+- RSS at start/end and the peak RSS reached during the stage
+- Optional tracemalloc peak of Python allocations (slows the run down)
+- Rows and bytes going in and out, and rows/MB per second
+- One JSON line per stage plus a summary table
+- Optionally a MemorySampler thread polls RSS during the run, catching
+  transient peaks inside a stage and producing a memory timeline
+Stages may be nested; the profiled decorator wraps DataPipeline methods.
+Each thread keeps its own stack of running stages, so stages scheduled
+concurrently (see stage_graph) are recorded side by side. CPU, RSS and
+tracemalloc readings are process-wide, so stages whose run overlapped a
+stage of another thread are marked shared: their figures include the
+other stages' usage.
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import polars as pl
+import psutil
+import pyarrow as pa
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Stage label for memory samples taken while no stage is running
+OUTSIDE_STAGES = '(between stages)'
+
+SUMMARY_COLUMNS = ['stage', 'wall_s', 'cpu_s', 'peak_rss_mb', 'sampled_peak_rss_mb', 'tracemalloc_peak_mb',
+                   'rows_in', 'rows_out', 'mb_in', 'mb_out', 'rows_per_s', 'mb_per_s', 'shared']
+
+SHARED_NOTE = ("shared: the stage overlapped stages of other threads; its CPU and memory figures are "
+               "process-wide and include theirs")
+
+
+def frame_size(obj: Any) -> Tuple[Optional[int], Optional[int]]:
+    """(rows, bytes) of a frame/table, or summed over a dict/list of them; (None, None) otherwise"""
+    if isinstance(obj, pd.DataFrame):
+        return len(obj), int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pl.DataFrame):
+        return obj.height, int(obj.estimated_size())
+    if isinstance(obj, (pa.Table, pa.RecordBatch)):
+        return obj.num_rows, int(obj.nbytes)
+    if isinstance(obj, (dict, list, tuple)):
+        values = obj.values() if isinstance(obj, dict) else obj
+        sizes = [frame_size(value) for value in values]
+        sizes = [size for size in sizes if size[0] is not None]
+        if sizes:
+            return sum(rows for rows, _ in sizes), sum(size for _, size in sizes)
+    return None, None
+
+
+def path_bytes(path: Path) -> int:
+    """Size of a file, or of every file under a directory"""
+    path = Path(path)
+    if path.is_dir():
+        return sum(child.stat().st_size for child in path.rglob('*') if child.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    """Process-lifetime RSS high-water mark from getrusage"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _cpu_seconds(process: psutil.Process) -> float:
+    times = process.cpu_times()
+    return times.user + times.system + getattr(times, 'children_user', 0) + getattr(times, 'children_system', 0)
+
+
+class Stage:
+    """Measurements of one running stage; the body reports rows/bytes through it"""
+
+    def __init__(self, name: str, depth: int):
+        self.name = name
+        self.depth = depth
+        self.rows_in: Optional[int] = None
+        self.bytes_in: Optional[int] = None
+        self.rows_out: Optional[int] = None
+        self.bytes_out: Optional[int] = None
+        self.traced_peak = 0
+        self.sampled_peak: Optional[int] = None
+        # Set once a stage of another thread runs at the same time
+        self.shared = False
+
+    def add_input(self, rows: Optional[int] = None, nbytes: Optional[int] = None) -> None:
+        """Accumulate input rows/bytes (e.g. once per raw file read)"""
+        if rows is not None:
+            self.rows_in = (self.rows_in or 0) + rows
+        if nbytes is not None:
+            self.bytes_in = (self.bytes_in or 0) + nbytes
+
+    def input(self, obj: Any) -> None:
+        rows, nbytes = frame_size(obj)
+        self.add_input(rows, nbytes)
+
+    def output(self, obj: Any) -> Any:
+        """Measure a stage result unless the body already set the output explicitly; returns obj"""
+        if self.rows_out is None and self.bytes_out is None:
+            self.rows_out, self.bytes_out = frame_size(obj)
+        return obj
+
+
+class StageProfiler:
+    """
+    Collects one record per stage
+    trace_allocations turns on tracemalloc for the lifetime of the profiler
+    """
+
+    def __init__(self, trace_allocations: bool = False):
+        self.trace_allocations = trace_allocations
+        self.process = psutil.Process()
+        self.records: List[Dict[str, Any]] = []
+        self._stacks: Dict[int, List[Stage]] = {}
+        self._lock = threading.Lock()
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def active(self) -> List[Stage]:
+        """Running stages of the calling thread, outermost first"""
+        with self._lock:
+            return self._stacks.setdefault(threading.get_ident(), [])
+
+    def running(self) -> List[List[Stage]]:
+        """Snapshot of the running stage stacks of every thread"""
+        with self._lock:
+            return [list(stack) for stack in self._stacks.values() if stack]
+
+    def _mark_overlaps(self, stage: Stage) -> None:
+        """Mark a starting stage and the stages other threads are running as shared"""
+        ident = threading.get_ident()
+        with self._lock:
+            others = [other for thread, stack in self._stacks.items() if thread != ident for other in stack]
+        if others:
+            stage.shared = True
+            for other in others:
+                other.shared = True
+
+    @property
+    def current(self) -> Optional[Stage]:
+        """Innermost running stage"""
+        return self.active[-1] if self.active else None
+
+    def add_input(self, rows: Optional[int] = None, nbytes: Optional[int] = None) -> None:
+        """Count input rows/bytes towards every running stage"""
+        for stage in self.active:
+            stage.add_input(rows, nbytes)
+
+    @contextmanager
+    def stage(self, name: str, inputs: Any = None) -> Iterator[Stage]:
+        active = self.active
+        stage = Stage(name, len(active))
+        if inputs is not None:
+            stage.input(inputs)
+        if self.trace_allocations:
+            # Hand the peak seen so far to the enclosing stage before resetting it
+            if active:
+                active[-1].traced_peak = max(active[-1].traced_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+        active.append(stage)
+        self._mark_overlaps(stage)
+        started = datetime.now()
+        rss_start = self.process.memory_info().rss
+        peak_start = _peak_rss_bytes()
+        cpu_start = _cpu_seconds(self.process)
+        wall_start = time.perf_counter()
+        status = 'ok'
+        try:
+            yield stage
+        except BaseException:
+            status = 'failed'
+            raise
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = _cpu_seconds(self.process) - cpu_start
+            rss_end = self.process.memory_info().rss
+            peak_end = _peak_rss_bytes()
+            active.pop()
+
+            # getrusage only reports a lifetime maximum, which belongs to this stage if it moved
+            peak_rss = max(rss_start, rss_end)
+            if peak_end is not None and peak_start is not None and peak_end > peak_start:
+                peak_rss = max(peak_rss, peak_end)
+
+            traced_peak = None
+            if self.trace_allocations:
+                stage.traced_peak = max(stage.traced_peak, tracemalloc.get_traced_memory()[1])
+                traced_peak = stage.traced_peak
+                if active:
+                    active[-1].traced_peak = max(active[-1].traced_peak, traced_peak)
+                tracemalloc.reset_peak()
+
+            self._record(stage, status, started, wall, cpu, rss_start, rss_end, peak_rss, traced_peak)
+
+    def _record(self, stage: Stage, status: str, started: datetime, wall: float, cpu: float,
+                rss_start: int, rss_end: int, peak_rss: int, traced_peak: Optional[int]) -> None:
+        rows = stage.rows_in if stage.rows_in is not None else stage.rows_out
+        nbytes = stage.bytes_in if stage.bytes_in is not None else stage.bytes_out
+        record = {
+            'stage': stage.name,
+            'depth': stage.depth,
+            'status': status,
+            'started': started.isoformat(timespec='milliseconds'),
+            'wall_s': round(wall, 4),
+            'cpu_s': round(cpu, 4),
+            'cpu_util': round(cpu / wall, 2) if wall > 0 else None,
+            'rss_start_mb': round(rss_start / MB, 2),
+            'rss_end_mb': round(rss_end / MB, 2),
+            'peak_rss_mb': round(peak_rss / MB, 2),
+            'sampled_peak_rss_mb': round(stage.sampled_peak / MB, 2) if stage.sampled_peak is not None else None,
+            'tracemalloc_peak_mb': round(traced_peak / MB, 2) if traced_peak is not None else None,
+            'rows_in': stage.rows_in,
+            'rows_out': stage.rows_out,
+            'mb_in': round(stage.bytes_in / MB, 3) if stage.bytes_in is not None else None,
+            'mb_out': round(stage.bytes_out / MB, 3) if stage.bytes_out is not None else None,
+            'rows_per_s': round(rows / wall) if rows is not None and wall > 0 else None,
+            'mb_per_s': round(nbytes / MB / wall, 2) if nbytes is not None and wall > 0 else None,
+            'shared': stage.shared,
+        }
+        self.records.append(record)
+        logger.info(f"Stage {stage.name}: {wall:.3f}s wall, {cpu:.3f}s CPU, "
+                     f"peak RSS {record['peak_rss_mb']:.2f} MB" + (" (shared with concurrent stages)" if stage.shared else ""))
+        logger.debug(f"stage_profile {json.dumps(record)}")
+
+    def to_jsonl(self) -> str:
+        return ''.join(json.dumps(record) + '\n' for record in self.records)
+
+    def write_jsonl(self, path: Path) -> None:
+        with open(path, 'w') as f:
+            f.write(self.to_jsonl())
+
+    def summary(self) -> pd.DataFrame:
+        """One row per stage in completion order, nested stages indented"""
+        if not self.records:
+            return pd.DataFrame(columns=SUMMARY_COLUMNS)
+        summary = pd.DataFrame(self.records)
+        summary['stage'] = ['  ' * depth + name for depth, name in zip(summary['depth'], summary['stage'])]
+        counts = ['rows_in', 'rows_out', 'rows_per_s']
+        summary = summary.astype({col: 'Int64' for col in counts})
+        summary = summary.astype({col: 'Float64' for col in SUMMARY_COLUMNS[1:-1] if col not in counts})
+        return summary[SUMMARY_COLUMNS]
+
+    def summary_table(self) -> str:
+        summary = self.summary().astype(object)
+        summary = summary.where(summary.notna(), '-')
+        shared = summary['shared'].any()
+        summary['shared'] = summary['shared'].map({True: 'yes', False: ''})
+        width = max([len(name) for name in summary['stage']], default=0)
+        table = summary.to_string(index=False, formatters={'stage': lambda name: name.ljust(width)})
+        return f"{table}\n{SHARED_NOTE}" if shared else table
+
+
+def profiled(name: str):
+    """Run a DataPipeline method as a profiler stage, measuring its first argument and its result"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.profiler.stage(name, inputs=args[0] if args else None) as stage:
+                return stage.output(method(self, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+class MemorySampler:
+    """
+    Background thread sampling RSS every interval seconds
+    Each sample is attributed to the innermost running profiler stage (of
+    every thread, joined with ' + ' when stages overlap) and raises the
+    sampled peak of every running stage; include_children adds the RSS of
+    worker processes (e.g. a process pool)
+    """
+
+    def __init__(self, profiler: StageProfiler, interval: float = 0.05, include_children: bool = True):
+        self.profiler = profiler
+        self.interval = interval
+        self.include_children = include_children
+        self.process = psutil.Process()
+        self.samples: List[Tuple[float, str, int]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start = 0.0
+
+    def _rss(self) -> int:
+        rss = self.process.memory_info().rss
+        if self.include_children:
+            for child in self.process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    pass  # Worker exited between listing and sampling
+        return rss
+
+    def sample(self) -> None:
+        rss = self._rss()
+        stacks = self.profiler.running()
+        for stack in stacks:
+            for stage in stack:
+                if stage.sampled_peak is None or rss > stage.sampled_peak:
+                    stage.sampled_peak = rss
+        label = ' + '.join(stack[-1].name for stack in stacks) if stacks else OUTSIDE_STAGES
+        self.samples.append((time.perf_counter() - self._start, label, rss))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def start(self) -> 'MemorySampler':
+        self._start = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'MemorySampler':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def timeline(self) -> pd.DataFrame:
+        """Samples as elapsed_s / stage / rss_mb rows"""
+        timeline = pd.DataFrame(self.samples, columns=['elapsed_s', 'stage', 'rss_bytes'])
+        timeline['elapsed_s'] = timeline['elapsed_s'].round(4)
+        timeline['rss_mb'] = (timeline.pop('rss_bytes') / MB).round(2)
+        return timeline
+
+    def high_water_mark(self) -> Tuple[Optional[str], float]:
+        """(stage, MB) of the largest sample"""
+        if not self.samples:
+            return None, 0.0
+        _, stage, rss = max(self.samples, key=lambda sample: sample[2])
+        return stage, round(rss / MB, 2)
@@ -0,0 +1,236 @@
+"""
+Bitmap and zone-map index
+=========================
+Persisted secondary index over a CSV dataset (e.g. mock_sales_data.csv), so
+selective filters touch a fraction of the rows instead of scanning them all:
+- Low-cardinality string columns get one bitmap per value (packed bits, one
+  per row); equality / IN predicates are ANDs and ORs of bitmaps
+- Numeric and date columns get per-block zone maps (min, max, null count
+  per block_size rows); range predicates skip blocks that cannot match and
+  accept blocks that match entirely without reading them
+- The rows are stored alongside as Parquet with one row group per block, so
+  only partially matching blocks are read to evaluate a predicate
+- Everything lives in <stem>_index/ next to the source and is rebuilt when
+  the source's fingerprint (size, mtime, header hash) changes
+
+Filters use pyarrow's (column, op, value) tuples, combined with AND:
+    index.lookup([('Region', '==', 'North'), ('Sales', '>', 500)])
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from csv_schema import file_fingerprint
+from output_sinks import atomic_write
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+# Rows per zone-map block / Parquet row group (a multiple of 8 so blocks align with packed bitmap bytes)
+DEFAULT_BLOCK_SIZE = 4096
+# String columns with more distinct values than this get no bitmaps
+DEFAULT_MAX_CATEGORIES = 256
+
+BITMAP_OPS = ('==', '=', 'in')
+RANGE_OPS = ('==', '=', '<', '<=', '>', '>=')
+
+Filter = Tuple[str, str, Any]
+
+
+def zone_classes(mins: np.ndarray, maxs: np.ndarray, nulls: np.ndarray, op: str, value: Any
+                 ) -> Tuple[np.ndarray, np.ndarray]:
+    """(no row can match, every row matches) per block for one range predicate.
+
+    All-null blocks have NaN/NaT bounds, which compare false and rule the block out.
+    """
+    if op in ('==', '='):
+        some, every = (mins <= value) & (maxs >= value), (mins == value) & (maxs == value)
+    elif op == '<':
+        some, every = mins < value, maxs < value
+    elif op == '<=':
+        some, every = mins <= value, maxs <= value
+    elif op == '>':
+        some, every = maxs > value, mins > value
+    else:
+        some, every = maxs >= value, mins >= value
+    return ~some, every & (nulls == 0)
+
+
+def compare(values: np.ndarray, op: str, value: Any) -> np.ndarray:
+    """Row mask of one range predicate (nulls never match)"""
+    if op in ('==', '='):
+        return values == value
+    return {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal}[op](values, value)
+
+
+class TableIndex:
+    """
+    Bitmaps per categorical value and zone maps per block over one dataset
+    Row positions refer to the source's row order, so they can be applied to
+    a frame read from the same file with df.iloc / df[positions]
+    """
+
+    def __init__(self, index_dir: Path, info: Dict[str, Any], bitmaps: Dict[str, Dict[str, np.ndarray]],
+                 zone_maps: pl.DataFrame):
+        self.index_dir = Path(index_dir)
+        self.info = info
+        self.rows = info['rows']
+        self.block_size = info['block_size']
+        self.n_blocks = -(-self.rows // self.block_size)
+        self.bitmaps = bitmaps
+        self.zone_maps = zone_maps
+        self.data_path = self.index_dir / "data.parquet"
+        # Block reads by the last lookup, one per range predicate and undecided block
+        # (the rest were decided from bitmaps / zone maps alone)
+        self.blocks_read = 0
+
+    @staticmethod
+    def default_dir(source: Path) -> Path:
+        return Path(source).with_name(f"{Path(source).stem}_index")
+
+    @classmethod
+    def build(cls, source: Path, index_dir: Optional[Path] = None, block_size: int = DEFAULT_BLOCK_SIZE,
+              max_categories: int = DEFAULT_MAX_CATEGORIES) -> "TableIndex":
+        """Read the source once and persist its rows, bitmaps and zone maps"""
+        if block_size % 8:
+            raise ValueError(f"block_size must be a multiple of 8, got {block_size}")
+        source = Path(source)
+        index_dir = Path(index_dir) if index_dir else cls.default_dir(source)
+        fingerprint = file_fingerprint(source)
+        df = pl.read_csv(source, try_parse_dates=True)
+
+        bitmap_cols = [col for col, dtype in df.schema.items()
+                       if dtype in (pl.String, pl.Categorical) and df[col].n_unique() <= max_categories]
+        zoned_cols = [col for col, dtype in df.schema.items()
+                      if dtype.is_numeric() or isinstance(dtype, (pl.Date, pl.Datetime))]
+
+        bitmap_rows = []
+        for col in bitmap_cols:
+            codes = df[col].cast(pl.String)
+            for value in codes.drop_nulls().unique().sort():
+                bits = np.packbits((codes == value).fill_null(False).to_numpy())
+                bitmap_rows.append({'column': col, 'value': value, 'bits': bits.tobytes()})
+        bitmap_table = pl.DataFrame(bitmap_rows, schema={'column': pl.String, 'value': pl.String, 'bits': pl.Binary})
+
+        zone_maps = (
+            df.select(zoned_cols)
+            .with_row_index('block')
+            .group_by(pl.col('block') // block_size)
+            .agg([agg for col in zoned_cols
+                  for agg in (pl.col(col).min().alias(f"{col}__min"), pl.col(col).max().alias(f"{col}__max"),
+                              pl.col(col).null_count().alias(f"{col}__nulls"))])
+            .sort('block')
+        )
+        info = {'version': INDEX_VERSION, 'source': source.name, 'fingerprint': fingerprint, 'rows': len(df),
+                'block_size': block_size, 'bitmap_columns': bitmap_cols, 'zoned_columns': zoned_cols}
+
+        def write(path: Path) -> None:
+            path.mkdir(parents=True)
+            df.write_parquet(path / "data.parquet", compression='zstd', row_group_size=block_size)
+            bitmap_table.write_parquet(path / "bitmaps.parquet")
+            zone_maps.write_parquet(path / "zone_maps.parquet")
+            with open(path / "index.json", 'w') as f:
+                json.dump(info, f, indent=2)
+
+        atomic_write(index_dir, write)
+        logger.info(f"Indexed {source.name}: {len(df)} rows, {len(bitmap_table)} bitmaps over {bitmap_cols}, "
+                    f"{len(zone_maps)} blocks of zone maps over {zoned_cols}")
+        return cls.load(index_dir)
+
+    @classmethod
+    def load(cls, index_dir: Path) -> "TableIndex":
+        index_dir = Path(index_dir)
+        with open(index_dir / "index.json", 'r') as f:
+            info = json.load(f)
+        if info.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version {info.get('version')!r} in {index_dir}")
+        bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        for row in pl.read_parquet(index_dir / "bitmaps.parquet").iter_rows(named=True):
+            bitmaps.setdefault(row['column'], {})[row['value']] = np.frombuffer(row['bits'], dtype=np.uint8)
+        return cls(index_dir, info, bitmaps, pl.read_parquet(index_dir / "zone_maps.parquet"))
+
+    @classmethod
+    def open(cls, source: Path, index_dir: Optional[Path] = None, **build_options) -> "TableIndex":
+        """The persisted index of source, (re)built if it is missing or the source changed"""
+        index_dir = Path(index_dir) if index_dir else cls.default_dir(source)
+        if (index_dir / "index.json").exists():
+            try:
+                index = cls.load(index_dir)
+                if index.info['fingerprint'] == file_fingerprint(source):
+                    return index
+                logger.info(f"{Path(source).name} changed; rebuilding its index")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable index {index_dir}: {e}")
+        return cls.build(source, index_dir, **build_options)
+
+    def _bitmap(self, col: str, op: str, value: Any) -> np.ndarray:
+        """OR of the value bitmaps, padded to whole blocks"""
+        values = value if op == 'in' else [value]
+        bits = np.zeros(self.n_blocks * self.block_size // 8, dtype=np.uint8)
+        for item in values:
+            if item in self.bitmaps[col]:
+                bitmap = self.bitmaps[col][item]
+                bits[:len(bitmap)] |= bitmap
+        return bits
+
+    def _zone_value(self, col: str, value: Any) -> Any:
+        """Filter value as a NumPy scalar, so dates and strings compare with datetime64 bounds"""
+        if isinstance(self.zone_maps[f"{col}__min"].dtype, (pl.Date, pl.Datetime)):
+            return np.datetime64(value)
+        return value
+
+    def _read_blocks(self, blocks: np.ndarray, columns: List[str]) -> pa.Table:
+        return pq.ParquetFile(self.data_path).read_row_groups(blocks.tolist(), columns=columns)
+
+    def lookup(self, filters: Sequence[Filter]) -> np.ndarray:
+        """Sorted positions of the rows matching every filter"""
+        # One row of packed bits per block; padding rows past the end are never set
+        bits = np.packbits(np.arange(self.n_blocks * self.block_size) < self.rows)
+        ranges = []
+        for col, op, value in filters:
+            if col in self.bitmaps and op in BITMAP_OPS:
+                bits &= self._bitmap(col, op, value)
+            elif col in self.info['zoned_columns'] and op in RANGE_OPS:
+                ranges.append((col, op, self._zone_value(col, value)))
+            else:
+                raise ValueError(f"Filter ({col!r}, {op!r}) is not covered by the index of {self.info['source']}")
+
+        blocks = bits.reshape(self.n_blocks, self.block_size // 8)
+        self.blocks_read = 0
+        for col, op, value in ranges:
+            mins, maxs = self.zone_maps[f"{col}__min"].to_numpy(), self.zone_maps[f"{col}__max"].to_numpy()
+            nothing, everything = zone_classes(mins, maxs, self.zone_maps[f"{col}__nulls"].to_numpy(), op, value)
+            candidates = blocks.any(axis=1)
+            blocks[candidates & nothing] = 0
+            partial = np.flatnonzero(candidates & ~nothing & ~everything)
+            if not len(partial):
+                continue
+            # Only blocks that still have candidates and straddle the bound are read
+            values = self._read_blocks(partial, [col]).column(col).to_numpy(zero_copy_only=False)
+            self.blocks_read += len(partial)
+            start = 0
+            for block in partial:
+                length = min(self.block_size, self.rows - block * self.block_size)
+                mask = np.packbits(compare(values[start:start + length], op, value))
+                blocks[block, :len(mask)] &= mask
+                start += length
+        return np.flatnonzero(np.unpackbits(bits, count=self.rows))
+
+    def read(self, filters: Sequence[Filter], columns: Optional[List[str]] = None) -> pl.DataFrame:
+        """Matching rows read from the indexed copy, touching only blocks that contain one"""
+        positions = self.lookup(filters)
+        blocks = np.unique(positions // self.block_size)
+        if not len(blocks):
+            return pl.from_arrow(pq.read_schema(self.data_path).empty_table()).select(columns or pl.all())
+        table = pl.from_arrow(self._read_blocks(blocks, columns))
+        # Position of each block's first row in the concatenated row groups
+        starts = np.cumsum([0] + [min(self.block_size, self.rows - block * self.block_size) for block in blocks[:-1]])
+        block_of = np.searchsorted(blocks, positions // self.block_size)
+        return table[starts[block_of] + positions % self.block_size]